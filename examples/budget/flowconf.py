@@ -0,0 +1,21 @@
+from time import sleep
+
+from flowbber.loaders import source
+from flowbber.components import Source
+
+
+@source.register('nap')
+class NapSource(Source):
+    def declare_config(self, config):
+        config.add_option(
+            'seconds',
+            default=0.0,
+            optional=True,
+            schema={
+                'type': 'float',
+            },
+        )
+
+    def collect(self):
+        sleep(self.config.seconds.value)
+        return {'slept': self.config.seconds.value}
@@ -0,0 +1,26 @@
+from time import sleep
+
+from flowbber.loaders import source
+from flowbber.components import Source
+
+
+@source.register('sleep')
+class SleepSource(Source):
+    def declare_config(self, config):
+        config.add_option(
+            'seconds',
+            default=1.0,
+            schema={
+                'type': 'float',
+            },
+        )
+
+    def collect(self):
+        sleep(self.config.seconds.value)
+        return {'slept': self.config.seconds.value}
+
+
+@source.register('fail')
+class FailSource(Source):
+    def collect(self):
+        raise RuntimeError('This source always fails')
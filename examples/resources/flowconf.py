@@ -0,0 +1,21 @@
+from os import sched_getaffinity, getpriority, PRIO_PROCESS
+
+from flowbber.loaders import source
+from flowbber.components import Source
+
+
+@source.register('process')
+class ProcessSource(Source):
+    def collect(self):
+        return {
+            'affinity': sorted(sched_getaffinity(0)),
+            'nice': getpriority(PRIO_PROCESS, 0),
+        }
+
+
+@source.register('hungry')
+class HungrySource(Source):
+    def collect(self):
+        # Allocate more than the memory limit of the resource class
+        hog = bytearray(4 * 1024 ** 3)
+        return {'allocated': len(hog)}
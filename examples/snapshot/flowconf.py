@@ -0,0 +1,46 @@
+from time import sleep
+from pathlib import Path
+
+from flowbber.loaders import source, aggregator, sink
+from flowbber.components import Source, Aggregator, Sink
+
+
+@source.register('flaky')
+class FlakySource(Source):
+    def declare_config(self, config):
+        config.add_option(
+            'marker',
+            schema={
+                'type': 'string',
+                'empty': False,
+            },
+        )
+
+    def collect(self):
+        if Path(self.config.marker.value).exists():
+            # Let the other sources finish before failing
+            sleep(1)
+            raise RuntimeError('Marker file found, failing ...')
+        return {'flaky': True}
+
+
+@aggregator.register('count')
+class CountAggregator(Aggregator):
+    def accumulate(self, data):
+        data['count'] = {'sources': len(data)}
+
+
+@sink.register('flaky')
+class FlakySink(Sink):
+    def declare_config(self, config):
+        config.add_option(
+            'marker',
+            schema={
+                'type': 'string',
+                'empty': False,
+            },
+        )
+
+    def distribute(self, data):
+        if Path(self.config.marker.value).exists():
+            raise RuntimeError('Marker file found, failing ...')
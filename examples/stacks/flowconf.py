@@ -0,0 +1,15 @@
+from time import sleep
+
+from flowbber.loaders import source
+from flowbber.components import Source
+
+
+def wait_forever():
+    while True:
+        sleep(1)
+
+
+@source.register('stuck')
+class StuckSource(Source):
+    def collect(self):
+        wait_forever()
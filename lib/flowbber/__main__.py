@@ -19,12 +19,23 @@
 flowbber executable module entry point.
 """
 
-from sys import exit
+from sys import exit, argv
 
 from setproctitle import setproctitle
 
 
+def run_journal():
+    setproctitle('flowbber journal')
+
+    from .journal import parse_args, main
+    exit(main(parse_args(argv[2:])))
+
+
 def run():
+    # Subcommands, any other first argument is a pipeline definition file
+    if argv[1:2] == ['journal']:
+        run_journal()
+
     setproctitle('flowbber')
 
     # Parse arguments
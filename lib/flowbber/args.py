@@ -60,6 +60,25 @@ def validate_args(args):
 
     args.pipeline = args.pipeline.resolve()
 
+    # Check snapshot options
+    if args.snapshot is not None:
+        args.snapshot = Path(args.snapshot).resolve()
+
+    if args.replay is not None:
+        args.replay = Path(args.replay).resolve()
+
+        if not (args.replay / 'sources.pickle').is_file():
+            raise InvalidArguments(
+                'No snapshot found in {}'.format(args.replay)
+            )
+
+    if args.only_failed and args.replay is None:
+        raise InvalidArguments('--only-failed requires --replay')
+
+    # Check trace options
+    if args.trace is not None:
+        args.trace = Path(args.trace).resolve()
+
     return args
 
 
@@ -109,6 +128,55 @@ def parse_args(argv=None):
         action='store_true'
     )
 
+    # Definitions cache
+    parser.add_argument(
+        '--cache',
+        help='Use the cache of loaded pipeline definitions',
+        default=False,
+        action='store_true'
+    )
+
+    # Snapshots
+    parser.add_argument(
+        '--snapshot',
+        metavar='DIR',
+        help='Save the data collected by the sources and the aggregators to '
+             'the given directory',
+        default=None,
+    )
+    parser.add_argument(
+        '--replay',
+        metavar='DIR',
+        help='Do not run the sources, use the data saved in the given '
+             'snapshot directory instead',
+        default=None,
+    )
+    parser.add_argument(
+        '--only-failed',
+        help='When replaying, run only the components that failed in the '
+             'execution that saved the snapshot',
+        default=False,
+        action='store_true'
+    )
+
+    # Timeline
+    parser.add_argument(
+        '--trace',
+        metavar='FILE',
+        help='Save a timeline of the execution to the given file, in the '
+             'Chrome trace event format',
+        default=None,
+    )
+
+    # Hot reload
+    parser.add_argument(
+        '-r', '--reload',
+        help='Reload the pipeline definition and flowconf.py between '
+             'scheduled runs if they change',
+        default=False,
+        action='store_true'
+    )
+
     parser.add_argument(
         'pipeline',
         help='Pipeline definition file'
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Cache of loaded pipeline definitions.
+"""
+
+from os import environ, getpid
+from pathlib import Path
+from hashlib import sha256
+from traceback import format_exc
+from collections import OrderedDict
+from pickle import dumps, loads, HIGHEST_PROTOCOL
+
+import packagedata as pkgdata
+
+from . import __version__
+from .logging import get_logger
+from .loaders import SourcesLoader, AggregatorsLoader, SinksLoader
+
+
+log = get_logger(__name__)
+
+
+def cache_directory(*parts):
+    """
+    Get a directory inside the user's cache directory, creating it if required.
+
+    The cache directory is ``$XDG_CACHE_HOME/flowbber`` or
+    ``~/.cache/flowbber`` if ``XDG_CACHE_HOME`` is not set. The directories are
+    created readable by the current user only.
+
+    :param parts: Path components of a subdirectory inside the cache
+     directory.
+
+    :return: The path to the directory or ``None`` if it couldn't be created.
+    :rtype: Path
+    """
+    try:
+        base = environ.get('XDG_CACHE_HOME', None)
+        base = Path(base) if base else Path.home() / '.cache'
+
+        directory = base.joinpath('flowbber', *parts)
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    except Exception:
+        log.debug(format_exc())
+        return None
+
+    return directory
+
+
+class DefinitionCache:
+    """
+    Cache of the validated version of a pipeline definition file.
+
+    The validated definition is stored keyed by the hash of the content of the
+    file, of the ``flowconf.py`` next to it, of the installed plugins and the
+    values of all the substitutions (see :ref:`substitutions`) the file
+    references. Any change in those files, in the plugins or in the referenced
+    values (for example, a new commit, for ``{git.rev}``, or a different
+    environment variable, for ``{env.*}``) results in a cache miss.
+
+    Only a few combinations of values are kept for each file.
+
+    .. warning::
+
+       Cached definitions are stored with their substitutions already
+       performed. The cache files are readable by the current user only, but
+       still, don't enable the cache if your pipeline definition references
+       secrets.
+
+    :param Path path: Path to the pipeline definition file.
+    """
+
+    ENTRIES = 8
+
+    def __init__(self, path):
+        self._path = path
+        self._cachefile = None
+
+        digest = sha256(
+            __version__.encode('utf-8') + b'\0' + path.read_bytes()
+        )
+
+        flowconf = path.parent / 'flowconf.py'
+        if flowconf.is_file():
+            digest.update(b'\0' + flowconf.read_bytes())
+
+        # Plugins are identified by their entry points, without loading them
+        for loader in (SourcesLoader, AggregatorsLoader, SinksLoader):
+            group = loader().entrypoint
+            for ep in pkgdata.entry_points(group=group):
+                digest.update('\0{}:{}={}'.format(
+                    group, ep.name, ep.value,
+                ).encode('utf-8'))
+
+        self._digest = digest.hexdigest()
+
+        directory = cache_directory('definitions')
+        if directory is not None:
+            self._cachefile = directory / '{}.pickle'.format(
+                sha256(str(path).encode('utf-8')).hexdigest()
+            )
+
+    def _read(self):
+        """
+        Read the cache file of the definition, if any and if it is still valid
+        for the current content of the definition file.
+
+        :return: The cache record or ``None``.
+        :rtype: dict
+        """
+        if self._cachefile is None or not self._cachefile.is_file():
+            return None
+
+        try:
+            record = loads(self._cachefile.read_bytes())
+        except Exception:
+            log.debug(format_exc())
+            return None
+
+        if record.get('digest', None) != self._digest:
+            return None
+
+        return record
+
+    def _values(self, references, namespaces):
+        """
+        Hash the values of the referenced substitutions.
+
+        :param list references: Sorted list of the references.
+        :param dict namespaces: The available namespaces.
+
+        :return: The hash of the values.
+        :rtype: str
+        """
+        values = sha256()
+        for reference in references:
+            value = ('{' + reference + '}').format_map(namespaces)
+            values.update(reference.encode('utf-8') + b'\0')
+            values.update(value.encode('utf-8') + b'\0')
+        return values.hexdigest()
+
+    def get(self, namespaces):
+        """
+        Get the validated definition from the cache.
+
+        :param dict namespaces: The available namespaces, as returned by
+         :func:`flowbber.namespaces.get_namespaces`.
+
+        :return: The validated definition, or ``None`` if not cached.
+        :rtype: dict
+        """
+        record = self._read()
+        if record is None:
+            return None
+
+        try:
+            values = self._values(record['references'], namespaces)
+        except Exception:
+            # A namespace is unavailable. Let the full load report it.
+            log.debug(format_exc())
+            return None
+
+        return record['entries'].get(values, None)
+
+    def put(self, references, namespaces, validated):
+        """
+        Store the validated definition in the cache.
+
+        :param set references: All the references to substitutions found in
+         the definition.
+        :param dict namespaces: The namespaces used for the substitutions.
+        :param dict validated: The validated definition.
+        """
+        if self._cachefile is None:
+            return
+
+        references = sorted(references)
+
+        record = self._read()
+        if record is None or record['references'] != references:
+            record = {
+                'digest': self._digest,
+                'references': references,
+                'entries': OrderedDict(),
+            }
+
+        entries = record['entries']
+        entries[self._values(references, namespaces)] = validated
+        while len(entries) > self.ENTRIES:
+            entries.popitem(last=False)
+
+        # Write atomically to avoid readers seeing partial files
+        partial = self._cachefile.with_suffix('.{}'.format(getpid()))
+        try:
+            partial.touch(mode=0o600)
+            partial.chmod(0o600)
+            partial.write_bytes(dumps(record, protocol=HIGHEST_PROTOCOL))
+            partial.replace(self._cachefile)
+        except Exception:
+            log.debug(format_exc())
+
+
+__all__ = ['cache_directory', 'DefinitionCache']
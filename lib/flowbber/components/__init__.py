@@ -19,7 +19,7 @@
 flowbber.components.component module entry point.
 """
 
-from .source import Source  # noqa
+from .source import Source, FileSource  # noqa
 from .aggregator import Aggregator  # noqa
 from .sink import Sink, FilterSink  # noqa
 from .base import TimeExceededError, CrashError  # noqa
@@ -21,20 +21,33 @@ Base class for all Flowbber components.
 All Flowbber components extend from the Component class.
 """
 
-from time import time
+from os import kill
 from queue import Empty
+from time import time, sleep
+from faulthandler import register
+from signal import SIGUSR1
+from tempfile import TemporaryFile
+from collections import OrderedDict
+from pickle import dumps, loads, HIGHEST_PROTOCOL
 from abc import ABCMeta, abstractmethod
-from multiprocessing import Queue, Process
+from multiprocessing import Pipe, Process
 
 from setproctitle import setproctitle
 
 from ..config import Configurator
 from ..logging import get_logger
+from ..utils.resources import get_usage, apply_resources
 
 
 log = get_logger(__name__)
 
 
+STACK_SIGNAL = SIGUSR1
+"""
+Signal used to ask the process executing a component to dump its stacks.
+"""
+
+
 class ComponentError(Exception):
     """
     Generic exception raised when a component fails.
@@ -59,26 +72,47 @@ class CrashError(ComponentError):
     pass
 
 
+SUCCEEDED_STATUSES = ('succeeded', 'slow')
+"""
+Statuses of the executions that ended successfully. ``slow`` executions
+succeeded but exceeded the budget of the component.
+"""
+
+
 class ExecutionInfo:
     """
     Component execution information object.
 
     :var status: Word used to describe the status of the execution.
-     For example: ``succeeded``, ``crashed``, ``killed``, ``hanged`` or
-     ``timed out``.
+     For example: ``succeeded``, ``slow``, ``crashed``, ``killed``,
+     ``hanged`` or ``timed out``. See :data:`SUCCEEDED_STATUSES`.
     :var duration: Duration time in seconds of the execution of the process.
     :var pid: Pid of the executing process.
     :var exitcode: Exit code of the executing process.
      Can be None if status is ``hanged``.
     :var data: Data returned by the executing process, if any.
+    :var usage: Resource usage of the executing process and its children, as
+     returned by :func:`flowbber.utils.resources.get_usage`. Can be None if
+     the process didn't end normally.
+    :var stacks: Dump of the stacks of all the threads of the executing
+     process, sampled before killing it on timeout, if any.
+    :var timings: Timestamps of the phases of the execution, as returned by
+     :func:`time.time`, in the order they happened: ``spawned``, ``started``,
+     ``executed``, ``serialized``, ``received`` and ``deserialized``. Only
+     the phases reached are present.
     """
 
-    def __init__(self, status, duration, pid, exitcode, data):
+    def __init__(
+            self, status, duration, pid, exitcode, data,
+            usage=None, stacks=None, timings=None):
         self.status = status
         self.duration = duration
         self.pid = pid
         self.exitcode = exitcode
         self.data = data
+        self.usage = usage
+        self.stacks = stacks
+        self.timings = timings
 
     def __str__(self):
         return (
@@ -130,6 +164,17 @@ class Component(metaclass=NamedABCMeta):
     :param dict config: User configuration for this component.
     """
 
+    STACK_SAMPLES = 3
+    """
+    Number of times the stacks of the process executing this component are
+    sampled before killing it on timeout.
+    """
+
+    STACK_INTERVAL = 0.2
+    """
+    Seconds between samples of the stacks.
+    """
+
     @abstractmethod
     def __init__(
         self, index, type_, id_,
@@ -142,13 +187,20 @@ class Component(metaclass=NamedABCMeta):
         self._timeout = timeout
 
         self._result = None
+        self._sender = None
+        self._stacks = None
         self._start = None
         self._process = None
 
+        self._workers = None
+        self._resources = None
+        self._remote = None
+
         configurator = Configurator()
         self.declare_config(configurator)
 
-        self.config = configurator.validate(config or {})
+        self._userconf = config or {}
+        self.config = configurator.validate(self._userconf)
 
     @property
     def index(self):
@@ -185,6 +237,76 @@ class Component(metaclass=NamedABCMeta):
         """
         return self._timeout
 
+    @property
+    def sentinels(self):
+        """
+        Handles that become ready when the execution of this component ends.
+        Can be used with :py:func:`multiprocessing.connection.wait`.
+
+        For local executions, these are the receiving end of the result pipe,
+        that becomes ready as soon as the result is sent, and the sentinel of
+        the driving process, in case it dies without sending it. The process
+        can't exit before its result is read, so waiting only for the process
+        would deadlock with results larger than the buffer of the pipe.
+
+        For remote executions, this is the connection to the worker, or an
+        empty list if the component couldn't be submitted.
+        """
+        if self._remote is not None:
+            sentinel = self._remote.sentinel
+            return [] if sentinel is None else [sentinel]
+
+        assert self._process is not None
+        return [self._result, self._process.sentinel]
+
+    @property
+    def deadline(self):
+        """
+        Absolute timestamp in seconds since the epoch when the timeout of the
+        current execution expires, or ``None`` if there is no timeout.
+        """
+        if self.timeout is None:
+            return None
+        return self._start + self.timeout
+
+    @property
+    def worker(self):
+        """
+        Address of the worker executing this component, or ``None`` if it is
+        executed locally.
+        """
+        if self._remote is None:
+            return None
+        return self._remote.worker
+
+    def constrain(self, resources):
+        """
+        Apply a resource class to the process executing this component.
+
+        :param dict resources: The resource class. See
+         :func:`flowbber.utils.resources.apply_resources`.
+        """
+        self._resources = resources
+
+    def adapt(self, timeout):
+        """
+        Change the timeout of this component, for example, to adapt it to the
+        history of its durations.
+
+        :param float timeout: The new timeout, in seconds. ``None`` means no
+         timeout.
+        """
+        self._timeout = timeout
+
+    def delegate(self, workers):
+        """
+        Delegate the execution of this component to a pool of remote workers.
+
+        :param workers: The pool of workers to execute this component.
+        :type workers: :class:`flowbber.workers.WorkerPool`
+        """
+        self._workers = workers
+
     def declare_config(self, config):
         """
         Declare the configuration options of this component.
@@ -211,22 +333,44 @@ class Component(metaclass=NamedABCMeta):
 
         This method MUST be run in a subprocess.
         """
-        setproctitle(str(self))
+        # Allow the parent to ask for the stack of all threads if the
+        # execution times out
+        if self._stacks is not None:
+            register(STACK_SIGNAL, file=self._stacks, all_threads=True)
 
-        assert self._result.empty()
+        setproctitle(str(self))
 
         # We reset the start time so that the measurement is more accurate
         # and will not account for the time the process took to start
-        self.start = time()
+        self._start = time()
         data = None
+        status = None
 
         try:
+            if self._resources is not None:
+                apply_resources(self._resources)
+
             data = self._component_execute(*args)
 
+        except MemoryError:
+            # Distinguish the memory cap of the resource class from other
+            # failures
+            if self._resources is not None and \
+                    self._resources.get('memory', None) is not None:
+                status = 'out of memory'
+            raise
+
         finally:
-            self._result.put(
-                (time() - self.start, data)
-            )
+            executed = time()
+
+            # Serialize the data separately so the time it takes can be
+            # measured
+            payload = dumps(data, protocol=HIGHEST_PROTOCOL)
+
+            self._sender.send((
+                executed - self._start, payload, get_usage(), status,
+                (self._start, executed, time()),
+            ))
 
     def _reset(self, procargs):
         """
@@ -234,7 +378,10 @@ class Component(metaclass=NamedABCMeta):
 
         :param tuple procargs: Process execution arguments.
         """
-        self._result = Queue(maxsize=1)
+        self._result, self._sender = Pipe(duplex=False)
+
+        # The stacks are only dumped if the execution times out
+        self._stacks = TemporaryFile() if self.timeout is not None else None
         self._start = time()
         self._process = Process(
             target=self._process_execute,
@@ -246,17 +393,31 @@ class Component(metaclass=NamedABCMeta):
         """
         Start the component execution.
         """
+        if self._workers is not None:
+            self._start = time()
+            self._remote = self._workers.submit(self, args)
+            return
+
         self._reset(args)
         self._process.start()
 
+        # Only the process sends the result, so the pipe reports the end of
+        # file if it dies without sending it
+        self._sender.close()
+
     def stop(self):
         """
         Force stop this component.
 
         Use only when the result of the source is not longer relevant.
         """
+        if self._remote is not None:
+            self._remote.cancel()
+            return
+
         assert self._process is not None
         self._process.terminate()
+        self._close_stacks()
 
     def join(self):
         """
@@ -269,11 +430,51 @@ class Component(metaclass=NamedABCMeta):
         # Calculate timeout from elapsed time
         timeout = None
         if self.timeout is not None:
-            timeout = max([0, self.timeout - (time() - self.start)])
+            timeout = max([0, self.timeout - (time() - self._start)])
+
+        if self._remote is not None:
+            return self._remote.join(timeout)
+
+        # If the process already ended its result, if any, is already
+        # available. Do not wait forever if it was killed before sending it.
+        if not self._process.is_alive():
+            timeout = min(timeout, 1.0) if timeout is not None else 1.0
 
+        try:
+            return self._collect(timeout)
+        finally:
+            self._result.close()
+            self._close_stacks()
+
+    def _close_stacks(self):
+        """
+        Close the file the process dumps its stacks to, if any.
+        """
+        if self._stacks is not None:
+            self._stacks.close()
+            self._stacks = None
+
+    def _collect(self, timeout):
+        """
+        Get the result of the local execution of this component.
+
+        :param float timeout: Seconds to wait for the result, or ``None`` to
+         wait forever.
+
+        :return: The execution information of this component.
+        :rtype: :class:`ExecutionInfo`.
+        """
         # Get results
+        timings = OrderedDict(spawned=self._start)
+
         try:
-            duration, data = self._result.get(True, timeout)
+            duration, payload, usage, status, phases = self._receive(timeout)
+            received = time()
+            data = loads(payload)
+
+            timings.update(zip(('started', 'executed', 'serialized'), phases))
+            timings['received'] = received
+            timings['deserialized'] = time()
 
             # Got data back, wait for the process to die
             self._process.join(0.1)
@@ -292,10 +493,12 @@ class Component(metaclass=NamedABCMeta):
             # Standard Python crash
             if data is None:
                 execution = ExecutionInfo(
-                    'crashed', duration,
+                    status or 'crashed', duration,
                     self._process.pid,
                     self._process.exitcode,
-                    None
+                    None,
+                    usage=usage,
+                    timings=timings,
                 )
                 raise CrashError(execution)
 
@@ -304,7 +507,9 @@ class Component(metaclass=NamedABCMeta):
                 'succeeded', duration,
                 self._process.pid,
                 self._process.exitcode,
-                data
+                data,
+                usage=usage,
+                timings=timings,
             )
             return execution
 
@@ -312,6 +517,7 @@ class Component(metaclass=NamedABCMeta):
             # In most cases the duration of the process will be unable to be
             # determined
             duration = None
+            stacks = None
 
             # Check if killed without executing the finally clause
             if not self._process.is_alive():
@@ -331,6 +537,9 @@ class Component(metaclass=NamedABCMeta):
 
             # Real timeout, process still alive, lets kill it
             else:
+                # But first find out where it got stuck
+                stacks = self._dump_stacks()
+
                 self._process.terminate()
 
                 # Check if process hanged
@@ -350,7 +559,7 @@ class Component(metaclass=NamedABCMeta):
 
                 else:
                     # At least we can offer an estimate if we kill the process
-                    duration = time() - self.start
+                    duration = time() - self._start
                     status = 'timed out'
 
             # Note: exitcode can be None if the process hanged
@@ -358,10 +567,71 @@ class Component(metaclass=NamedABCMeta):
                 status, duration,
                 self._process.pid,
                 self._process.exitcode,
-                None
+                None,
+                stacks=stacks,
+                timings=timings,
             )
             raise TimeExceededError(execution)
 
+    def _receive(self, timeout):
+        """
+        Receive the result sent by the process executing this component.
+
+        :param float timeout: Seconds to wait for the result, or ``None`` to
+         wait forever.
+
+        :raise Empty: if the result wasn't received before the timeout, or the
+         process ended without sending it.
+
+        :return: The result sent by the process.
+        :rtype: tuple
+        """
+        try:
+            if self._result.poll(timeout):
+                return self._result.recv()
+        except EOFError:
+            pass
+
+        raise Empty()
+
+    def _dump_stacks(self):
+        """
+        Ask the process executing this component to dump the stack of all its
+        threads.
+
+        The stacks are sampled :attr:`STACK_SAMPLES` times, every
+        :attr:`STACK_INTERVAL` seconds.
+
+        :return: The stack dumps, or ``None`` if none could be collected.
+        :rtype: str
+        """
+        if self._stacks is None:
+            return None
+
+        samples = []
+
+        for sample in range(1, self.STACK_SAMPLES + 1):
+            position = self._stacks.tell()
+
+            try:
+                kill(self._process.pid, STACK_SIGNAL)
+            except OSError:
+                break
+
+            sleep(self.STACK_INTERVAL)
+
+            self._stacks.seek(position)
+            dump = self._stacks.read().decode('utf-8', errors='replace')
+            if dump:
+                samples.append('Sample #{} at {:.4f} seconds:\n{}'.format(
+                    sample, time() - self._start, dump,
+                ))
+
+        if not samples:
+            return None
+
+        return '\n'.join(samples)
+
     def __lt__(self, other):
         """
         "Less than" magic method allows to sort a collection of this objects
@@ -390,6 +660,8 @@ class Component(metaclass=NamedABCMeta):
 
 
 __all__ = [
+    'SUCCEEDED_STATUSES',
+    'ComponentError',
     'TimeExceededError',
     'CrashError',
     'ExecutionInfo',
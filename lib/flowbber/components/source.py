@@ -16,12 +16,79 @@
 # under the License.
 
 """
-Module implementating the Source base class.
+Module implementating the Source and FileSource base classes.
 
 All custom Flowbber sources must extend from the Source class.
+
+.. _file-source-options:
+
+FileSource Options
+==================
+
+Any Source that inherits from the FileSource class parses a single file given
+in its path option (for example, ``xmlpath``), or several files matching a
+pattern, and will have available the following configuration options:
+
+glob
+----
+
+Pattern of the paths of the files to parse, instead of a single file. For
+example, the results of the shards of a test run.
+
+Matching is performed using Python's glob_, with support for ``**`` to match
+any number of directories. The matching files are parsed in parallel and their
+results are merged into a single result, the same one as if a single file was
+parsed. How the results are merged depends on the source; for example, the
+counters are summed and the suites with the same name are merged.
+
+Either this option or the path option of the source must be set, but not
+both.
+
+.. _glob: https://docs.python.org/3/library/glob.html
+
+- **Default**: ``None``
+- **Optional**: ``True``
+- **Schema**:
+
+  .. code-block:: python3
+
+     {
+         'type': 'string',
+         'empty': False,
+         'nullable': True,
+     }
+
+- **Secret**: ``False``
+
+jobs
+----
+
+Maximum number of processes used to parse the files matching the ``glob``
+option. ``0`` means as many as available cores. No more processes than files
+are used.
+
+- **Default**: ``0``
+- **Optional**: ``True``
+- **Schema**:
+
+  .. code-block:: python3
+
+     {
+         'type': 'integer',
+         'min': 0,
+     }
+
+- **Secret**: ``False``
+
 """
 
+from os import cpu_count
+from glob import glob
+from pathlib import Path
 from abc import abstractmethod
+from collections import OrderedDict
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
 
 from .base import Component
 
@@ -80,4 +147,143 @@ class Source(Component):
         pass
 
 
-__all__ = ['Source']
+_source = None
+"""
+FileSource being collected, inherited by the forked parsing processes so the
+component doesn't need to be pickled.
+"""
+
+
+def _collect_file(path):
+    """
+    Parse a file with the FileSource being collected.
+    """
+    return _source.collect_file(path)
+
+
+class FileSource(Source):
+    """
+    Common source base class that adds configuration options to parse several
+    files matching a pattern, in parallel, and merge their results.
+
+    Subclasses declare the option with the path to a single file, named as the
+    ``path_option`` attribute, as optional with a ``None`` default, and
+    implement :meth:`collect_file` and :meth:`merge`.
+
+    See :ref:`file-source-options` for more information.
+    """
+
+    path_option = 'xmlpath'
+    """
+    Name of the option with the path to a single file.
+    """
+
+    def declare_config(self, config):
+        config.add_option(
+            'glob',
+            default=None,
+            optional=True,
+            schema={
+                'type': 'string',
+                'empty': False,
+                'nullable': True,
+            },
+        )
+
+        config.add_option(
+            'jobs',
+            default=0,
+            optional=True,
+            schema={
+                'type': 'integer',
+                'min': 0,
+            },
+        )
+
+        path_option = self.path_option
+
+        # Check that either a single file or a pattern is given
+        def custom_validator(validated):
+            if (validated[path_option] is None) == (validated['glob'] is None):
+                raise ValueError(
+                    'Exactly one of the "{}" or "glob" options must be '
+                    'set'.format(path_option)
+                )
+
+        config.add_validator(custom_validator)
+
+    def collect(self):
+        global _source
+
+        pattern = self.config.glob.value
+
+        if pattern is None:
+            path = getattr(self.config, self.path_option).value
+            return self.merge(OrderedDict([
+                (path, self.collect_file(path)),
+            ]))
+
+        paths = [
+            path for path in sorted(glob(pattern, recursive=True))
+            if Path(path).is_file()
+        ]
+        if not paths:
+            raise FileNotFoundError(
+                'No files match {}'.format(pattern)
+            )
+
+        jobs = min(len(paths), self.config.jobs.value or cpu_count() or 1)
+
+        if jobs < 2:
+            results = map(self.collect_file, paths)
+        else:
+            # The processes of the pool are forked explicitly, whatever the
+            # default start method of the platform is, to inherit this
+            # component
+            _source = self
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=jobs, mp_context=get_context('fork'),
+                ) as executor:
+                    results = list(executor.map(_collect_file, paths))
+            finally:
+                _source = None
+
+        return self.merge(OrderedDict(zip(paths, results)))
+
+    @abstractmethod
+    def collect_file(self, path):
+        """
+        Parse a single file.
+
+        All file sources subclasses must implement this abstract method. It
+        can be executed in another process, so its result must be picklable.
+
+        :param str path: Path to the file.
+
+        :return: The result of parsing the file.
+        """
+        pass
+
+    @abstractmethod
+    def merge(self, results):
+        """
+        Merge the results of several files into the data collected.
+
+        All file sources subclasses must implement this abstract method.
+
+        :param results: Ordered dictionary with the result of
+         :meth:`collect_file` for each path, sorted by path. It has a single
+         element if the ``glob`` option isn't used.
+        :type results: :py:class:`collections.OrderedDict`
+
+        :return: A dictionary with the data collected by this source.
+        :rtype: dict
+        """
+        pass
+
+
+__all__ = [
+    'Source',
+    'FileSource',
+]
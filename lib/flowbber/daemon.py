@@ -0,0 +1,733 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Long running daemon that hosts several pipelines.
+
+The daemon, started with the ``flowbber-daemon`` executable, loads several
+pipeline definitions once and keeps them ready to run. Plugins are discovered
+only once for all pipelines, but each pipeline is loaded and executed in its
+own process, with its own ``flowconf.py`` and pool of workers.
+
+Pipelines with a ``schedule`` section run on their own schedule, and any
+pipeline can be triggered on demand using a small HTTP API served on a local
+TCP port or on a Unix socket:
+
+``GET /pipelines``
+    Status of all the hosted pipelines.
+
+``GET /pipelines/<name>``
+    Status of the given pipeline.
+
+``POST /pipelines/<name>/run``
+    Run the given pipeline and wait for it to finish. Replies with ``200`` if
+    the pipeline succeeded, ``500`` if it failed and ``409`` if the pipeline
+    was already running.
+"""
+
+from sys import exit
+from os import getpid
+from time import time
+from pathlib import Path
+from signal import signal, SIGTERM
+from argparse import ArgumentParser
+from traceback import format_exc
+from urllib.parse import urlparse
+from collections import OrderedDict
+from threading import Thread, Lock, Event
+from multiprocessing import Pipe, get_context
+from socketserver import ThreadingMixIn, UnixStreamServer
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from ujson import dumps
+from setproctitle import setproctitle
+
+from . import __version__
+from .pipeline import Pipeline
+from .reloader import Reloader
+from .history import History
+from .main import save_journal
+from .inputs import load_pipeline
+from .local import load_configuration
+from .workers import parse_address
+from .logging import get_logger, setup_logging
+from .loaders import SourcesLoader, AggregatorsLoader, SinksLoader
+
+
+log = get_logger(__name__)
+
+
+class PipelineBusy(Exception):
+    """
+    Typed exception raised when a pipeline is requested to run while it is
+    still running.
+    """
+    pass
+
+
+def serve_pipeline(path, connection, cache=False, reload=False, loaders=None):
+    """
+    Load a pipeline and execute it each time the daemon requests it.
+
+    This function runs in the process dedicated to the pipeline, so its
+    ``flowconf.py`` and the components it registers are isolated from the
+    ones of other pipelines, and the components are forked from a process
+    without other threads.
+
+    Once loaded, the ``schedule`` section of the pipeline definition is sent
+    to the daemon as ``('loaded', schedule)``, or ``('crashed', exception)``
+    if the pipeline couldn't be loaded. Then, each ``True`` received executes
+    the pipeline and sends back a tuple with the status of the execution, the
+    journal and the ``schedule`` section, that may have changed if the
+    pipeline was reloaded. ``None`` stops the process.
+
+    :param Path path: Path to the pipeline definition file.
+    :param connection: Connection to the daemon.
+    :type connection: :py:class:`multiprocessing.connection.Connection`
+    :param bool cache: Use the cache of loaded pipeline definitions.
+    :param bool reload: Reload the pipeline before each execution if its
+     definition or ``flowconf.py`` changed.
+    :param dict loaders: Plugin loaders with the plugins already discovered,
+     indexed by component name.
+    """
+    name = path.stem
+    setproctitle('flowbber - daemon - {}'.format(name))
+
+    try:
+        log.info('Loading local configuration from {} ...'.format(
+            path.parent
+        ))
+        load_configuration(path.parent)
+
+        log.info('Loading pipeline definition from {} ...'.format(path))
+        definition = load_pipeline(path, cache=cache)
+
+        log.info('Creating pipeline {} ...'.format(name))
+        pipeline = Pipeline(
+            definition, name,
+            app='flowbber - daemon',
+            loaders=loaders,
+            history=History(str(path)),
+        )
+        reloader = Reloader(path, cache=cache) if reload else None
+
+    except Exception:
+        connection.send(('crashed', format_exc()))
+        return
+
+    schedule = definition.get('schedule', None)
+    connection.send(('loaded', schedule))
+
+    try:
+        while connection.recv():
+
+            if reloader is not None:
+                definition = reloader.reload(pipeline)
+
+                if definition is not None:
+                    changed = definition.get('schedule', None)
+                    if (changed is None) != (schedule is None):
+                        log.warning(
+                            'Schedule of pipeline {} added or removed. '
+                            'Restart the daemon to apply it ...'.format(name)
+                        )
+                    else:
+                        schedule = changed
+
+            try:
+                journal = pipeline.run()
+                status = 'succeeded'
+
+            except Exception:
+                exception = format_exc()
+                log.error(
+                    'Pipeline "{}" failed:\n{}'.format(name, exception)
+                )
+                journal = OrderedDict((
+                    (pipeline.executed, OrderedDict((
+                        ('status', 'crashed'),
+                        ('exception', exception),
+                    ))),
+                ))
+                status = 'failed'
+
+            connection.send((status, journal, schedule))
+
+    except (EOFError, KeyboardInterrupt):
+        pass
+
+
+class HostedPipeline:
+    """
+    A pipeline hosted by the daemon.
+
+    The pipeline is loaded and executed in its own process (see
+    :func:`serve_pipeline`), forked when the pipeline is hosted. Create the
+    hosted pipelines before starting any thread.
+
+    Executions of the pipeline, either scheduled or triggered, are serialized.
+    The journal of each execution is saved to its own file.
+
+    :param Path path: Path to the pipeline definition file.
+    :param Path journaldir: Directory to save the journals to. See
+     :func:`flowbber.main.save_journal`.
+    :param bool cache: Use the cache of loaded pipeline definitions.
+    :param bool reload: Reload the pipeline before each execution if its
+     definition or ``flowconf.py`` changed.
+    :param dict loaders: Plugin loaders with the plugins already discovered,
+     indexed by component name, shared with the process of the pipeline.
+    """
+
+    def __init__(
+            self, path, journaldir=None, cache=False, reload=False,
+            loaders=None):
+        self._path = path
+        self._journaldir = journaldir
+        self._lock = Lock()
+
+        self._connection, connection = Pipe()
+        self._process = get_context('fork').Process(
+            target=serve_pipeline,
+            args=(path, connection, cache, reload, loaders),
+            name='pipeline-{}'.format(self.name),
+        )
+        self._process.start()
+        connection.close()
+
+        try:
+            status, schedule = self._connection.recv()
+            if status != 'loaded':
+                raise RuntimeError(
+                    'Unable to load pipeline {}:\n{}'.format(path, schedule)
+                )
+
+            if schedule is not None and schedule['start'] is not None:
+                if schedule['start'] < time():
+                    raise ValueError(
+                        'Invalid start time {} for pipeline {}'.format(
+                            schedule['start'], self.name,
+                        )
+                    )
+        except Exception:
+            self.close()
+            raise
+
+        self._schedule = schedule
+
+        self._runs_passed = 0
+        self._runs_failed = 0
+        self._runs_missed = 0
+        self._last_run = None
+        self._last_status = None
+        self._last_journal = None
+
+    @property
+    def name(self):
+        """
+        Name of the pipeline.
+        """
+        return self._path.stem
+
+    @property
+    def scheduled(self):
+        """
+        ``True`` if the pipeline runs on a schedule.
+        """
+        return self._schedule is not None
+
+    @property
+    def status(self):
+        """
+        Dictionary with the status of the pipeline and of its executions.
+        """
+        return OrderedDict((
+            ('name', self.name),
+            ('path', str(self._path)),
+            ('running', self._lock.locked()),
+            ('frequency', (
+                self._schedule['frequency']
+                if self._schedule is not None else None
+            )),
+            ('runs', OrderedDict((
+                ('passed', self._runs_passed),
+                ('failed', self._runs_failed),
+                ('missed', self._runs_missed),
+            ))),
+            ('last_run', self._last_run),
+            ('last_status', self._last_status),
+            ('last_journal', self._last_journal),
+        ))
+
+    def run(self, block=True):
+        """
+        Execute the pipeline and save the journal of the execution.
+
+        :param bool block: If the pipeline is already running, wait for that
+         execution to finish before starting a new one. If ``False``, raise
+         :class:`PipelineBusy` instead.
+
+        :return: The status of the execution (``succeeded`` or ``failed``),
+         the path to the saved journal and the journal.
+        :rtype: tuple
+        """
+        if not self._lock.acquire(blocking=block):
+            raise PipelineBusy(
+                'Pipeline {} is already running'.format(self.name)
+            )
+
+        try:
+            self._last_run = time()
+
+            try:
+                self._connection.send(True)
+                status, journal, self._schedule = self._connection.recv()
+
+            except (EOFError, OSError):
+                exception = format_exc()
+                log.error(
+                    'Process of pipeline "{}" is gone:\n{}'.format(
+                        self.name, exception,
+                    )
+                )
+                journal = OrderedDict((
+                    (self._runs_passed + self._runs_failed + 1, OrderedDict((
+                        ('status', 'crashed'),
+                        ('exception', exception),
+                    ))),
+                ))
+                status = 'failed'
+
+            if status == 'succeeded':
+                self._runs_passed += 1
+            else:
+                self._runs_failed += 1
+
+            journalfile = save_journal(
+                journal,
+                journaldir=self._journaldir,
+                prefix='journal-{}-'.format(self.name),
+            )
+            log.info('Journal of pipeline {} saved to {}'.format(
+                self.name, journalfile,
+            ))
+
+            self._last_status = status
+            self._last_journal = str(journalfile)
+
+            return status, journalfile, journal
+
+        finally:
+            self._lock.release()
+
+    def close(self, timeout=5.0):
+        """
+        Stop the process of the pipeline.
+
+        :param float timeout: Seconds to wait for the current execution, if
+         any, to finish before terminating the process.
+        """
+        # The connection is only used by one thread at a time
+        if self._lock.acquire(timeout=timeout):
+            try:
+                self._connection.send(None)
+            except OSError:
+                pass
+            finally:
+                self._lock.release()
+
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+
+        self._connection.close()
+
+    def run_scheduled(self, stopped):
+        """
+        Run the pipeline on its schedule, until the requested samples are
+        taken or the daemon is stopped.
+
+        Follows the same semantics of :class:`flowbber.scheduler.Scheduler`.
+
+        :param stopped: Event set when the daemon is stopping.
+        :type stopped: :py:class:`threading.Event`
+        """
+        start = self._schedule['start']
+        next_time = start if start is not None else time()
+        passed = 0
+
+        while not stopped.wait(max(0.0, next_time - time())):
+
+            status, _, _ = self.run()
+
+            # The schedule may have changed if the pipeline was reloaded
+            frequency = self._schedule['frequency']
+            samples = self._schedule['samples']
+
+            if status == 'succeeded':
+                passed += 1
+            elif self._schedule['stop_on_failure']:
+                log.error(
+                    'Pipeline {} failed. Stopping its schedule ...'.format(
+                        self.name,
+                    )
+                )
+                return
+
+            if samples is not None and passed >= samples:
+                log.info(
+                    'Pipeline {} collected {} samples successfully. '
+                    'Stopping its schedule ...'.format(self.name, passed)
+                )
+                return
+
+            next_time += frequency
+            now = time()
+
+            if next_time <= now:
+                self._runs_missed += 1
+                log.info(
+                    'Next run missed. Starting {} pipeline '
+                    'immediately ...'.format(self.name)
+                )
+                next_time = now
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handler of the requests to the API of the daemon.
+    """
+
+    server_version = 'flowbber/{}'.format(__version__)
+
+    def log_message(self, format, *args):
+        log.info('API request: {}'.format(format % args))
+
+    def _reply(self, code, body):
+        content = dumps(body, indent=4, ensure_ascii=False).encode('utf-8')
+
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _route(self):
+        """
+        Split the path of the request and find the referenced pipeline.
+
+        :return: The parts of the path and the pipeline, if any.
+        :rtype: tuple
+        """
+        parts = [part for part in urlparse(self.path).path.split('/') if part]
+
+        hosted = None
+        if len(parts) >= 2 and parts[0] == 'pipelines':
+            hosted = self.server.pipelines.get(parts[1], None)
+
+        return parts, hosted
+
+    def do_GET(self):  # noqa: N802
+        parts, hosted = self._route()
+
+        if parts == ['pipelines']:
+            self._reply(200, [
+                hosted.status for hosted in self.server.pipelines.values()
+            ])
+            return
+
+        if len(parts) == 2 and hosted is not None:
+            self._reply(200, hosted.status)
+            return
+
+        self._reply(404, {'error': 'Not found'})
+
+    def do_POST(self):  # noqa: N802
+        parts, hosted = self._route()
+
+        if len(parts) != 3 or parts[2] != 'run' or hosted is None:
+            self._reply(404, {'error': 'Not found'})
+            return
+
+        try:
+            status, journalfile, journal = hosted.run(block=False)
+        except PipelineBusy as e:
+            self._reply(409, {'error': str(e)})
+            return
+
+        self._reply(200 if status == 'succeeded' else 500, OrderedDict((
+            ('status', status),
+            ('journal', str(journalfile)),
+            ('execution', journal),
+        )))
+
+
+class DaemonHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    Server of the API of the daemon on a TCP socket.
+    """
+    daemon_threads = True
+
+
+class DaemonUnixServer(ThreadingMixIn, UnixStreamServer):
+    """
+    Server of the API of the daemon on a Unix socket.
+    """
+    daemon_threads = True
+
+
+class Daemon:
+    """
+    Flowbber daemon that hosts several pipelines.
+
+    :param list paths: Paths to the pipeline definition files. The name of
+     each pipeline is the name of its file without extension, and must be
+     unique.
+    :param address: Address to serve the API on, as returned by
+     :func:`flowbber.workers.parse_address`.
+    :param Path journaldir: Directory to save the journals to.
+    :param bool cache: Use the cache of loaded pipeline definitions.
+    :param bool reload: Reload the pipelines before each execution if their
+     definition or ``flowconf.py`` changed.
+    """
+
+    def __init__(
+            self, paths, address, journaldir=None, cache=False, reload=False):
+        self._journaldir = journaldir
+        self._reload = reload
+        self._stopped = Event()
+
+        # Plugins are discovered once, before forking the processes of the
+        # pipelines, and shared by all of them
+        self._loaders = {
+            'source': SourcesLoader(),
+            'aggregator': AggregatorsLoader(),
+            'sink': SinksLoader(),
+        }
+        for loader in self._loaders.values():
+            loader.load_plugins()
+
+        self._pipelines = OrderedDict()
+        try:
+            for path in paths:
+                self._host(path, cache)
+
+            if isinstance(address, str):
+                socket = Path(address)
+                if socket.is_socket():
+                    log.warning('Removing stale socket {}'.format(socket))
+                    socket.unlink()
+                self._server = DaemonUnixServer(address, DaemonRequestHandler)
+            else:
+                self._server = DaemonHTTPServer(address, DaemonRequestHandler)
+
+        except BaseException:
+            self.close()
+            raise
+
+        self._server.pipelines = self._pipelines
+        self._address = address
+
+    @property
+    def pipelines(self):
+        """
+        Ordered dictionary of the hosted pipelines, indexed by name.
+        """
+        return self._pipelines
+
+    def _host(self, path, cache):
+        """
+        Host a pipeline in its own process.
+
+        :param Path path: Path to the pipeline definition file.
+        :param bool cache: Use the cache of loaded pipeline definitions.
+        """
+        name = path.stem
+        if name in self._pipelines:
+            raise ValueError(
+                'Duplicated pipeline name {} for {}'.format(name, path)
+            )
+
+        log.info('Hosting pipeline {} ...'.format(name))
+        self._pipelines[name] = HostedPipeline(
+            path,
+            journaldir=self._journaldir,
+            cache=cache,
+            reload=self._reload,
+            loaders=self._loaders,
+        )
+
+    def serve_forever(self):
+        """
+        Start the schedules of the pipelines and serve the API until
+        :meth:`shutdown` is called.
+        """
+        for hosted in self._pipelines.values():
+            if not hosted.scheduled:
+                continue
+
+            Thread(
+                target=hosted.run_scheduled,
+                args=(self._stopped, ),
+                name='schedule-{}'.format(hosted.name),
+                daemon=True,
+            ).start()
+
+        log.info('Daemon PID {} serving {} pipelines on {}'.format(
+            getpid(), len(self._pipelines), self._address,
+        ))
+
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stopped.set()
+            self._server.server_close()
+
+            if isinstance(self._address, str):
+                Path(self._address).unlink()
+
+            self.close()
+
+    def shutdown(self):
+        """
+        Stop serving the API and stop the schedules.
+
+        Must be called from another thread than the one in
+        :meth:`serve_forever`.
+        """
+        self._stopped.set()
+        self._server.shutdown()
+
+    def close(self):
+        """
+        Stop the processes of the hosted pipelines.
+        """
+        self._stopped.set()
+        for hosted in self._pipelines.values():
+            hosted.close()
+
+
+def parse_args(argv=None):
+    """
+    Argument parsing routine for the daemon.
+
+    :param list argv: A list of argument strings.
+
+    :return: A parsed and verified arguments namespace.
+    :rtype: :py:class:`argparse.Namespace`
+    """
+    parser = ArgumentParser(
+        description='Flowbber daemon that hosts several pipelines.'
+    )
+
+    parser.add_argument(
+        '-v', '--verbose',
+        help='Increase verbosity level',
+        default=0,
+        action='count'
+    )
+    parser.add_argument(
+        '--version',
+        action='version',
+        version='Flowbber v{}'.format(__version__)
+    )
+    parser.add_argument(
+        '-l', '--listen',
+        help='Address to serve the API on, "host:port" or '
+             '"unix:/path/to/socket" (default: %(default)s)',
+        default='127.0.0.1:9871',
+    )
+    parser.add_argument(
+        '-j', '--journals',
+        help='Directory to save the journals to',
+        default=None,
+    )
+    parser.add_argument(
+        '--cache',
+        help='Use the cache of loaded pipeline definitions',
+        default=False,
+        action='store_true'
+    )
+    parser.add_argument(
+        '-r', '--reload',
+        help='Reload the pipeline definitions and flowconf.py before each '
+             'execution if they change',
+        default=False,
+        action='store_true'
+    )
+    parser.add_argument(
+        'pipelines',
+        nargs='+',
+        help='Pipeline definition files',
+    )
+
+    args = parser.parse_args(argv)
+    setup_logging(args.verbose)
+
+    try:
+        args.listen = parse_address(args.listen)
+    except ValueError as e:
+        parser.error(str(e))
+
+    pipelines = []
+    for pipeline in map(Path, args.pipelines):
+        if not pipeline.is_file():
+            parser.error('No such file {}'.format(pipeline))
+        pipelines.append(pipeline.resolve())
+    args.pipelines = pipelines
+
+    if args.journals is not None:
+        args.journals = Path(args.journals)
+
+    return args
+
+
+def run(argv=None):
+    """
+    Daemon executable entry point.
+    """
+    setproctitle('flowbber - daemon')
+    args = parse_args(argv)
+
+    # Exit cleanly on SIGTERM so the logging subprocess is stopped and the
+    # Unix socket, if any, is removed
+    def terminate(signum, frame):
+        exit(0)
+
+    signal(SIGTERM, terminate)
+
+    daemon = Daemon(
+        args.pipelines, args.listen,
+        journaldir=args.journals, cache=args.cache,
+        reload=args.reload,
+    )
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    run()
+
+
+__all__ = [
+    'PipelineBusy',
+    'HostedPipeline',
+    'Daemon',
+    'run',
+]
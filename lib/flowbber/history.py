@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+History of the durations of the components of a pipeline, used to derive
+adaptive timeouts.
+"""
+
+from os import getpid
+from hashlib import sha256
+from traceback import format_exc
+from collections import OrderedDict, deque
+
+from ujson import dumps, loads
+
+from .cache import cache_directory
+from .logging import get_logger
+from .utils.stats import percentile
+
+
+log = get_logger(__name__)
+
+
+class History:
+    """
+    Rolling history of the durations of the components of a pipeline.
+
+    Only the last :attr:`SAMPLES` durations of each component are kept. The
+    history is stored in the ``history`` directory of the user's cache
+    directory (see :func:`flowbber.cache.cache_directory`), in a file named
+    after the hash of the given key.
+
+    :param str key: Key that identifies the pipeline, usually the path to its
+     definition file.
+    """
+
+    SAMPLES = 100
+    """
+    Number of durations kept for each component.
+    """
+
+    MIN_SAMPLES = 5
+    """
+    Minimum number of durations required to derive a timeout.
+    """
+
+    MIN_TIMEOUT = 5.0
+    """
+    Minimum timeout derived, in seconds, to tolerate the jitter of the spawn
+    of the processes of fast components.
+    """
+
+    def __init__(self, key):
+        self._historyfile = None
+        self._durations = OrderedDict()
+        self._changed = False
+
+        directory = cache_directory('history')
+        if directory is not None:
+            self._historyfile = directory / '{}.json'.format(
+                sha256(key.encode('utf-8')).hexdigest()
+            )
+            self._load()
+
+    def _load(self):
+        """
+        Load the history file, if any.
+        """
+        if not self._historyfile.is_file():
+            return
+
+        try:
+            stored = loads(self._historyfile.read_text(encoding='utf-8'))
+        except Exception:
+            log.debug(format_exc())
+            return
+
+        for component, durations in stored.items():
+            self._durations[component] = deque(
+                durations, maxlen=self.SAMPLES,
+            )
+
+    def _key(self, kind, id_):
+        return '{}:{}'.format(kind, id_)
+
+    def durations(self, kind, id_):
+        """
+        Get the durations recorded for a component.
+
+        :param str kind: Kind of the component, ``source``, ``aggregator`` or
+         ``sink``.
+        :param str id_: Identifier of the component.
+
+        :return: The durations in seconds, oldest first.
+        :rtype: list
+        """
+        return list(self._durations.get(self._key(kind, id_), ()))
+
+    def record(self, kind, id_, duration):
+        """
+        Record a duration of a component.
+
+        :param str kind: Kind of the component.
+        :param str id_: Identifier of the component.
+        :param float duration: Duration of the execution in seconds.
+        """
+        key = self._key(kind, id_)
+        if key not in self._durations:
+            self._durations[key] = deque(maxlen=self.SAMPLES)
+
+        self._durations[key].append(duration)
+        self._changed = True
+
+    def timeout(self, kind, id_, factor, quantile=0.99):
+        """
+        Derive the timeout of a component from its recorded durations.
+
+        :param str kind: Kind of the component.
+        :param str id_: Identifier of the component.
+        :param float factor: Safety factor the quantile of the durations is
+         multiplied by.
+        :param float quantile: Quantile of the durations to use.
+
+        :return: The timeout in seconds, or ``None`` if not enough durations
+         were recorded.
+        :rtype: float
+        """
+        durations = self.durations(kind, id_)
+        if len(durations) < self.MIN_SAMPLES:
+            return None
+
+        return max(self.MIN_TIMEOUT, percentile(durations, quantile) * factor)
+
+    def save(self):
+        """
+        Save the history file, if anything was recorded.
+        """
+        if self._historyfile is None or not self._changed:
+            return
+
+        # Write atomically to avoid readers seeing partial files
+        partial = self._historyfile.with_suffix('.{}'.format(getpid()))
+        try:
+            partial.write_text(
+                dumps(OrderedDict(
+                    (component, list(durations))
+                    for component, durations in self._durations.items()
+                )),
+                encoding='utf-8',
+            )
+            partial.replace(self._historyfile)
+        except Exception:
+            log.debug(format_exc())
+            return
+
+        self._changed = False
+
+
+__all__ = ['History']
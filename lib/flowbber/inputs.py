@@ -19,6 +19,8 @@
 Input pipeline definition formats parses.
 """
 
+from string import Formatter
+
 from pprintpp import pformat
 
 from .logging import get_logger
@@ -27,7 +29,45 @@ from .logging import get_logger
 log = get_logger(__name__)
 
 
-def replace_values(definition, path):
+def find_references(definition):
+    """
+    Find all the substitution references in both keys and values of an
+    arbitrarily nested dictionary data structure.
+
+    For example, ``"{git.root}/src/{env.PROJECT}"`` references ``git.root`` and
+    ``env.PROJECT``.
+
+    :param dict definition: the pipeline definition data structure.
+
+    :return: A set with all references found.
+    :rtype: set
+    """
+    formatter = Formatter()
+    references = set()
+
+    def find(obj):
+        if isinstance(obj, str):
+            references.update(
+                field for _, field, _, _ in formatter.parse(obj)
+                if field
+            )
+            return
+
+        if isinstance(obj, list):
+            for element in obj:
+                find(element)
+            return
+
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                find(key)
+                find(value)
+
+    find(definition)
+    return references
+
+
+def replace_values(definition, path, namespaces=None):
     """
     Perform string replacement on both keys and values of an arbitrarily nested
     dictionary data structure.
@@ -37,19 +77,21 @@ def replace_values(definition, path):
 
     :param dict definition: the pipeline definition data structure.
     :param Path path: Path to the pipeline definition file.
+    :param dict namespaces: Namespaces to use for the replacements. If
+     ``None``, the default, they will be loaded for the given path.
 
     :return: The pipeline definition data structure with all string keys and
      values replaced with values in the namespace.
     :rtype: dict
     """
-    from .namespaces import get_namespaces
-
-    namespaces = get_namespaces(path)
+    if namespaces is None:
+        from .namespaces import get_namespaces
+        namespaces = get_namespaces(path)
 
     # Replace all string keys and values
     def replace(obj):
         if isinstance(obj, str):
-            return obj.format(**namespaces)
+            return obj.format_map(namespaces)
 
         if isinstance(obj, list):
             return [replace(element) for element in obj]
@@ -79,7 +121,14 @@ def validate_definition(definition):
     """
     from .schema import TimedeltaValidator, PIPELINE_SCHEMA
 
-    validator = TimedeltaValidator(PIPELINE_SCHEMA)
+    # Validators are stateful, so build one per call to allow concurrent
+    # validations, but reuse the schema as its normalization is expensive
+    schema = validate_definition.schema
+    if schema is None:
+        schema = TimedeltaValidator(PIPELINE_SCHEMA).schema
+        validate_definition.schema = schema
+
+    validator = TimedeltaValidator(schema)
     validated = validator.validated(definition)
 
     if validated is None:
@@ -93,6 +142,9 @@ def validate_definition(definition):
     return validated
 
 
+validate_definition.schema = None
+
+
 def load_json(path):
     """
     Load pipeline definition file in JSON format.
@@ -128,32 +180,58 @@ def load_yaml(path):
     :return: A dictionary data structure with the pipeline definition.
     :rtype: dict
     """
-    from yaml import load, FullLoader
+    from yaml import load
+
+    # Use the LibYAML based loader if available, it is much faster
+    try:
+        from yaml import CFullLoader as FullLoader
+    except ImportError:
+        from yaml import FullLoader
+
     return load(path.read_text(encoding='utf-8'), Loader=FullLoader)
 
 
-def load_file(path):
+def parse_file(path):
     """
-    Load any file format supported by Flowbber and perform replacement on its
-    content.
+    Parse any file format supported by Flowbber.
 
-    :param Path path: File to load.
+    :param Path path: File to parse.
 
-    :return: The content of file with its values replaced.
+    :return: The content of file as is.
     :rtype: dict
     """
     extension = path.suffix
-    if extension not in load_file.supported_formats:
+    if extension not in parse_file.supported_formats:
         raise RuntimeError(
             'Unknown file format "{}" for file {}. '
             'Supported formats are :{}.'.format(
                 extension, path,
-                ', '.join(sorted(load_file.supported_formats.keys())),
+                ', '.join(sorted(parse_file.supported_formats.keys())),
             )
         )
 
+    return parse_file.supported_formats[extension](path)
+
+
+parse_file.supported_formats = {
+    '.toml': load_toml,
+    '.json': load_json,
+    '.yaml': load_yaml,
+}
+
+
+def load_file(path):
+    """
+    Load any file format supported by Flowbber and perform replacement on its
+    content.
+
+    :param Path path: File to load.
+
+    :return: The content of file with its values replaced.
+    :rtype: dict
+    """
     # Load file
-    content = load_file.supported_formats[extension](path)
+    content = parse_file(path)
 
     # Replace string values that required replacement
     content = replace_values(content, path)
@@ -161,14 +239,10 @@ def load_file(path):
     return content
 
 
-load_file.supported_formats = {
-    '.toml': load_toml,
-    '.json': load_json,
-    '.yaml': load_yaml,
-}
+load_file.supported_formats = parse_file.supported_formats
 
 
-def load_pipeline(path):
+def load_pipeline(path, cache=False):
     """
     Load, replace and validate the pipeline definition file.
 
@@ -177,12 +251,32 @@ def load_pipeline(path):
     - Schema validation will be performed.
 
     :param Path path: Path to the pipeline definition file.
+    :param bool cache: Use the definitions cache. If the file, the local
+     configuration, the installed plugins and the values of the substitutions
+     it references didn't change since the last time it was loaded, the
+     parsing, replacement and validation are skipped. See
+     :class:`flowbber.cache.DefinitionCache`.
 
     :return: A dictionary data structure with the pipeline definition.
     :rtype: dict
     """
+    from .cache import DefinitionCache
+    from .namespaces import get_namespaces
+
+    namespaces = get_namespaces(path)
+    definitions = DefinitionCache(path) if cache else None
+
+    if definitions is not None:
+        validated = definitions.get(namespaces)
+        if validated is not None:
+            log.info('Pipeline definition loaded from cache.')
+            log.debug(pformat(validated))
+            return validated
+
     try:
-        definition = load_file(path)
+        content = parse_file(path)
+        references = find_references(content)
+        definition = replace_values(content, path, namespaces=namespaces)
     except Exception as e:
         log.critical('Unable to parse pipeline definition {}'.format(path))
         raise e
@@ -190,14 +284,19 @@ def load_pipeline(path):
     # Validate data structure
     validated = validate_definition(definition)
 
+    if definitions is not None:
+        definitions.put(references, namespaces, validated)
+
     log.info('Pipeline definition loaded, realized and validated.')
     log.debug(pformat(validated))
     return validated
 
 
 __all__ = [
+    'find_references',
     'replace_values',
     'validate_definition',
+    'parse_file',
     'load_file',
     'load_pipeline'
 ]
@@ -0,0 +1,658 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Analytics of the journals of the executions of pipelines.
+
+Journals are read as a stream, one execution at a time, and the statistics of
+each component are kept in constant memory, so any number of journals can be
+analyzed.
+
+Supported files are journals as saved by ``flowbber``, ``flowbber-daemon``
+and the scheduler (a JSON object with the executions indexed by number), and
+JSON-lines files (``.jsonl`` or ``.ndjson``) with one journal or one execution
+per line. Any of them can be compressed with gzip (``.gz``), bzip2 (``.bz2``)
+or xz (``.xz``). Large JSON journals are parsed incrementally if the ijson_
+library is available.
+
+.. _ijson: https://pypi.org/project/ijson/
+"""
+
+import sys
+from pathlib import Path
+from datetime import datetime
+from argparse import ArgumentParser
+from collections import OrderedDict
+
+from ujson import loads, dumps
+
+from . import __version__
+from .logging import get_logger, setup_logging
+from .utils.stats import StreamingQuantile
+from .utils.iso8601 import iso8601_to_datetime
+from .components.base import SUCCEEDED_STATUSES
+
+
+log = get_logger(__name__)
+
+
+QUANTILES = OrderedDict((
+    ('p50', 0.50),
+    ('p95', 0.95),
+    ('p99', 0.99),
+))
+"""
+Quantiles of the durations reported for each component.
+"""
+
+STAGES = ('sources', 'aggregators', 'sinks')
+
+TIMEOUT_STATUSES = ('timed out', 'hanged')
+
+COMPRESSIONS = ('.gz', '.bz2', '.xz')
+
+LINES_SUFFIXES = ('.jsonl', '.ndjson')
+
+
+def uncompressed_suffix(path):
+    """
+    Get the suffix of a journal file, ignoring the compression suffix.
+
+    :param Path path: Path to the journal file.
+
+    :return: The suffix, for example, ``.jsonl`` for ``runs.jsonl.gz``.
+    :rtype: str
+    """
+    if path.suffix in COMPRESSIONS:
+        return path.with_suffix('').suffix
+    return path.suffix
+
+
+def open_journal(path):
+    """
+    Open a journal file for reading, decompressing it if required.
+
+    :param Path path: Path to the journal file.
+
+    :return: A binary file object.
+    """
+    suffix = path.suffix
+
+    if suffix == '.gz':
+        from gzip import open as opener
+    elif suffix == '.bz2':
+        from bz2 import open as opener
+    elif suffix == '.xz':
+        from lzma import open as opener
+    else:
+        opener = open
+
+    return opener(str(path), 'rb')
+
+
+def iter_executions(path):
+    """
+    Iterate the executions of a pipeline recorded in a journal file.
+
+    :param Path path: Path to the journal file.
+
+    :return: A generator of executions, as recorded in the journal.
+    :rtype: generator
+    """
+    with open_journal(path) as fd:
+
+        # One journal or one execution per line
+        if uncompressed_suffix(path) in LINES_SUFFIXES:
+            for line in fd:
+                line = line.strip()
+                if not line:
+                    continue
+
+                document = loads(line)
+                if 'status' in document:
+                    yield document
+                else:
+                    yield from document.values()
+            return
+
+        # A journal with the executions indexed by number
+        try:
+            import ijson
+        except ImportError:
+            yield from loads(fd.read()).values()
+            return
+
+        for _, execution in ijson.kvitems(fd, '', use_float=True):
+            yield execution
+
+
+def iter_paths(paths):
+    """
+    Iterate the journal files in the given paths.
+
+    :param list paths: Paths to journal files or to directories with journal
+     files.
+
+    :return: A generator of paths to journal files.
+    :rtype: generator
+    """
+    for path in paths:
+        if not path.is_dir():
+            yield path
+            continue
+
+        for child in sorted(path.iterdir()):
+            if child.is_file() and uncompressed_suffix(child) in (
+                ('.json', ) + LINES_SUFFIXES
+            ):
+                yield child
+
+
+class ComponentStats:
+    """
+    Statistics of the executions of a component, kept in constant memory.
+
+    :param str id: Identifier of the component.
+    :param str stage: Stage of the component, ``sources``, ``aggregators`` or
+     ``sinks``.
+    :param str metric: Quantile compared between the time windows, one of
+     :data:`QUANTILES`.
+    """
+
+    def __init__(self, id, stage, metric='p95'):
+        self.id = id
+        self.stage = stage
+        self.type = None
+
+        self.executions = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.slow = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+        self._quantiles = OrderedDict(
+            (name, StreamingQuantile(quantile))
+            for name, quantile in QUANTILES.items()
+        )
+        self._windows = (
+            StreamingQuantile(QUANTILES[metric]),
+            StreamingQuantile(QUANTILES[metric]),
+        )
+
+    def add(self, entry, window=None):
+        """
+        Add the journal entry of an execution of the component.
+
+        :param dict entry: The journal entry.
+        :param int window: Time window of the execution, ``0`` for the
+         baseline window, ``1`` for the current window, or ``None`` if the
+         execution is not in any of them.
+        """
+        self.type = entry.get('type', self.type)
+        self.executions += 1
+
+        status = entry.get('status', None)
+        if status not in SUCCEEDED_STATUSES:
+            self.failures += 1
+        if status == 'slow':
+            self.slow += 1
+        if status in TIMEOUT_STATUSES:
+            self.timeouts += 1
+
+        duration = entry.get('duration', None)
+        if duration is None:
+            return
+
+        duration = float(duration)
+        self.total += duration
+        self.minimum = min(
+            duration, self.minimum if self.minimum is not None else duration
+        )
+        self.maximum = max(
+            duration, self.maximum if self.maximum is not None else duration
+        )
+
+        for estimator in self._quantiles.values():
+            estimator.add(duration)
+
+        if window is not None:
+            self._windows[window].add(duration)
+
+    @property
+    def samples(self):
+        """
+        Number of executions with a known duration.
+        """
+        return self._quantiles['p50'].count
+
+    @property
+    def windows(self):
+        """
+        Tuple with the number of samples and the estimated quantile of the
+        baseline and the current time windows.
+        """
+        return tuple(
+            (estimator.count, estimator.value) for estimator in self._windows
+        )
+
+    def regression(self, threshold, min_samples):
+        """
+        Check if the latency of the component rose between the time windows.
+
+        :param float threshold: Minimum relative increment of the quantile to
+         consider it a regression, for example, ``0.2`` for 20%.
+        :param int min_samples: Minimum number of samples in each window
+         required to compare them.
+
+        :return: The relative increment if it is a regression, ``None``
+         otherwise.
+        :rtype: float
+        """
+        (bcount, baseline), (ccount, current) = self.windows
+
+        if bcount < min_samples or ccount < min_samples or not baseline:
+            return None
+
+        increment = (current - baseline) / baseline
+        if increment < threshold:
+            return None
+        return increment
+
+    def as_dict(self):
+        """
+        Get the statistics as a dictionary.
+
+        :rtype: OrderedDict
+        """
+        executions = self.executions or 1
+        samples = self.samples or 1
+
+        stats = OrderedDict((
+            ('id', self.id),
+            ('stage', self.stage),
+            ('type', self.type),
+            ('executions', self.executions),
+            ('failure_rate', self.failures / executions),
+            ('timeout_rate', self.timeouts / executions),
+            ('slow_rate', self.slow / executions),
+            ('min', self.minimum),
+            ('mean', self.total / samples if self.samples else None),
+            ('max', self.maximum),
+        ))
+        for name, estimator in self._quantiles.items():
+            stats[name] = estimator.value
+
+        return stats
+
+
+class JournalStats:
+    """
+    Statistics of the executions recorded in a stream of journals.
+
+    :param float split: Timestamp, in seconds since the epoch, that splits
+     the executions in the baseline window (before it) and the current window
+     (at or after it). If ``None``, the windows are not compared.
+    :param str metric: Quantile compared between the time windows, one of
+     :data:`QUANTILES`.
+    """
+
+    def __init__(self, split=None, metric='p95'):
+        self._split = split
+        self._metric = metric
+
+        self.executions = 0
+        self.crashed = 0
+        self.components = OrderedDict()
+
+    def add(self, execution):
+        """
+        Add an execution of a pipeline.
+
+        :param dict execution: The execution as recorded in the journal.
+        """
+        self.executions += 1
+
+        # Executions of the scheduler that crashed have no entries
+        if execution.get('status', None) != 'succeeded' and not any(
+            stage in execution for stage in STAGES
+        ):
+            self.crashed += 1
+            return
+
+        window = None
+        begin = execution.get('digest', {}).get('begin', None)
+        if self._split is not None and begin is not None:
+            window = 0 if float(begin) < self._split else 1
+
+        for stage in STAGES:
+            for entry in execution.get(stage, ()):
+
+                # Replayed entries are copies of a previous execution
+                if entry.get('replayed', False):
+                    continue
+
+                key = (stage, entry['id'])
+                component = self.components.get(key, None)
+                if component is None:
+                    component = ComponentStats(
+                        entry['id'], stage, metric=self._metric,
+                    )
+                    self.components[key] = component
+
+                component.add(entry, window=window)
+
+    def regressions(self, threshold=0.2, min_samples=5):
+        """
+        Find the components whose latency rose between the time windows.
+
+        :param float threshold: Minimum relative increment of the quantile to
+         consider it a regression.
+        :param int min_samples: Minimum number of samples in each window
+         required to compare them.
+
+        :return: A list of dictionaries describing the regressions, the worst
+         first.
+        :rtype: list
+        """
+        regressions = []
+
+        for component in self.components.values():
+            increment = component.regression(threshold, min_samples)
+            if increment is None:
+                continue
+
+            (bcount, baseline), (ccount, current) = component.windows
+            regressions.append(OrderedDict((
+                ('id', component.id),
+                ('stage', component.stage),
+                ('metric', self._metric),
+                ('baseline', baseline),
+                ('current', current),
+                ('increment', increment),
+                ('samples', [bcount, ccount]),
+            )))
+
+        regressions.sort(key=lambda regression: -regression['increment'])
+        return regressions
+
+
+def format_duration(duration):
+    """
+    Format a duration in seconds for a table.
+    """
+    if duration is None:
+        return '-'
+    return '{:.3f}'.format(duration)
+
+
+def format_table(rows, output):
+    """
+    Write a table with aligned columns.
+
+    :param list rows: List of rows, the first one is the header. Each row is
+     a list of strings.
+    :param output: File object to write to.
+    """
+    widths = [max(map(len, column)) for column in zip(*rows)]
+
+    for number, row in enumerate(rows):
+        output.write('  '.join(
+            cell.ljust(width) if index < 2 else cell.rjust(width)
+            for index, (cell, width) in enumerate(zip(row, widths))
+        ).rstrip() + '\n')
+
+        if number == 0:
+            output.write('  '.join('-' * width for width in widths) + '\n')
+
+
+def stats(args, output=None):
+    """
+    Execute the ``stats`` command.
+
+    :param args: An arguments namespace.
+    :type args: :py:class:`argparse.Namespace`
+    :param output: File object to write the report to. If ``None``, the
+     standard output is used.
+
+    :return: Exit code.
+    :rtype: int
+    """
+    if output is None:
+        output = sys.stdout
+
+    journal = JournalStats(split=args.split, metric=args.metric)
+
+    for path in iter_paths(args.journals):
+        log.info('Reading journal {} ...'.format(path))
+        try:
+            for execution in iter_executions(path):
+                journal.add(execution)
+        except Exception as e:
+            log.error('Unable to read journal {}: {}'.format(path, e))
+
+    components = [
+        component.as_dict() for component in journal.components.values()
+    ]
+    regressions = []
+    if args.split is not None:
+        regressions = journal.regressions(
+            threshold=args.threshold, min_samples=args.min_samples,
+        )
+
+    if args.json:
+        output.write(dumps(
+            OrderedDict((
+                ('executions', journal.executions),
+                ('crashed', journal.crashed),
+                ('components', components),
+                ('regressions', regressions),
+            )),
+            indent=4,
+            ensure_ascii=False,
+        ) + '\n')
+        return 0
+
+    output.write('{} executions, {} crashed\n\n'.format(
+        journal.executions, journal.crashed,
+    ))
+
+    rows = [[
+        'id', 'stage', 'runs', 'failed', 'timeout', 'slow',
+        'p50', 'p95', 'p99', 'max',
+    ]]
+    for component in components:
+        rows.append([
+            component['id'],
+            component['stage'],
+            str(component['executions']),
+            '{:.1%}'.format(component['failure_rate']),
+            '{:.1%}'.format(component['timeout_rate']),
+            '{:.1%}'.format(component['slow_rate']),
+            format_duration(component['p50']),
+            format_duration(component['p95']),
+            format_duration(component['p99']),
+            format_duration(component['max']),
+        ])
+    format_table(rows, output)
+
+    if args.split is None:
+        return 0
+
+    output.write('\n')
+    if not regressions:
+        output.write('No regressions found\n')
+        return 0
+
+    rows = [['id', 'stage', 'baseline', 'current', 'increment']]
+    for regression in regressions:
+        rows.append([
+            regression['id'],
+            regression['stage'],
+            format_duration(regression['baseline']),
+            format_duration(regression['current']),
+            '{:+.1%}'.format(regression['increment']),
+        ])
+
+    output.write('Regressions of {}:\n\n'.format(args.metric))
+    format_table(rows, output)
+    return 0
+
+
+def parse_split(value):
+    """
+    Parse a timestamp given either in seconds since the epoch or as an
+    ISO 8601 date in local time.
+
+    :param str value: The value to parse.
+
+    :return: Timestamp in seconds since the epoch.
+    :rtype: float
+    """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    try:
+        return iso8601_to_datetime(value).timestamp()
+    except ValueError:
+        pass
+
+    return datetime.strptime(value, '%Y-%m-%d').timestamp()
+
+
+def parse_args(argv=None):
+    """
+    Argument parsing routine for the ``journal`` command.
+
+    :param list argv: A list of argument strings, after ``journal``.
+
+    :return: A parsed and verified arguments namespace.
+    :rtype: :py:class:`argparse.Namespace`
+    """
+    parser = ArgumentParser(
+        prog='flowbber journal',
+        description='Analyze the journals of the executions of pipelines.',
+    )
+
+    parser.add_argument(
+        '-v', '--verbose',
+        help='Increase verbosity level',
+        default=0,
+        action='count'
+    )
+    parser.add_argument(
+        '--version',
+        action='version',
+        version='Flowbber v{}'.format(__version__)
+    )
+
+    subparsers = parser.add_subparsers(
+        title='commands', dest='command', metavar='COMMAND',
+    )
+    subparsers.required = True
+
+    stats_parser = subparsers.add_parser(
+        'stats',
+        help='Report percentile durations and failure rates per component',
+    )
+    stats_parser.set_defaults(function=stats)
+    stats_parser.add_argument(
+        '--split',
+        metavar='TIME',
+        help='Compare the executions before and after the given time, in '
+             'seconds since the epoch or as YYYY-MM-DD[THH:MM:SS], and report '
+             'the components whose latency rose',
+        default=None,
+    )
+    stats_parser.add_argument(
+        '--metric',
+        help='Quantile to compare between the time windows '
+             '(default: %(default)s)',
+        choices=list(QUANTILES),
+        default='p95',
+    )
+    stats_parser.add_argument(
+        '--threshold',
+        help='Minimum relative increment to report a regression '
+             '(default: %(default)s)',
+        type=float,
+        default=0.2,
+    )
+    stats_parser.add_argument(
+        '--min-samples',
+        help='Minimum number of executions in each time window to compare '
+             'them (default: %(default)s)',
+        type=int,
+        default=5,
+    )
+    stats_parser.add_argument(
+        '--json',
+        help='Output the report in JSON',
+        default=False,
+        action='store_true'
+    )
+    stats_parser.add_argument(
+        'journals',
+        nargs='+',
+        help='Journal files, or directories with journal files',
+    )
+
+    args = parser.parse_args(argv)
+    setup_logging(args.verbose)
+
+    args.journals = [Path(journal) for journal in args.journals]
+    for journal in args.journals:
+        if not journal.exists():
+            parser.error('No such file or directory {}'.format(journal))
+
+    if args.split is not None:
+        try:
+            args.split = parse_split(args.split)
+        except ValueError:
+            parser.error('Invalid time {}'.format(args.split))
+
+    return args
+
+
+def main(args):
+    """
+    Journal command main function.
+
+    :param args: An arguments namespace.
+    :type args: :py:class:`argparse.Namespace`
+
+    :return: Exit code.
+    :rtype: int
+    """
+    return args.function(args)
+
+
+__all__ = [
+    'QUANTILES',
+    'uncompressed_suffix',
+    'open_journal',
+    'iter_executions',
+    'iter_paths',
+    'ComponentStats',
+    'JournalStats',
+    'stats',
+    'parse_args',
+    'main',
+]
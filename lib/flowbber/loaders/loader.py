@@ -121,9 +121,12 @@ class PluginLoader(object):
         :rtype: OrderedDict
         """
 
-        # Return cached value if call is repeated
+        # Return cached value if call is repeated. Locally registered plugins
+        # are always refreshed, as a flowconf.py could have been loaded since.
         if cache and self._plugins_cache:
-            return copy(self._plugins_cache)
+            available = copy(self._plugins_cache)
+            available.update(self.__class__._locally_registered)
+            return available
 
         # Add built-in plugin types
         available = OrderedDict()
@@ -158,14 +161,15 @@ class PluginLoader(object):
 
             available[name] = plugin
 
+        # Save cache of the entry points
+        self._plugins_cache = copy(available)
+
         # Load locally registered
         available.update(
             self.__class__._locally_registered
         )
 
-        # Save cache and return
-        self._plugins_cache = available
-        return copy(self._plugins_cache)
+        return available
 
 
 __all__ = ['PluginLoader']
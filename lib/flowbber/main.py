@@ -28,6 +28,10 @@ from ujson import dumps
 from .pipeline import Pipeline
 from .logging import get_logger
 from .scheduler import Scheduler
+from .reloader import Reloader
+from .snapshot import Snapshot
+from .trace import Tracer
+from .history import History
 from .inputs import load_pipeline
 from .local import load_configuration
 
@@ -35,6 +39,81 @@ from .local import load_configuration
 log = get_logger(__name__)
 
 
+def save_stacks(journal, journalfile):
+    """
+    Save the stack dumps of the components in a journal to their own files,
+    next to the journal file.
+
+    The stack dumps in the journal entries are replaced by the path to the
+    file they were saved to.
+
+    :param dict journal: The journal with the stack dumps.
+    :param Path journalfile: Path to the journal file.
+    """
+    for executed, execution in journal.items():
+        for stage in ('sources', 'aggregators', 'sinks'):
+            for entry in execution.get(stage, []):
+                stacks = entry.get('stacks', None)
+                if not stacks or entry.get('replayed', False):
+                    continue
+
+                stacksfile = journalfile.with_name(
+                    '{}-{}-{}-{}.stacks.txt'.format(
+                        journalfile.stem, executed, stage, entry['id'],
+                    )
+                )
+                stacksfile.write_text(stacks, encoding='utf-8')
+                entry['stacks'] = str(stacksfile)
+
+
+def save_journal(journal, journalfile=None, journaldir=None, prefix=None):
+    """
+    Save a journal of the execution of a pipeline.
+
+    Stack dumps of components that timed out are saved to their own files
+    next to the journal file. See :func:`save_stacks`.
+
+    :param dict journal: The journal to save.
+    :param Path journalfile: Path to the file to save the journal to. If
+     ``None``, a new file with a unique name is created in ``journaldir``.
+    :param Path journaldir: Directory to create the new journal file in. If
+     ``None``, the ``flowbber/journals`` directory in the system's temporary
+     directory is used.
+    :param str prefix: Prefix of the name of the new journal file. If ``None``,
+     ``journal-<pid>-`` is used.
+
+    :return: The path to the saved journal.
+    :rtype: Path
+    """
+    if journalfile is not None:
+        journalfile.parent.mkdir(parents=True, exist_ok=True)
+
+    else:
+        if journaldir is None:
+            journaldir = Path(gettempdir()) / 'flowbber' / 'journals'
+        journaldir.mkdir(parents=True, exist_ok=True)
+
+        if prefix is None:
+            prefix = 'journal-{}-'.format(getpid())
+
+        # Reserve a unique name
+        with NamedTemporaryFile(
+            prefix=prefix,
+            suffix='.json',
+            dir=str(journaldir),
+            delete=False
+        ) as jfd:
+            journalfile = Path(jfd.name)
+
+    save_stacks(journal, journalfile)
+
+    journalfile.write_text(
+        dumps(journal, indent=4, ensure_ascii=False),
+        encoding='utf-8',
+    )
+    return journalfile
+
+
 def main(args):
     """
     Application main function.
@@ -59,11 +138,20 @@ def main(args):
     log.info('Loading pipeline definition from {} ...'.format(
         args.pipeline
     ))
-    pipeline_definition = load_pipeline(args.pipeline)
+    pipeline_definition = load_pipeline(
+        args.pipeline, cache=args.cache,
+    )
 
     # Instance pipeline
     log.info('Creating pipeline ...')
-    pipeline = Pipeline(pipeline_definition, args.pipeline.stem)
+    pipeline = Pipeline(
+        pipeline_definition, args.pipeline.stem,
+        snapshot=Snapshot(args.snapshot) if args.snapshot else None,
+        replay=Snapshot(args.replay) if args.replay else None,
+        only_failed=args.only_failed,
+        tracer=Tracer() if args.trace else None,
+        history=History(str(args.pipeline)),
+    )
 
     # Check if scheduling was configured
     schedule = pipeline_definition.get('schedule', None)
@@ -71,16 +159,24 @@ def main(args):
     if schedule is None:
         runner = pipeline
 
+        if args.reload:
+            log.warning('Reload ignored, pipeline has no schedule')
+
     else:
         # A scheduler was requested, create it
         log.info('Creating scheduler for pipeline ...')
 
+        reloader = None
+        if args.reload:
+            reloader = Reloader(args.pipeline, cache=args.cache)
+
         runner = Scheduler(
             pipeline,
             schedule['frequency'],
             samples=schedule['samples'],
             start=schedule['start'],
             stop_on_failure=schedule['stop_on_failure'],
+            reloader=reloader,
         )
 
     # Everything is ready, do not run if dry run
@@ -88,35 +184,22 @@ def main(args):
         log.info('Dry run complete! Exiting ...')
         return 0
 
-    # Run pipeline
-    journal = runner.run()
+    # Run pipeline, saving the trace even if it fails
+    try:
+        journal = runner.run()
+    finally:
+        if pipeline.tracer is not None:
+            pipeline.tracer.save(args.trace)
 
     # Save journal
     log.info('Saving journal ...')
-    if args.journal:
-        journalfile = Path(args.journal)
-        journalfile.parent.mkdir(parents=True, exist_ok=True)
-        journalfile.write_text(
-            dumps(journal, indent=4, ensure_ascii=False),
-            encoding='utf-8',
-        )
-    else:
-        journaldir = Path(gettempdir()) / 'flowbber' / 'journals'
-        journaldir.mkdir(parents=True, exist_ok=True)
-        with NamedTemporaryFile(
-            mode='wt',
-            encoding='utf-8',
-            prefix='journal-{}-'.format(getpid()),
-            suffix='.json',
-            dir=str(journaldir),
-            delete=False
-        ) as jfd:
-            jfd.write(dumps(journal, indent=4, ensure_ascii=False))
-        journalfile = Path(jfd.name)
-
+    journalfile = save_journal(
+        journal,
+        journalfile=Path(args.journal) if args.journal else None,
+    )
     log.info('Journal saved to {}'.format(journalfile))
 
     return 0
 
 
-__all__ = ['main']
+__all__ = ['save_stacks', 'save_journal', 'main']
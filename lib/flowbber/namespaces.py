@@ -22,6 +22,7 @@ Namespaces for variables replacement.
 from re import match
 from os import environ
 from collections import namedtuple
+from collections.abc import Mapping
 
 
 from .schema import SLUG_REGEX
@@ -31,35 +32,105 @@ from .logging import get_logger
 log = get_logger(__name__)
 
 
+class LazyNamespace:
+    """
+    Namespace object whose attributes are computed only when accessed for the
+    first time.
+
+    :param str name: Name of the namespace.
+    :param function lookup: Function that receives the name of an attribute and
+     returns its value. It must raise :py:exc:`AttributeError` if the
+     attribute is unknown.
+    :param bool secret: Values could be secrets and thus shouldn't be printed.
+    """
+
+    def __init__(self, name, lookup, secret=False):
+        self._name = name
+        self._lookup = lookup
+        self._secret = secret
+        self._values = {}
+
+    def __getattr__(self, key):
+        # Do not try to compute private attributes, this also avoids infinite
+        # recursion when the object is being copied or unpickled
+        if key.startswith('_'):
+            raise AttributeError(key)
+
+        if key not in self._values:
+            self._values[key] = self._lookup(key)
+        return self._values[key]
+
+    def __str__(self):
+        return '{}({})'.format(self._name, ', '.join(
+            '{}={!r}'.format(key, '****' if self._secret else value)
+            for key, value in self._values.items()
+        ))
+
+    def __repr__(self):
+        return str(self)
+
+
+class Namespaces(Mapping):
+    """
+    Read-only mapping of the name of the namespaces with the namespace objects.
+
+    Namespace objects are created only when requested for the first time.
+
+    :param dict factories: Dictionary mapping the name of the namespace with
+     the function that creates it.
+    :param Path path: Path to the pipeline definition file.
+    """
+
+    def __init__(self, factories, path):
+        self._factories = factories
+        self._path = path
+        self._namespaces = {}
+
+    def __getitem__(self, key):
+        if key not in self._namespaces:
+            factory = self._factories[key]
+            self._namespaces[key] = factory(self._path)
+        return self._namespaces[key]
+
+    def __iter__(self):
+        return iter(self._factories)
+
+    def __len__(self):
+        return len(self._factories)
+
+
 def namespace_env(path):
     """
     Fetch data from the environment.
 
+    Environment variables are read only when accessed. Any environment
+    variable whose name doesn't match :data:`flowbber.schema.SLUG_REGEX` is
+    considered unsafe and is not available.
+
     :param Path path: Path to the pipeline definition file.
 
-    :return: A named tuple with information from the environment.
-    :rtype: namedtuple
+    :return: A namespace with information from the environment.
+    :rtype: :class:`LazyNamespace`
     """
 
-    env_safe = {key for key in environ.keys() if match(SLUG_REGEX, key)}
-    env_available = set(environ.keys())
-    env_ignored = env_available - env_safe
+    def lookup(key):
+        if not match(SLUG_REGEX, key):
+            log.debug(
+                'Environment variable unsafe to load: {}'.format(key)
+            )
+            raise AttributeError(
+                'Unsafe environment variable name {}'.format(key)
+            )
 
-    if env_ignored:
-        log.debug('Environment variables unsafe to load: {}'.format(
-            sorted(env_ignored)
-        ))
+        if key not in environ:
+            raise AttributeError(
+                'No such environment variable {}'.format(key)
+            )
 
-    env_type = namedtuple(
-        'env',
-        env_safe
-    )
-    env = env_type(**{key: environ[key] for key in env_safe})
+        log.debug('env namespace: {} = ****'.format(key))
+        return environ[key]
 
-    log.debug('env namespace: {}'.format(env._replace(
-        **{key: '****' for key in env_safe}
-    )))
-    return env
+    return LazyNamespace('env', lookup, secret=True)
 
 
 def namespace_pipeline(path):
@@ -101,9 +172,11 @@ def namespace_git(path):
     Fetch information relative to the git vcs versioning the pipeline
     definition file, if any.
 
+    Values are fetched from git only when accessed.
+
     :param Path path: Path to the pipeline definition file.
 
-    :return: A named tuple with information about the git vcs.
+    :return: A namespace with information about the git vcs.
 
      Values available:
 
@@ -111,41 +184,47 @@ def namespace_git(path):
      - branch : current branch.
      - rev : current revision hash.
 
-    :rtype: namedtuple
+     Accessing any of them will fail if the pipeline definition file is not
+     versioned in a git repository.
+
+    :rtype: :class:`LazyNamespace`
     """
 
-    from .utils.git import (
-        find_root, find_branch, find_revision,
-        GitNotFound, GitError,
-    )
+    from .utils.git import find_head, find_revision, GitNotFound, GitError
 
-    parent = str(path.parent)
-
-    # Try to determine git namespace
-    try:
-        root = find_root(directory=parent)
-        branch = find_branch(directory=parent)
-        rev = find_revision(directory=parent)
-    except GitError as e:
-        log.debug(str(e))
-        return None
-    except GitNotFound:
-        return None
-
-    # Create git namespace object
-    git_type = namedtuple(
-        'git',
-        ['root', 'branch', 'rev']
-    )
+    directory = str(path.parent)
+    head = {}
 
-    git = git_type(
-        root=root,
-        branch=branch,
-        rev=rev,
-    )
+    def lookup(key):
+        try:
+            # Root and branch are determined with the same call
+            if key in ('root', 'branch'):
+                if not head:
+                    head['root'], head['branch'] = find_head(
+                        directory=directory
+                    )
+                value = head[key]
+
+            elif key == 'rev':
+                value = find_revision(directory=directory)
+
+            else:
+                raise AttributeError(
+                    'Unknown git namespace value {}'.format(key)
+                )
 
-    log.debug('git namespace: {}'.format(git))
-    return git
+        except (GitError, GitNotFound) as e:
+            log.debug(str(e))
+            raise AttributeError(
+                'Unable to determine git {} for {}: {}'.format(
+                    key, directory, e,
+                )
+            )
+
+        log.debug('git namespace: {} = {}'.format(key, value))
+        return value
+
+    return LazyNamespace('git', lookup)
 
 
 def get_namespaces(path):
@@ -159,18 +238,25 @@ def get_namespaces(path):
     - git : fetch information relative to the git vcs versioning the pipeline
       definition file, if any.
 
+    Namespaces are created the first time they are accessed, and their values
+    are fetched only when used. So a pipeline definition that doesn't
+    reference, for example, the ``git`` namespace won't call git at all.
+
+    Use it with :py:meth:`str.format_map`, as unpacking the mapping will
+    create all the namespaces.
+
     :param Path path: Path to the pipeline definition file.
 
-    :return: A dictionary mapping the name of the namespace with the class
+    :return: A mapping of the name of the namespace with the object
      implementing it.
-    :rtype: dict
+    :rtype: :class:`Namespaces`
     """
 
-    return {
-        'env': namespace_env(path),
-        'pipeline': namespace_pipeline(path),
-        'git': namespace_git(path),
-    }
+    return Namespaces({
+        'env': namespace_env,
+        'pipeline': namespace_pipeline,
+        'git': namespace_git,
+    }, path)
 
 
 __all__ = ['get_namespaces']
@@ -21,11 +21,17 @@ Base class for Flowbber pipeline.
 
 from time import time
 from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing.connection import wait
 
 from setproctitle import setproctitle
 
 from .logging import get_logger
+from .history import History
+from .schema import AUTO_TIMEOUT
+from .utils.resources import summarize_usage
 from .components import CrashError, TimeExceededError
+from .components.base import SUCCEEDED_STATUSES
 from .loaders import SourcesLoader, AggregatorsLoader, SinksLoader
 
 
@@ -47,17 +53,57 @@ class Pipeline:
     :param str name: Name of the pipeline. Used only for pretty printing only.
     :param str app: Name of the application running the pipeline. This name
      is used mainly to set the process name and the journals directory.
+    :param dict loaders: Plugin loaders to use, indexed by component name
+     (``source``, ``aggregator`` and ``sink``). Allows to share the loaders,
+     and the plugins they already discovered, between several pipelines.
+     If ``None``, new loaders are created.
+    :param workers: Pool of workers to execute the remote components. Allows
+     to share a pool between several pipelines. If ``None``, a pool is created
+     from the ``workers`` section of the pipeline definition, if any.
+    :type workers: :class:`flowbber.workers.WorkerPool`
+    :param snapshot: Snapshot to save the data collected by the sources and
+     the aggregators to. If ``None``, no snapshot is saved.
+    :type snapshot: :class:`flowbber.snapshot.Snapshot`
+    :param replay: Snapshot to replay. If given, the sources are not executed
+     and the data they collected in the snapshot is used instead.
+    :type replay: :class:`flowbber.snapshot.Snapshot`
+    :param bool only_failed: When replaying a snapshot, execute only the
+     components that didn't succeed in the execution that saved it.
+    :param tracer: Tracer to record the timeline of the executions to. If
+     ``None``, no timeline is recorded.
+    :type tracer: :class:`flowbber.trace.Tracer`
+    :param history: History of the durations of the components, used to
+     derive the timeouts of the components with an ``auto`` timeout. If
+     ``None``, a history keyed by the name of the pipeline is used.
+    :type history: :class:`flowbber.history.History`
     """
 
-    def __init__(self, pipeline, name, app='flowbber'):
+    def __init__(
+            self, pipeline, name, app='flowbber',
+            loaders=None, workers=None,
+            snapshot=None, replay=None, only_failed=False,
+            tracer=None, history=None):
         super().__init__()
 
         self._pipeline = pipeline
         self._name = name
         self._app = app
+        self._loaders = loaders or {}
+
+        self._snapshot = snapshot
+        self._replay = replay
+        self._only_failed = only_failed
+        self._sources_executed = True
+        self._tracer = tracer
+        self._history = history
 
         self._executed = 0
         self._data = OrderedDict()
+        self._built = {}
+        self._budgets = {}
+        self._adaptive = {}
+
+        self._setup_workers(workers)
 
         log.info('Loading plugins ...')
         self._load_plugins()
@@ -79,6 +125,14 @@ class Pipeline:
         """
         return self._executed
 
+    @property
+    def tracer(self):
+        """
+        Tracer recording the timeline of the executions of this pipeline, if
+        any.
+        """
+        return self._tracer
+
     def __str__(self):
         return '\n'.join([
             '[Pipeline:{}]',
@@ -97,6 +151,62 @@ class Pipeline:
     def __repr__(self):
         return str(self)
 
+    def _setup_workers(self, workers):
+        """
+        Set the pool of workers used by the remote components.
+
+        :param workers: Pool of workers to use. If ``None``, a pool is created
+         from the ``workers`` section of the pipeline definition, if any.
+        :type workers: :class:`flowbber.workers.WorkerPool`
+        """
+        self._workers = workers
+
+        definition = self._pipeline.get('workers', None)
+        if self._workers is None and definition is not None:
+            from .workers import WorkerPool
+            self._workers = WorkerPool(
+                definition['addresses'], authkey=definition['authkey'],
+            )
+
+    def update(self, pipeline, workers=None):
+        """
+        Update this pipeline to a new pipeline definition.
+
+        Components whose definition, position and plugin class didn't change
+        keep their current instance. Only new or modified components are
+        created. If the update fails, the pipeline is left unchanged.
+
+        :param dict pipeline: The new pipeline definition data structure.
+        :param workers: Pool of workers to execute the remote components. If
+         ``None`` and the ``workers`` section of the pipeline definition didn't
+         change, the current pool is kept.
+        :type workers: :class:`flowbber.workers.WorkerPool`
+
+        :return: The number of components that were created.
+        :rtype: int
+        """
+        previous = (self._pipeline, self._workers)
+
+        if workers is None and (
+            pipeline.get('workers', None) ==
+            self._pipeline.get('workers', None)
+        ):
+            workers = self._workers
+
+        try:
+            self._pipeline = pipeline
+            self._setup_workers(workers)
+
+            log.info('Loading plugins ...')
+            self._load_plugins()
+
+            log.info('Updating pipeline ...')
+            return self._build_pipeline()
+
+        except Exception:
+            self._pipeline, self._workers = previous
+            raise
+
     def _load_plugins(self):
         """
         Load all plugins available.
@@ -124,7 +234,7 @@ class Pipeline:
             ('aggregator', AggregatorsLoader),
             ('sink', SinksLoader),
         ):
-            loader = loader_clss()
+            loader = self._loaders.get(component, None) or loader_clss()
             available = loader.load_plugins()
 
             setattr(self, '_{}s_loader'.format(component), loader)
@@ -148,7 +258,18 @@ class Pipeline:
             self._sources
             self._aggregators
             self._sinks
+
+        Instances from a previous build are reused if the component's
+        definition, position, plugin class, resource class and pool of workers
+        are the same.
+
+        :return: The number of component instances created.
+        :rtype: int
         """
+        built = {}
+        stages = {}
+        budgets = {}
+        adaptive = {}
 
         for component_name in ['source', 'aggregator', 'sink']:
             destination = []
@@ -173,6 +294,49 @@ class Pipeline:
 
                 clss = available[component_type]
 
+                resources = None
+                if component.get('resources', None) is not None:
+                    resources = self._pipeline.get('resources', {}).get(
+                        component['resources'], None
+                    )
+                    if resources is None:
+                        raise ValueError(
+                            'Unknown resource class "{}" for {} #{} with id '
+                            '"{}"'.format(
+                                component['resources'],
+                                component_name,
+                                index,
+                                component_id,
+                            )
+                        )
+
+                key = (component_name, component_id)
+
+                if component.get('budget', None) is not None:
+                    budgets[key] = component['budget']
+
+                # Adaptive timeouts are set before each execution
+                timeout = component.get('timeout', None)
+                if timeout == AUTO_TIMEOUT:
+                    adaptive[key] = component.get('timeout_factor', 3.0)
+                    timeout = None
+
+                signature = (
+                    index, component, clss, resources,
+                    self._workers if component.get('remote', False) else None,
+                )
+
+                previous = self._built.get(key, None)
+                if previous is not None and previous[0] == signature:
+                    instance = previous[1]
+                    built[key] = previous
+                    destination.append(instance)
+
+                    log.info('Reusing {} instance {}'.format(
+                        component_name, instance
+                    ))
+                    continue
+
                 log.info(
                     'Creating an instance of {} for {} #{} of type "{}" with '
                     'id "{}" ...'.format(
@@ -190,7 +354,7 @@ class Pipeline:
                         component_type,
                         component_id,
                         optional=component.get('optional', False),
-                        timeout=component.get('timeout', None),
+                        timeout=timeout,
                         config=component.get('config', None),
                     )
                 except Exception as e:
@@ -206,6 +370,22 @@ class Pipeline:
                     )
                     raise e
 
+                if resources is not None:
+                    instance.constrain(resources)
+
+                if component.get('remote', False):
+                    if self._workers is None:
+                        raise ValueError(
+                            '{} #{} with id "{}" is marked as remote but no '
+                            'workers were defined'.format(
+                                component_name.capitalize(),
+                                index,
+                                component_id,
+                            )
+                        )
+                    instance.delegate(self._workers)
+
+                built[key] = (signature, instance)
                 destination.append(instance)
 
                 log.info('Created {} instance {}'.format(
@@ -216,7 +396,23 @@ class Pipeline:
                 component_name, len(destination)
             ))
 
+            stages[component_name] = destination
+
+        created = sum(
+            1 for key, (_, instance) in built.items()
+            if self._built.get(key, (None, None))[1] is not instance
+        )
+
+        for component_name, destination in stages.items():
             setattr(self, '_{}s'.format(component_name), destination)
+        self._built = built
+        self._budgets = budgets
+        self._adaptive = adaptive
+
+        if adaptive and self._history is None:
+            self._history = History(self._name)
+
+        return created
 
     def _categorize_log(self, log):
         """
@@ -270,17 +466,50 @@ class Pipeline:
         aggregatorslog = []
         sinkslog = []
 
-        setproctitle('{} - running sources'.format(self._app))
-        log.info('Running sources ...')
-        self._run_sources(sourceslog)
-
-        setproctitle('{} - running aggregators'.format(self._app))
-        log.info('Running aggregators ...')
-        self._run_aggregators(aggregatorslog)
+        snapshot = self._snapshot
+        if snapshot is not None and (
+            self._replay is None or
+            self._replay.directory != snapshot.directory
+        ):
+            snapshot.clear()
 
-        setproctitle('{} - running sinks'.format(self._app))
-        log.info('Running sinks ...')
-        self._run_sinks(sinkslog)
+        try:
+            setproctitle('{} - running sources'.format(self._app))
+            log.info('Running sources ...')
+            try:
+                with self._stage('sources'):
+                    self._run_sources(sourceslog)
+            finally:
+                # Save the data of the sources that succeeded even on
+                # failure, to allow replaying only the sources that failed
+                if snapshot is not None:
+                    snapshot.save_data('sources', self._data)
+
+            setproctitle('{} - running aggregators'.format(self._app))
+            log.info('Running aggregators ...')
+            with self._stage('aggregators'):
+                self._run_aggregators(aggregatorslog)
+
+            if snapshot is not None:
+                snapshot.save_data('aggregators', self._data)
+
+            setproctitle('{} - running sinks'.format(self._app))
+            log.info('Running sinks ...')
+            with self._stage('sinks'):
+                self._run_sinks(sinkslog)
+
+        finally:
+            if self._history is not None:
+                self._history.save()
+
+            # Save the entries even on failure, to allow replaying only the
+            # components that failed
+            if snapshot is not None:
+                snapshot.save_journal(OrderedDict((
+                    ('sources', sourceslog),
+                    ('aggregators', aggregatorslog),
+                    ('sinks', sinkslog),
+                )))
 
         setproctitle('{} - done'.format(self._app))
         end = time()
@@ -308,10 +537,120 @@ class Pipeline:
                         ('aggregators', len(aggregatorslog)),
                         ('sinks', len(sinkslog)),
                     ))),
+                    ('usage', OrderedDict(
+                        (stage, summarize_usage(
+                            entry.get('usage', None) for entry in stagelog
+                        ))
+                        for stage, stagelog in (
+                            ('sources', sourceslog),
+                            ('aggregators', aggregatorslog),
+                            ('sinks', sinkslog),
+                        )
+                    )),
                 ))),
             ))),
         ))
 
+    @contextmanager
+    def _stage(self, stage):
+        """
+        Record the span of a stage of the pipeline, and the barrier at its
+        end, in the timeline.
+
+        :param str stage: Name of the stage.
+        """
+        if self._tracer is None:
+            yield
+            return
+
+        begin = time()
+        try:
+            yield
+        finally:
+            end = time()
+            args = {'executed': self._executed}
+            self._tracer.span(stage, 'stage', begin, end, args=args)
+            self._tracer.instant(
+                '{} barrier'.format(stage), 'barrier', end, args=args,
+            )
+
+    def _adapt(self, name, component):
+        """
+        Set the timeout of a component with an ``auto`` timeout from the
+        history of its durations.
+
+        :param str name: Kind of the component.
+        :param component: The component about to be started.
+        :type component: :class:`flowbber.components.base.Component`
+        """
+        factor = self._adaptive.get((name, component.id), None)
+        if factor is None:
+            return
+
+        timeout = self._history.timeout(name, component.id, factor)
+        if timeout is None:
+            log.info(
+                'Not enough history to derive the timeout of {} #{} "{}". '
+                'Running it without timeout ...'.format(
+                    name, component.index, component.id,
+                )
+            )
+        else:
+            log.info(
+                'Timeout of {} #{} "{}" derived from its history is {:.4f} '
+                'seconds'.format(
+                    name, component.index, component.id, timeout,
+                )
+            )
+
+        component.adapt(timeout)
+
+    def _completed(self, components):
+        """
+        Yield running components in the order their execution ends.
+
+        Components are yielded as soon as their result is available, their
+        driving process ends (or the remote worker replies) or their timeout
+        expires, whatever happens first, so they can be joined right away.
+
+        :param list components: Collection of started components.
+
+        :return: A generator of components.
+        :rtype: generator
+        """
+        pending = list(components)
+
+        while pending:
+            sentinels = [
+                component.sentinels for component in pending
+            ]
+
+            timeout = None
+            deadlines = [
+                component.deadline for component in pending
+                if component.deadline is not None
+            ]
+            if deadlines:
+                timeout = max(0.0, min(deadlines) - time())
+
+            # Components that couldn't be submitted have nothing to wait for
+            ready = set()
+            if all(sentinels):
+                ready = set(wait(
+                    [handle for handles in sentinels for handle in handles],
+                    timeout,
+                ))
+
+            now = time()
+            for component, handles in zip(list(pending), sentinels):
+                if not handles or any((
+                    any(handle in ready for handle in handles),
+                    component.deadline is not None and
+                    component.deadline <= now,
+                )):
+                    pending.remove(component)
+                    yield component
+
     def _run_components(
         self, name, components, journal,
         mutator, provider,
@@ -320,7 +659,9 @@ class Pipeline:
         """
         Main function to run a collection of components.
 
-        Components can be run sequentially or in parallel.
+        Components can be run sequentially or in parallel. When run in
+        parallel, components are joined in the order they finish, so a failure
+        of a non-optional component stops the remaining ones immediately.
 
         :param str name: Name of the component type to run.
         :param list components: Collection of components.
@@ -355,18 +696,20 @@ class Pipeline:
                 )
             )
             args = provider(accumulator, component)
+            self._adapt(name, component)
             component.start(*args)
 
         # Start components in parallel if requested
         if parallel:
 
-            # Re-order components using timeout in ascending order
-            schedule = sorted(components)
-
             for component in components:
                 start(component)
 
+            # Join components in completion order
+            schedule = self._completed(components)
+
         # Join components according to schedule
+        failure = None
         for component in schedule:
 
             # Start components in series if requested
@@ -380,8 +723,29 @@ class Pipeline:
                 )
             )
 
+            joining = time()
             try:
                 execution = component.join()
+
+                if self._tracer is not None:
+                    self._tracer.component(
+                        name, component, execution, joining, time(),
+                    )
+
+                budget = self._budgets.get((name, component.id), None)
+                if budget is not None and execution.duration > budget:
+                    execution.status = 'slow'
+                    log.warning(
+                        '{name} #{component.index} "{component.id}" took '
+                        '{execution.duration:.4f} seconds, exceeding its '
+                        'budget of {budget} seconds'.format(
+                            name=name.capitalize(),
+                            component=component,
+                            execution=execution,
+                            budget=budget,
+                        )
+                    )
+
                 accumulator = mutator(
                     accumulator, component, execution.data
                 )
@@ -399,6 +763,11 @@ class Pipeline:
             except (CrashError, TimeExceededError) as e:
                 execution = e.execution
 
+                if self._tracer is not None:
+                    self._tracer.component(
+                        name, component, execution, joining, time(),
+                    )
+
                 errmsg = (
                     'Process PID {execution.pid} for {name} '
                     '#{component.index} "{component.id}" {execution.status} '
@@ -411,6 +780,12 @@ class Pipeline:
 
                 if not component.optional:
 
+                    # The journal may not be saved, log the stacks instead
+                    if execution.stacks:
+                        errmsg += '. Stacks before killing it:\n{}'.format(
+                            execution.stacks
+                        )
+
                     log.fatal(errmsg)
                     log.fatal('Pipeline is shutting down ...')
 
@@ -418,26 +793,36 @@ class Pipeline:
                     # This avoids a deadlock condition were still alive child
                     # processes try to put data to a queue but the master
                     # process is shuting down and blocked at waitpid() call.
-                    for component in schedule:
+                    for other in components:
                         try:
-                            component.stop()
+                            other.stop()
                         except Exception:
                             log.exception(
                                 'Component {} crashed when stopping.'.format(
-                                    component
+                                    other
                                 )
                             )
                             continue
-                    raise
 
-                log.warning(errmsg)
-                log.warning(
-                    '{name} #{component.index} "{component.id}" is marked as '
-                    'optional. Keep going...'.format(
-                        name=name.capitalize(),
-                        component=component,
+                    # Raise after adding the entry to the journal, so it is
+                    # saved in the snapshot, if any
+                    failure = e
+
+                else:
+                    log.warning(errmsg)
+                    log.warning(
+                        '{name} #{component.index} "{component.id}" is marked '
+                        'as optional. Keep going...'.format(
+                            name=name.capitalize(),
+                            component=component,
+                        )
                     )
-                )
+
+            # Timeouts are a lower bound of the duration, record them too so
+            # adaptive timeouts grow if the component becomes slower
+            if (name, component.id) in self._adaptive and \
+                    execution.duration is not None:
+                self._history.record(name, component.id, execution.duration)
 
             # Add entry to the journal
             journal_entry = {
@@ -450,44 +835,130 @@ class Pipeline:
                 'status': execution.status,
                 'exitcode': execution.exitcode,
                 'duration': execution.duration,
+                'timeout': component.timeout,
+                'budget': self._budgets.get((name, component.id), None),
+                'usage': execution.usage,
+                'stacks': execution.stacks,
+                'worker': component.worker,
             }
             journal.append(journal_entry)
 
+            if failure is not None:
+                raise failure
+
         return accumulator
 
+    def _replayed(self, stage, components, journal):
+        """
+        Find the components of a stage that don't need to be executed because
+        their result is available in the replayed snapshot.
+
+        The journal entries of those components in the snapshot, if any, are
+        added to the journal, marked as replayed.
+
+        :param str stage: Name of the stage.
+        :param list components: Components of the stage.
+        :param list journal: Journal to add the replayed entries.
+
+        :return: The ids of the components that don't need to be executed.
+        :rtype: set
+        """
+        previous = self._replay.load_journal(stage)
+        replayed = set()
+
+        for component in components:
+            entry = previous.get(component.id, None)
+
+            if self._only_failed and (
+                entry is None or entry['status'] not in SUCCEEDED_STATUSES
+            ):
+                continue
+
+            replayed.add(component.id)
+            if entry is not None:
+                entry['replayed'] = True
+                journal.append(entry)
+
+        if replayed:
+            log.info('Replaying {} {}: {}'.format(
+                len(replayed), stage, ', '.join(sorted(replayed)),
+            ))
+
+        return replayed
+
     def _run_sources(self, journal):
         """
         Run the sources of the pipeline.
+
+        When replaying a snapshot, only the sources that didn't succeed are
+        executed if requested, and none otherwise.
+
+        If a source fails, the data of the sources that succeeded is kept in
+        the data bundle before raising.
         """
 
+        # Collected outside of the accumulator to keep the data of the
+        # sources that succeeded if another one fails
+        results = OrderedDict()
+
         def mutator(accumulator, component, data):
-            if accumulator is None:
-                accumulator = OrderedDict()
-            accumulator[component.id] = data
-            return accumulator
+            results[component.id] = data
+            return results
 
         def provider(accumulator, component):
             return ()
 
-        results = self._run_components(
-            'source', self._sources, journal,
-            mutator, provider,
-            parallel=True
-        )
+        sources = self._sources
+        replayed = OrderedDict()
+
+        if self._replay is not None:
+            replayed = self._replay.load_data('sources')
+            skip = self._replayed('sources', sources, journal)
+            sources = [
+                source for source in sources if source.id not in skip
+            ]
 
-        # Re-order data from scheduling
-        for source in self._sources:
-            if source.id in results:
-                self._data[source.id] = results[source.id]
+        self._sources_executed = bool(sources)
+
+        try:
+            self._run_components(
+                'source', sources, journal,
+                mutator, provider,
+                parallel=True
+            )
+
+        finally:
+            # Re-order data from scheduling
+            for source in self._sources:
+                if source.id in results:
+                    self._data[source.id] = results[source.id]
+                elif source.id in replayed:
+                    self._data[source.id] = replayed[source.id]
 
     def _run_aggregators(self, journal):
         """
         Run the aggregators of the pipeline.
+
+        When replaying only the components that failed, the aggregators are
+        skipped if all of them succeeded, no source was executed again and
+        the snapshot has the data resulting from them.
         """
 
         if not self._aggregators:
             return
 
+        if self._replay is not None and self._only_failed and all((
+            not self._sources_executed,
+            self._replay.has_data('aggregators'),
+        )):
+            replayed = []
+            skip = self._replayed('aggregators', self._aggregators, replayed)
+
+            if len(skip) == len(self._aggregators):
+                journal.extend(replayed)
+                self._data = self._replay.load_data('aggregators')
+                return
+
         def mutator(accumulator, component, data):
             return data
 
@@ -505,6 +976,9 @@ class Pipeline:
     def _run_sinks(self, journal):
         """
         Run the sinks of the pipeline.
+
+        When replaying only the components that failed, the sinks that
+        succeeded are skipped.
         """
 
         def mutator(accumulator, component, data):
@@ -513,8 +987,14 @@ class Pipeline:
         def provider(accumulator, component):
             return (self._data, )
 
+        sinks = self._sinks
+
+        if self._replay is not None and self._only_failed:
+            skip = self._replayed('sinks', sinks, journal)
+            sinks = [sink for sink in sinks if sink.id not in skip]
+
         self._run_components(
-            'sink', self._sinks, journal,
+            'sink', sinks, journal,
             mutator, provider,
             parallel=True
         )
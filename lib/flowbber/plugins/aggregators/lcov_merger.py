@@ -23,6 +23,11 @@ Lcov merger
 Merge two or more coverage tracefiles created with lcov_ into one new
 tracefile.
 
+The tracefiles are parsed in parallel and their line, branch and function
+counters are added in memory, without calling lcov. The merged tracefile is
+written once, and the coverage is computed from the merged counters, in the
+same format as the Lcov source.
+
 .. _lcov: http://ltp.sourceforge.net/coverage/lcov.php
 
 **Data produced**
@@ -34,23 +39,32 @@ tracefile.
             "my_source_code.c": {
                 "total_statements": 40,
                 "total_misses": 20,
-                "branch_rate": 0.5,
-                "total_hits": 8,
-                "line_rate": 0.5
+                "total_hits": 20,
+                "total_branches": 4,
+                "total_branches_hit": 2,
+                "line_rate": 0.5,
+                "branch_rate": 0.5
             },
             "another_source.c": {
                 "total_statements": 40,
                 "total_misses": 40,
-                "branch_rate": 0.5,
-                "total_hits": 8,
-                "line_rate": 0.0
+                "total_hits": 0,
+                "total_branches": 0,
+                "total_branches_hit": 0,
+                "line_rate": 0.0,
+                "branch_rate": 0.0
             }
         },
         "total": {
             "total_statements": 80,
-            "total_misses": 20,
-            "line_rate": 0.75
+            "total_misses": 60,
+            "total_hits": 20,
+            "total_branches": 4,
+            "total_branches_hit": 2,
+            "line_rate": 0.25,
+            "branch_rate": 0.5
         },
+        "ignored": [],
         "tracefile": "<path-to-tracefile.info>"
     }
 
@@ -71,7 +85,6 @@ tracefile.
         [aggregators.config]
         keys = ["lcov_source_1","lcov_source_2", "..."]
         allow_missing_keys = true
-        rc_overrides = ["lcov_branch_coverage=1"]
         remove = ["*hello2*"]
 
 .. code-block:: json
@@ -84,7 +97,6 @@ tracefile.
                 "config": {
                     "keys": ["lcov_source_1","lcov_source_2", "..."],
                     "allow_missing_keys": true,
-                    "rc_overrides": ["lcov_branch_coverage=1"],
                     "remove": ["*hello2*"]
                 }
             }
@@ -143,6 +155,12 @@ Override lcov configuration file settings.
 
 Elements should have the form ``SETTING=VALUE``.
 
+.. deprecated:: 1.12.0
+
+   The tracefiles are merged without calling lcov, so this option has no
+   effect and a warning is logged if it is set. It is kept for compatibility
+   with existing pipelines and will be removed in a future version.
+
 - **Default**: ``[]``
 - **Optional**: ``False``
 - **Schema**:
@@ -164,7 +182,10 @@ remove
 
 List of patterns of files to remove from coverage computation.
 
-Patterns will be interpreted as shell wild‐card patterns.
+Patterns will be interpreted as shell wild‐card patterns, matched against the
+full path of the files using Python's fnmatch_.
+
+.. _fnmatch: https://docs.python.org/3/library/fnmatch.html#fnmatch.fnmatch
 
 - **Default**: ``[]``
 - **Optional**: ``True``
@@ -184,14 +205,14 @@ Patterns will be interpreted as shell wild‐card patterns.
 
 """
 
-from shutil import which
-from pathlib import Path
+from os.path import relpath
 from tempfile import NamedTemporaryFile
 
-from flowbber.utils.command import run
 from flowbber.logging import get_logger
 from flowbber.components import Aggregator
-from flowbber.plugins.sources.lcov import LcovSource
+from flowbber.utils.filter import compile_patterns
+from flowbber.utils.lcov import merge_tracefiles, write_tracefile
+from flowbber.plugins.sources.lcov import summarize_records
 
 
 log = get_logger(__name__)
@@ -261,67 +282,46 @@ class LcovMergerAggregator(Aggregator):
                 )
             )
 
-        # Read all sources tracefiles paths
-        # Convert to something like:
-        #   /path/to/file.info --tracefile /path/to/another.info
-        tracefiles = '--add-tracefile {}'.format(
-            ' --add-tracefile '.join(
-                data[key]['tracefile']
-                for key in sorted(available, key=lambda e: keys.index(e))
-            )
-        )
+        if not available:
+            raise RuntimeError('Lcov merger has no tracefiles to merge')
 
-        # Read and concatenate all rc_overrides options
-        # Convert to something like:
-        #   --rc setting1=value1 --rc setting2=value2
-        rc_overrides = ''
-        if len(self.config.rc_overrides.value) > 0:
-            rc_overrides = '--rc {}'.format(
-                ' --rc '.join(self.config.rc_overrides.value)
+        if self.config.rc_overrides.value:
+            log.warning(
+                'The rc_overrides option of the Lcov merger is deprecated '
+                'and has no effect, tracefiles are merged without calling '
+                'lcov. Ignoring {}'.format(
+                    ', '.join(self.config.rc_overrides.value)
+                )
             )
 
-        # Check that lcov is installed on machine
-        lcov = which('lcov')
-        if lcov is None:
-            raise RuntimeError('lcov executable not found.')
-
-        # Create a tmp file to store the output tracefile
-        tmp_file = NamedTemporaryFile(suffix='.info')
-        tmp_file.close()
-
-        output_file = Path(tmp_file.name)
-
-        cmd = (
-            '{lcov} '
-            '{rc_overrides} '
-            '{tracefiles} '
-            '--output-file {output_file}'.format(
-                lcov=lcov,
-                rc_overrides=rc_overrides,
-                tracefiles=tracefiles,
-                output_file=output_file,
-            )
-        )
-        log.info('Merging coverage tracefiles: "{}"'.format(cmd))
-        status = run(cmd)
+        # Parse and merge all sources tracefiles
+        tracefiles = [
+            data[key]['tracefile']
+            for key in sorted(available, key=lambda e: keys.index(e))
+        ]
+        log.info('Merging coverage tracefiles: {}'.format(
+            ', '.join(tracefiles)
+        ))
+        merged = merge_tracefiles(tracefiles)
+
+        # Remove files from patterns
+        removed = compile_patterns(self.config.remove.value)
+        ignored = [
+            filename for filename in merged if removed(filename)
+        ]
+        for filename in ignored:
+            del merged[filename]
 
-        if status.returncode != 0:
-            raise RuntimeError(
-                'Lcov failed adding data:\n{}'.format(status.stderr)
-            )
+        # Write the merged tracefile
+        with NamedTemporaryFile(suffix='.info', delete=False) as output_file:
+            pass
+        write_tracefile(merged.values(), output_file.name)
 
-        # Call lcov source with the output file to processing it and
-        # create output data
-        lcov_src = LcovSource(
-            self._index, 'lcov', self._id,
-            config={
-                'source': str(output_file),
-                'rc_overrides': self.config.rc_overrides.value,
-                'remove': self.config.remove.value,
-            }
-        )
+        result = summarize_records(merged.values())
+        result['ignored'] = sorted(relpath(filename) for filename in ignored)
+        result['tracefile'] = output_file.name
 
-        data[self._id] = lcov_src.collect()
+        data[self._id] = result
 
 
 __all__ = ['LcovMergerAggregator']
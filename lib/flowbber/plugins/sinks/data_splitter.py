@@ -187,12 +187,11 @@ File format that will be used to store the data.
 """  # noqa
 
 from pathlib import Path
-from copy import deepcopy
-from fnmatch import fnmatch
-from collections import deque, OrderedDict
+from collections import OrderedDict
 
 from flowbber.components import FilterSink
 from flowbber.logging import get_logger
+from flowbber.utils.traverse import select, resolve, CONTAINERS
 
 
 log = get_logger(__name__)
@@ -259,66 +258,31 @@ class DataSplitterSink(FilterSink):
         # Filter data wanted by the user
         super().distribute(data)
 
-        # This function returns the data that will be used on the files
-        def data_finder(sub_data, patterns, id_selector):
-            pattern = patterns.popleft()
-            if isinstance(sub_data, list):
-                sub_data = OrderedDict(enumerate(sub_data))
-
-            if pattern == '*':
-                # Substitute the wildcard with the corresponding id
-                pattern = id_selector
-
-            try:
-                # End of the data selector return the data subtree
-                if not patterns:
-                    return sub_data[pattern]
-                else:
-                    return data_finder(
-                        sub_data[pattern], patterns, id_selector
-                    )
-            except KeyError as e:
-                raise KeyError(
-                    'During the data search, the key "{}" is not present in'
-                    ' the data. The data is: {}'.format(key, sub_data)
-                ) from e
+        # Find the names that will be used on the files
+        id_patterns = self.config.id_selector.value.split('.')
+        ids = []
 
-        # This function returns the names that will be used on the files
-        def ids_finder(key, sub_data, patterns, ids):
-            pattern = patterns.popleft()
+        def leaf(key, value, depth):
+            # The id selector reached a value before its last level, use
+            # the value as the filename
+            ids.append(str(value))
 
-            if not fnmatch(str(key), pattern):
-                return
+        for key, value in select(data, id_patterns, leaf=leaf):
 
             # The user wants to use dict keys as the filenames
-            if not patterns and pattern == '*':
+            if id_patterns[-1] == '*':
                 ids.append(key)
-                return
-
-            # Keep searching...
-            scalar = True
-            if isinstance(sub_data, dict):
-                scalar = False
-                data_iter = sub_data.items()
-            elif isinstance(sub_data, list):
-                scalar = False
-                data_iter = enumerate(sub_data)
+                continue
 
             # The user wants to use a dict value as the filename
-            if scalar:
-                ids.append(str(sub_data))
-            else:
-                for key, sub_dict in data_iter:
-                    ids_finder(
-                        key, sub_dict, deepcopy(patterns), ids
+            if isinstance(value, CONTAINERS):
+                raise ValueError(
+                    'The id selector "{}" selects a collection and not a '
+                    'value at key "{}"'.format(
+                        self.config.id_selector.value, key,
                     )
-
-        ids = []
-        for key, value in data.items():
-            ids_finder(
-                key, value, deque(self.config.id_selector.value.split('.')),
-                ids
-            )
+                )
+            ids.append(str(value))
 
         log.info(
             'The IDs chosen are: {}'.format(
@@ -334,12 +298,15 @@ class DataSplitterSink(FilterSink):
         #   id_2: {...},
         #   ....
         # }
+        #
+        # The wildcards of the data selector are substituted with the
+        # corresponding id. Data is not modified, so it is not copied.
+        data_patterns = self.config.data_selector.value.split('.')
         ids_data_map = {
-            identifier: data_finder(
-                deepcopy(data),
-                deque(self.config.data_selector.value.split('.')),
-                identifier
-            ) for identifier in ids
+            identifier: resolve(data, [
+                identifier if pattern == '*' else pattern
+                for pattern in data_patterns
+            ]) for identifier in ids
         }
 
         file_format = self.config.format.value
@@ -42,7 +42,9 @@ To accomplish this, the flattening process will:
   boolean or None) is found.
 
 - Lists are converted to a dictionary that maps the index of the element
-  with the element previous to the flattening.
+  with the element previous to the flattening. By default, the key of the
+  list is dropped and its elements are stored under the key of its parent.
+  Enable the ``listkeys`` option to keep it.
 
 So, for example, consider the data collected by the ``Cobertura`` source:
 
@@ -118,12 +120,25 @@ The flattening results in:
 .. code-block:: python3
 
     {
-        'key.0' : 'a',
-        'key.1' : 'b',
-        'key.2' : 'c',
-        'key.0.a' : 1,
-        'key.1.b' : 2,
-        'key.2.c' : 3,
+        '0' : 'a',
+        '1' : 'b',
+        '2' : 'c',
+        '0.a' : 1,
+        '1.b' : 2,
+        '2.c' : 3,
+    }
+
+Or, if the ``listkeys`` option is enabled:
+
+.. code-block:: python3
+
+    {
+        'key1.0' : 'a',
+        'key1.1' : 'b',
+        'key1.2' : 'c',
+        'key2.0.a' : 1,
+        'key2.1.b' : 2,
+        'key2.2.c' : 3,
     }
 
 You may run this sink with ``DEBUG`` verbosity (``-vvv``) to analyze all
@@ -442,6 +457,28 @@ the keys will be done.
 
 - **Secret**: ``False``
 
+listkeys
+--------
+
+Keep the key of lists when flattening the collected data, storing their
+elements as ``key.0``, ``key.1``, etc., instead of ``0``, ``1``, etc., under
+the key of the parent of the list, where they can overwrite its other keys.
+
+This option changes the name of the fields of lists submitted to InfluxDB, so
+the queries using them need to be updated when enabling it.
+
+- **Default**: ``False``
+- **Optional**: ``True``
+- **Schema**:
+
+  .. code-block:: python3
+
+     {
+         'type': 'boolean',
+     }
+
+- **Secret**: ``False``
+
 """  # noqa
 
 from datetime import datetime
@@ -450,12 +487,13 @@ from pprintpp import pformat
 
 from flowbber.logging import get_logger
 from flowbber.components import FilterSink
+from flowbber.utils.traverse import walk
 
 
 log = get_logger(__name__)
 
 
-def transform_to_flat(data, keysjoiner, keysjoinerreplace):
+def transform_to_flat(data, keysjoiner, keysjoinerreplace, listkeys=False):
     """
     Flatten the collected data to prepare it for submission to the database.
 
@@ -465,39 +503,44 @@ def transform_to_flat(data, keysjoiner, keysjoinerreplace):
       a leaf value (that has a datatype supported by InfluxDB) is found.
 
     - Lists are converted to a dictionary that maps the index of the element
-      with the element previous to the flattening.
+      with the element previous to the flattening. The index is joined to the
+      key of the list if ``listkeys`` is ``True``, or to the key of its parent
+      otherwise.
     """
     influxdb_supported = (str, int, float, bool, type(None))
 
-    def joinkey(path, key):
-        parts = [*path, key]
+    def keyfunc(key):
+        if keysjoinerreplace is None:
+            return str(key)
+        return str(key).replace(keysjoiner, keysjoinerreplace)
 
-        if keysjoinerreplace is not None:
-            parts = [
-                part.replace(keysjoiner, keysjoinerreplace)
-                for part in parts
-            ]
+    def flat(dictionary):
+        assert isinstance(dictionary, dict)
 
-        return keysjoiner.join(parts)
+        # Prefix of the paths of the children of the containers being
+        # visited, by depth. Unless listkeys is set, the elements of lists are
+        # keyed by their index under the prefix of the list, not under the
+        # key of the list.
+        prefixes = [None]
 
-    def flat(dictionary, path):
-        assert isinstance(dictionary, dict)
+        for _, key, value, depth in walk(dictionary):
+            del prefixes[depth + 1:]
+            prefix = prefixes[depth]
+
+            path = keyfunc(key)
+            if prefix is not None:
+                path = prefix + keysjoiner + path
 
-        for key, value in dictionary.items():
             if isinstance(value, influxdb_supported):
-                yield joinkey(path, key), value
+                yield path, value
                 continue
 
             if isinstance(value, dict):
-                yield from flat(value, path + [key])
+                prefixes.append(path)
                 continue
 
             if isinstance(value, list):
-                value_as_dict = {
-                    str(index): subvalue
-                    for index, subvalue in enumerate(value)
-                }
-                yield from flat(value_as_dict, path)
+                prefixes.append(path if listkeys else prefix)
                 continue
 
             raise ValueError('Unable to flat value ({}): {}'.format(
@@ -505,10 +548,7 @@ def transform_to_flat(data, keysjoiner, keysjoinerreplace):
             ))
 
     return {
-        key: {
-            subkey: subvalue
-            for subkey, subvalue in flat(value, [])
-        }
+        key: dict(flat(value))
         for key, value in data.items()
     }
 
@@ -673,6 +713,15 @@ class InfluxDBSink(FilterSink):
             },
         )
 
+        config.add_option(
+            'listkeys',
+            default=False,
+            optional=True,
+            schema={
+                'type': 'boolean',
+            },
+        )
+
         # Check if uri is defined and if so then delete other keys
         def custom_validator(validated):
             if validated['uri'] is not None:
@@ -729,6 +778,7 @@ class InfluxDBSink(FilterSink):
             data,
             self.config.keysjoiner.value,
             self.config.keysjoinerreplace.value,
+            listkeys=self.config.listkeys.value,
         )
         del data  # Release a bit of ram here
         log.debug('Flat data:\n{}'.format(pformat(flat)))
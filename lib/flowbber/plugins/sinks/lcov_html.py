@@ -23,6 +23,16 @@ Lcov HTML
 This sink plugin run lcov_ ``genhtml`` executable to generate a html report of
 coverage.
 
+The report is only generated again if the tracefile, or the size or
+modification time of the source files it references, changed since the report
+was generated. A ``.flowbber-lcov-html`` file with the hash of the tracefile is
+saved in the output directory for this purpose.
+
+With ``jobs`` greater than one, the report is generated in parallel, one
+``genhtml`` process for each top level directory of the source files, and the
+pages of each directory are stitched with the index of the whole report,
+generated without the source code views.
+
 .. note::
 
    This sink requires the ``genhtml`` executable to be available in your system
@@ -49,6 +59,7 @@ coverage.
         output = "<output directory>"
         override = true
         create_parents = true
+        jobs = 1
 
 .. code-block:: json
 
@@ -61,7 +72,8 @@ coverage.
                     "key": "<id of lcov source>",
                     "output": "<output directory>",
                     "override": true,
-                    "create_parents": true
+                    "create_parents": true,
+                    "jobs": 1
                 }
             }
         ]
@@ -137,15 +149,140 @@ Create output parent directories if don't exist.
 
 - **Secret**: ``False``
 
+jobs
+----
+
+Maximum number of ``genhtml`` processes used to generate the report. Use ``0``
+to use as many processes as available cores.
+
+- **Default**: ``1``
+- **Optional**: ``True``
+- **Schema**:
+
+  .. code-block:: python3
+
+     {
+         'type': 'integer',
+         'min': 0,
+     }
+
+- **Secret**: ``False``
+
 """
 
 from pathlib import Path
-from shutil import which
+from hashlib import sha256
+from os import cpu_count
+from tempfile import TemporaryDirectory
+from concurrent.futures import ThreadPoolExecutor
+from os.path import commonpath, dirname, relpath, sep
+from shutil import which, copy2
 
 from flowbber.components import Sink
+from flowbber.logging import get_logger
 from flowbber.utils.command import run
 
 
+log = get_logger(__name__)
+
+
+STAMP = '.flowbber-lcov-html'
+"""
+Name of the file in the output directory with the hash of the tracefile the
+report was generated from.
+"""
+
+
+def digest_tracefile(tracefile, options=''):
+    """
+    Compute a hash of a tracefile, that changes if its content changes, or
+    the size or modification time of any of its source files changes.
+
+    :param str tracefile: Path to the tracefile.
+    :param str options: Options used to generate the report, also hashed.
+
+    :return: The hexadecimal SHA-256 hash.
+    :rtype: str
+    """
+    digest = sha256(options.encode('utf-8'))
+    sources = []
+
+    with open(tracefile, 'rb') as fd:
+        for line in fd:
+            digest.update(line)
+            if line.startswith(b'SF:'):
+                sources.append(line[3:].strip().decode('utf-8', 'replace'))
+
+    for source in sources:
+        try:
+            stat = Path(source).stat()
+        except OSError:
+            continue
+
+        digest.update('{}:{}:{}'.format(
+            source, stat.st_size, stat.st_mtime_ns,
+        ).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def split_tracefile(tracefile, directory):
+    """
+    Split a tracefile by the top level directory of its source files.
+
+    :param str tracefile: Path to the tracefile.
+    :param directory: Directory to write a tracefile for each top level
+     directory.
+
+    :return: A tuple with the prefix common to all top level directories and
+     a dictionary of the path to the tracefile of each top level directory,
+     indexed by its path relative to the prefix. ``(None, {})`` if the source
+     files have no common prefix.
+    :rtype: tuple
+    """
+    blocks = {}
+    block = []
+    source = None
+
+    with open(tracefile, encoding='utf-8', errors='replace') as fd:
+        for line in fd:
+            block.append(line)
+
+            if line.startswith('SF:'):
+                source = line[3:].strip()
+                continue
+
+            if line.strip() == 'end_of_record':
+                blocks.setdefault(dirname(source or ''), []).extend(block)
+                block = []
+                source = None
+
+    # Files directly in the common directory would be listed in the index,
+    # so make their directory a top level one
+    try:
+        prefix = commonpath(list(blocks))
+    except ValueError:
+        # No files, or relative and absolute paths mixed
+        return None, {}
+    if prefix in blocks:
+        prefix = dirname(prefix)
+
+    groups = {}
+    for parent, lines in blocks.items():
+        top = relpath(parent, prefix).split(sep)[0]
+        if top in ('.', '..'):
+            return None, {}
+        groups.setdefault(top, []).extend(lines)
+
+    paths = {}
+    for index, (top, lines) in enumerate(sorted(groups.items())):
+        paths[top] = str(Path(directory) / '{}.info'.format(index))
+        with open(paths[top], 'w', encoding='utf-8') as fd:
+            fd.writelines(lines)
+
+    return prefix, paths
+
+
 class LcovHTMLSink(Sink):
     def declare_config(self, config):
         config.add_option(
@@ -184,8 +321,30 @@ class LcovHTMLSink(Sink):
             },
         )
 
+        config.add_option(
+            'jobs',
+            default=1,
+            optional=True,
+            schema={
+                'type': 'integer',
+                'min': 0,
+            },
+        )
+
     def distribute(self, data):
         outdir = Path(self.config.output.value)
+        tracefile = data[self.config.key.value]['tracefile']
+        options = '--branch-coverage'
+
+        # Skip the report if it was already generated from the same data
+        stamp = outdir / STAMP
+        digest = digest_tracefile(tracefile, options)
+
+        if stamp.is_file() and stamp.read_text().strip() == digest:
+            log.info(
+                'Coverage report {} is up to date'.format(outdir)
+            )
+            return
 
         if outdir.is_dir() and not self.config.override.value:
             raise FileExistsError(
@@ -206,18 +365,81 @@ class LcovHTMLSink(Sink):
         if genhtml is None:
             raise RuntimeError('genhtml executable not found')
 
-        status = run(
-            '{} --branch-coverage --output-directory {} {}'.format(
-                genhtml, outdir, data[self.config.key.value]['tracefile']
+        def generate(output, tracefile, extra=''):
+            status = run(
+                '{} {} {} --output-directory "{}" "{}"'.format(
+                    genhtml, options, extra, output, tracefile,
+                )
             )
-        )
 
-        if status.returncode != 0:
-            raise RuntimeError(
-                'Failed generating html coverage report:\n{}'.format(
-                    status.stderr
+            if status.returncode != 0:
+                raise RuntimeError(
+                    'Failed generating html coverage report:\n{}'.format(
+                        status.stderr
+                    )
+                )
+
+        if stamp.is_file():
+            stamp.unlink()
+
+        jobs = self.config.jobs.value or cpu_count() or 1
+
+        with TemporaryDirectory() as tmpdir:
+            prefix, groups = (None, {})
+            if jobs > 1:
+                prefix, groups = split_tracefile(tracefile, tmpdir)
+
+            if len(groups) < 2:
+                generate(outdir, tracefile)
+            else:
+                self._generate_parallel(
+                    generate, jobs, outdir, tracefile,
+                    tmpdir, prefix, groups,
                 )
+
+        stamp.write_text(digest)
+
+    def _generate_parallel(
+            self, generate, jobs, outdir, tracefile, tmpdir, prefix, groups):
+        """
+        Generate the report with a genhtml process for each top level
+        directory, and stitch their pages with the index of the whole report.
+        """
+        prefix_option = '--prefix "{}"'.format(prefix)
+
+        # genhtml runs in its own process, so threads are enough to wait
+        # for them
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(
+                    generate, outdir, tracefile,
+                    '{} --no-source'.format(prefix_option),
+                )
+            ]
+            for top, group in groups.items():
+                futures.append(executor.submit(
+                    generate, str(Path(tmpdir) / top), group, prefix_option,
+                ))
+
+        for future in futures:
+            future.result()
+
+        # Replace the pages of each top level directory of the index, that
+        # have no links to the source code views, with the complete ones
+        for top in groups:
+            pages = Path(tmpdir) / top / top
+            for page in pages.glob('**/*'):
+                if page.is_dir():
+                    continue
+                target = outdir / top / page.relative_to(pages)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                copy2(str(page), str(target))
+
+        log.info(
+            'Coverage report generated with {} processes'.format(
+                len(futures)
             )
+        )
 
 
-__all__ = ['LcovHTMLSink']
+__all__ = ['LcovHTMLSink', 'digest_tracefile', 'split_tracefile']
@@ -441,14 +441,25 @@ beginning of any key in the collected data (see MongoDB data safety above).
 
 from flowbber.logging import get_logger
 from flowbber.components import FilterSink
+from flowbber.utils.traverse import transform
 
 
 log = get_logger(__name__)
 
 
-def mongodb_safe(data, dotreplace, dollarreplace):
+def mongodb_safe(data, dotreplace, dollarreplace, inplace=False):
     """
     Transform collected data to be MongoDB safe.
+
+    :param dict data: The data to transform.
+    :param str dotreplace: String to replace the dots in the keys with.
+    :param str dollarreplace: String to replace the leading dollar sign of
+     the keys with.
+    :param bool inplace: Rename the keys of the dictionaries in place instead
+     of creating new dictionaries.
+
+    :return: The transformed data.
+    :rtype: dict
     """
 
     def safe_key(key):
@@ -457,16 +468,10 @@ def mongodb_safe(data, dotreplace, dollarreplace):
 
         return key.replace('.', dotreplace)
 
-    def safe_value(value):
-        if not isinstance(value, dict):
-            return value
-
-        return {
-            safe_key(k): safe_value(v)
-            for k, v in value.items()
-        }
+    if not isinstance(data, dict):
+        return data
 
-    return safe_value(data)
+    return transform(data, rename=safe_key, lists=False, inplace=inplace)
 
 
 class MongoDBSink(FilterSink):
@@ -650,6 +655,7 @@ class MongoDBSink(FilterSink):
             data,
             self.config.dotreplace.value,
             self.config.dollarreplace.value,
+            inplace=True,
         )
 
         # Set key if available
@@ -55,21 +55,72 @@ files can be generated for several programming languages, including:
             "my_source_code.c": {
                 "total_statements": 40,
                 "total_misses": 20,
-                "line_rate": 0.5
+                "total_hits": 20,
+                "total_branches": 4,
+                "total_branches_hit": 2,
+                "line_rate": 0.5,
+                "branch_rate": 0.5
             },
             "another_source.c": {
                 "total_statements": 40,
                 "total_misses": 40,
-                "line_rate": 0.0
+                "total_hits": 0,
+                "total_branches": 0,
+                "total_branches_hit": 0,
+                "line_rate": 0.0,
+                "branch_rate": 0.0
             }
         },
         "total": {
             "total_statements": 80,
-            "total_misses": 20,
-            "line_rate": 0.75
+            "total_misses": 60,
+            "total_hits": 20,
+            "total_branches": 4,
+            "total_branches_hit": 2,
+            "line_rate": 0.25,
+            "branch_rate": 0.5
+        },
+        "ignored": []
+    }
+
+The report is parsed in a single streaming pass. The branches of each file
+are counted from the ``condition-coverage`` of its lines, so the total branch
+rate is correct even when files are filtered with ``include`` and
+``exclude``. Reports without the ``condition-coverage`` of their lines use
+the ``branch-rate`` reported for each file, and for the total if no file is
+ignored and a single report is parsed.
+
+With the ``lines`` option enabled, each file also includes its line level
+coverage in a compact form (see :mod:`flowbber.utils.coverage`):
+
+.. code-block:: json
+
+    {
+        "files": {
+            "my_source_code.c": {
+                "total_statements": 40,
+                "total_misses": 20,
+                "line_rate": 0.5,
+                "lines": {
+                    "ranges": [1, 30, 35, 10],
+                    "hits": [1, 20, 0, 20],
+                    "branches": [12, 1, 2]
+                }
+            }
         }
     }
 
+.. important::
+
+   This class inherits the ``glob`` and ``jobs`` configuration options to
+   parse several reports in parallel, for example, the ones of the shards of
+   a test run. See :ref:`file-source-options` for more information.
+
+   The coverage of the files present in several reports is merged: the hit
+   counts of their lines are summed and, as reports don't include which
+   branches were covered, the most branches covered of each line in any of
+   the reports is kept.
+
 **Dependencies:**
 
 .. code-block:: sh
@@ -88,6 +139,7 @@ files can be generated for several programming languages, including:
         xmlpath = "coverage.xml"
         include = ["*"]
         exclude = []
+        lines = false
 
 .. code-block:: json
 
@@ -99,7 +151,8 @@ files can be generated for several programming languages, including:
                 "config": {
                     "xmlpath": "coverage.xml",
                     "include": ["*"],
-                    "exclude": []
+                    "exclude": [],
+                    "lines": false
                 }
             }
         ]
@@ -110,8 +163,10 @@ xmlpath
 
 Path to the Cobertura ``coverage.xml`` file to be parsed.
 
-- **Default**: ``N/A``
-- **Optional**: ``False``
+Either this option or the ``glob`` option must be set.
+
+- **Default**: ``None``
+- **Optional**: ``True``
 - **Schema**:
 
   .. code-block:: python3
@@ -119,6 +174,7 @@ Path to the Cobertura ``coverage.xml`` file to be parsed.
      {
          'type': 'string',
          'empty': False,
+         'nullable': True,
      }
 
 - **Secret**: ``False``
@@ -227,27 +283,139 @@ in the ``exclude`` configuration option.
 
 - **Secret**: ``False``
 
+lines
+-----
+
+Include the line level coverage of each file, that is, the hit count of each
+line and the branches covered in each line, in a compact form. See
+:mod:`flowbber.utils.coverage` to expand it.
+
+- **Default**: ``False``
+- **Optional**: ``True``
+- **Schema**:
+
+  .. code-block:: python3
+
+     {
+         'type': 'boolean',
+     }
+
+- **Secret**: ``False``
+
 """  # noqa
 
+import re
 from pathlib import Path
-from functools import reduce
+from collections import OrderedDict
 
-from flowbber.components import Source
+from flowbber.components import FileSource
 from flowbber.logging import get_logger
+from flowbber.utils.coverage import FileCoverage, summarize
 from flowbber.utils.filter import is_wanted, load_filter_file
 
 
 log = get_logger(__name__)
 
 
-class CoberturaSource(Source):
+CONDITION_REGEX = re.compile(r'\((?P<covered>\d+)/(?P<total>\d+)\)')
+"""
+Regular expression to parse the ``condition-coverage`` attribute of a line,
+for example, ``50% (1/2)``.
+"""
+
+
+def parse_cobertura(xmlpath, wanted=None):
+    """
+    Parse a Cobertura report in a single streaming pass.
+
+    The lines of each ``class`` element are accumulated in the coverage of
+    its file, and the element is freed once parsed, so the memory used
+    doesn't depend on the size of the report.
+
+    :param xmlpath: Path to the Cobertura XML file.
+    :param function wanted: Function that receives the name of a file and
+     returns ``False`` to ignore it. If ``None``, all files are parsed.
+
+    :return: A tuple with the attributes of the root ``coverage`` element, an
+     ordered dictionary of the :class:`flowbber.utils.coverage.FileCoverage`
+     of each file, in the order of the report, and the sorted list of the
+     names of the files ignored.
+    :rtype: tuple
+    """
+    from xml.etree.ElementTree import iterparse
+
+    attributes = {}
+    files = OrderedDict()
+    ignored = set()
+
+    for event, element in iterparse(str(xmlpath), events=('start', 'end')):
+        tag = element.tag
+
+        if event == 'start':
+            if tag == 'coverage':
+                attributes = dict(element.attrib)
+            continue
+
+        if tag == 'package':
+            element.clear()
+            continue
+
+        if tag != 'class':
+            continue
+
+        filename = element.get('filename')
+
+        coverage = files.get(filename)
+        if coverage is None:
+            if filename in ignored or (
+                wanted is not None and not wanted(filename)
+            ):
+                ignored.add(filename)
+                element.clear()
+                continue
+
+            branch_rate = element.get('branch-rate')
+            coverage = files[filename] = FileCoverage(
+                None if branch_rate is None else float(branch_rate)
+            )
+
+        # Only the lines of the class, not the ones of its methods, that
+        # are duplicated
+        lines = element.find('lines')
+        if lines is not None:
+            for line in lines.iter('line'):
+                number = int(line.get('number'))
+                coverage.add_line(number, int(line.get('hits', 0)))
+
+                if line.get('branch', 'false') != 'true':
+                    continue
+
+                match = CONDITION_REGEX.search(
+                    line.get('condition-coverage', '')
+                )
+                if match is not None:
+                    coverage.add_branches(
+                        number,
+                        int(match.group('covered')),
+                        int(match.group('total')),
+                    )
+
+        element.clear()
+
+    return attributes, files, sorted(ignored)
+
+
+class CoberturaSource(FileSource):
 
     def declare_config(self, config):
         config.add_option(
             'xmlpath',
+            default=None,
+            optional=True,
             schema={
                 'type': 'string',
                 'empty': False,
+                'nullable': True,
             },
         )
 
@@ -301,19 +469,25 @@ class CoberturaSource(Source):
             },
         )
 
-    def collect(self):
-        from pycobertura import Cobertura
+        config.add_option(
+            'lines',
+            default=False,
+            optional=True,
+            schema={
+                'type': 'boolean',
+            },
+        )
+
+        super().declare_config(config)
 
+    def collect_file(self, path):
         # Check if file exists
-        infile = Path(self.config.xmlpath.value)
+        infile = Path(path)
         if not infile.is_file():
             raise FileNotFoundError(
                 'No such file {}'.format(infile)
             )
 
-        # Parse file
-        cobertura = Cobertura(str(infile))
-
         # Filter files
         include = self.config.include.value
         for include_file in self.config.include_files.value:
@@ -327,57 +501,48 @@ class CoberturaSource(Source):
                 if pattern not in exclude:
                     exclude.append(pattern)
 
-        original = cobertura.files()
-        relevant = [
-            filename for filename in original
-            if is_wanted(filename, include, exclude)
-        ]
+        def wanted(filename):
+            return is_wanted(filename, include, exclude)
+
+        # Parse file
+        return parse_cobertura(infile, wanted)
+
+    def merge(self, results):
+        # Merge the coverage of the files of all reports
+        coverages = OrderedDict()
+        ignored = set()
+
+        for _, partial, partial_ignored in results.values():
+            for filename, coverage in partial.items():
+                previous = coverages.get(filename)
+                if previous is None:
+                    coverages[filename] = coverage
+                else:
+                    previous.merge(coverage)
+            ignored.update(partial_ignored)
+
+        ignored = sorted(ignored)
 
-        ignored = sorted(set(original) - set(relevant))
         if ignored:
             log.info(
                 '{} files ignored from total coverage'.format(len(ignored))
             )
 
         # Get files coverage data
-        total = {
-            'total_statements': 0,
-            'total_misses': 0,
-            'total_hits': 0,
-            'branch_rate': 0.0,
-            'line_rate': 0.0,
-        }
-
+        lines = self.config.lines.value
         files = {
-            filename: {
-                key: getattr(cobertura, key)(filename=filename)
-                for key in total
-            }
-            for filename in relevant
+            filename: coverage.summary(lines=lines)
+            for filename, coverage in coverages.items()
         }
 
         # Calculate total
-        def reducer(accumulator, element):
-            for key in ['total_statements', 'total_misses', 'total_hits']:
-                accumulator[key] = accumulator.get(key, 0) + element[key]
-            return accumulator
+        total = summarize(files.values())
 
-        total = reduce(reducer, files.values(), total)
-
-        # Re-calculate total statements
-        if total['total_statements']:
-            total['line_rate'] = 1.0 - (
-                total['total_misses'] / total['total_statements']
-            )
-
-        # Assign branch-rate
-        total['branch_rate'] = cobertura.branch_rate()
-        if include != ['*'] or exclude:
-            log.warning(
-                'Branch rate cannot be re-calculated when filtering files as '
-                'the cobertura XML doesn\'t include the raw number of '
-                'branches hit and total branches.'
-            )
+        # Reports without the branches of their lines only have the rate of
+        # all files
+        if not total['total_branches'] and not ignored and len(results) == 1:
+            attributes, _, _ = next(iter(results.values()))
+            total['branch_rate'] = float(attributes.get('branch-rate', 0.0))
 
         return {
             'files': files,
@@ -386,4 +551,4 @@ class CoberturaSource(Source):
         }
 
 
-__all__ = ['CoberturaSource']
+__all__ = ['CoberturaSource', 'parse_cobertura']
@@ -113,6 +113,32 @@ directory
 Directory to run git from. This can be any subdirectory inside a git
 repository, not only the root.
 
+A list of directories can also be given to collect information from several
+repositories at once. In that case, the repositories are queried in parallel
+and the data collected is returned as a list, in the same order, under the
+``repositories`` key:
+
+.. code-block:: json
+
+    {
+        "repositories": [
+            {
+                "directory": "{git.root}",
+                "root": "/home/kuralabs/flowbber",
+                "branch": "master",
+                "rev": "9742e30",
+                "...": "..."
+            },
+            {
+                "directory": "{git.root}/../another",
+                "root": "/home/kuralabs/another",
+                "branch": "develop",
+                "rev": "1f33a07",
+                "...": "..."
+            }
+        ]
+    }
+
 - **Default**: ``'.'``
 - **Optional**: ``True``
 - **Schema**:
@@ -120,20 +146,22 @@ repository, not only the root.
   .. code-block:: python3
 
      {
-         'type': 'string',
+         'type': ['string', 'list'],
          'empty': False,
+         'schema': {
+             'type': 'string',
+             'empty': False,
+         },
      }
 
 - **Secret**: ``False``
 
 """  # noqa
 
+from concurrent.futures import ThreadPoolExecutor
+
 from flowbber.components import Source
-from flowbber.utils.git import (
-    find_tag, find_root, find_branch, find_revision,
-    find_name, find_email, find_subject, find_body, find_date,
-    GitError,
-)
+from flowbber.utils.git import find_git, find_info
 
 
 class GitSource(Source):
@@ -144,34 +172,37 @@ class GitSource(Source):
             default='.',
             optional=True,
             schema={
-                'type': 'string',
+                'type': ['string', 'list'],
                 'empty': False,
+                'schema': {
+                    'type': 'string',
+                    'empty': False,
+                },
             },
         )
 
     def collect(self):
         directory = self.config.directory.value
-
-        # Tag lookup is the only one allowed to fail
-        def get_tag():
-            try:
-                return find_tag(directory=directory)
-            except GitError:
-                return ''
-
-        data = {
-            'root': find_root(directory=directory),
-            'branch': find_branch(directory=directory),
-            'rev': find_revision(directory=directory),
-            'tag': get_tag(),
-            'name': find_name(directory=directory),
-            'email': find_email(directory=directory),
-            'subject': find_subject(directory=directory),
-            'body': find_body(directory=directory),
-            'date': find_date(directory=directory),
-        }
-
-        return data
+        git = find_git()
+
+        if isinstance(directory, str):
+            return find_info(git=git, directory=directory)._asdict()
+
+        # Each query is just a couple of git subprocesses, so threads are
+        # enough to wait for all of them concurrently
+        with ThreadPoolExecutor(max_workers=len(directory)) as executor:
+            infos = executor.map(
+                lambda path: find_info(git=git, directory=path),
+                directory,
+            )
+
+            repositories = []
+            for path, info in zip(directory, infos):
+                repository = {'directory': path}
+                repository.update(info._asdict())
+                repositories.append(repository)
+
+        return {'repositories': repositories}
 
 
 __all__ = ['GitSource']
@@ -84,6 +84,15 @@ key ``failures`` will be available with a list of failures found:
     }
 
 
+.. important::
+
+   This class inherits the ``glob`` and ``jobs`` configuration options to
+   parse several results files in parallel, for example, the ones of the
+   shards of a test run. See :ref:`file-source-options` for more information.
+
+   The counters of the files are summed and the suites with the same name are
+   merged. The ``timestamp`` is the earliest one.
+
 **Dependencies:**
 
 .. code-block:: sh
@@ -100,6 +109,7 @@ key ``failures`` will be available with a list of failures found:
 
         [sources.config]
         xmlpath = "tests.xml"
+        summary_only = false
 
 .. code-block:: json
 
@@ -109,7 +119,8 @@ key ``failures`` will be available with a list of failures found:
                 "type": "gtest",
                 "id": "...",
                 "config": {
-                    "xmlpath": "tests.xml"
+                    "xmlpath": "tests.xml",
+                    "summary_only": false
                 }
             }
         ]
@@ -120,8 +131,10 @@ xmlpath
 
 Path to the JUnit like XML results ``tests.xml`` file to be parsed.
 
-- **Default**: ``N/A``
-- **Optional**: ``False``
+Either this option or the ``glob`` option must be set.
+
+- **Default**: ``None``
+- **Optional**: ``True``
 - **Schema**:
 
   .. code-block:: python3
@@ -129,18 +142,42 @@ Path to the JUnit like XML results ``tests.xml`` file to be parsed.
      {
          'type': 'string',
          'empty': False,
+         'nullable': True,
+     }
+
+- **Secret**: ``False``
+
+summary_only
+------------
+
+Only keep the cases that failed. The counters of the suites still include all
+cases.
+
+The XML file is always parsed incrementally, freeing each test case once
+parsed, so with this option the memory used only depends on the number of
+failures.
+
+- **Default**: ``False``
+- **Optional**: ``True``
+- **Schema**:
+
+  .. code-block:: python3
+
+     {
+         'type': 'boolean',
      }
 
 - **Secret**: ``False``
 
 """  # noqa
 
+from sys import intern
 from pathlib import Path
-from xml.etree import ElementTree
 from collections import OrderedDict
 
-from flowbber.components import Source
+from flowbber.components import FileSource
 from flowbber.logging import get_logger
+from flowbber.utils.xml import iterelements
 
 
 log = get_logger(__name__)
@@ -184,142 +221,229 @@ def element_to_dict(element, spec):
     return name, data
 
 
-class GTestSource(Source):
+COUNTERS = ['tests', 'failures', 'disabled', 'errors', 'time', 'passed']
+"""
+Counters of the results and of each suite.
+"""
+
+
+def merge_results(results):
+    """
+    Merge the results of several XML files, for example, the ones of the
+    shards of a test run.
+
+    The counters are summed, the suites with the same name are merged and the
+    earliest timestamp is kept.
+
+    :param results: Iterable of the data collected from each file. The
+     dictionaries are modified in place.
+
+    :return: The merged data.
+    :rtype: dict
+    """
+    merged = None
+
+    for data in results:
+        if merged is None:
+            merged = data
+            continue
+
+        for key in COUNTERS:
+            merged[key] += data[key]
+        merged['timestamp'] = min(merged['timestamp'], data['timestamp'])
+        if 'properties' in data:
+            merged.setdefault('properties', {}).update(data['properties'])
+
+        suites = merged['suites']
+        for suitename, testsuite in data['suites'].items():
+            previous = suites.get(suitename)
+            if previous is None:
+                suites[suitename] = testsuite
+                continue
+
+            for key in COUNTERS:
+                previous[key] += testsuite[key]
+            if 'properties' in testsuite:
+                previous.setdefault('properties', {}).update(
+                    testsuite['properties']
+                )
+            previous['cases'].update(testsuite['cases'])
+
+    return merged
+
+
+class GTestSource(FileSource):
 
     def declare_config(self, config):
         config.add_option(
             'xmlpath',
+            default=None,
+            optional=True,
             schema={
                 'type': 'string',
                 'empty': False,
+                'nullable': True,
+            },
+        )
+
+        config.add_option(
+            'summary_only',
+            default=False,
+            optional=True,
+            schema={
+                'type': 'boolean',
             },
         )
 
-    def collect(self):
+        super().declare_config(config)
+
+    def collect_file(self, path):
         # Check if file exists
-        infile = Path(self.config.xmlpath.value)
+        infile = Path(path)
         if not infile.is_file():
             raise FileNotFoundError(
                 'No such file {}'.format(infile)
             )
 
-        tree = ElementTree.parse(str(infile))
-        root = tree.getroot()
-        assert root.tag == 'testsuites', 'Malformed XML root element'
-
-        # Create top level suites object
-        _, data = element_to_dict(root, [
-            ('tests', int),
-            ('failures', int),
-            ('disabled', int),
-            ('errors', int),
-            ('timestamp', str),
-            ('time', float),
-        ])
-        data['passed'] = 0
+        summary_only = self.config.summary_only.value
 
+        data = None
         testsuites = OrderedDict()
-        data['suites'] = testsuites
-
-        # Add test suites
-        for child in root:
-            assert child.tag == 'testsuite', \
-                'Malformed XML child element'
-
-            suitename, testsuite = element_to_dict(child, [
-                ('tests', int),
-                ('failures', int),
-                ('disabled', int),
-                ('errors', int),
-                ('time', float),
-            ])
+        testsuite = None
+
+        for event, element in iterelements(
+            infile,
+            ends={'testsuite', 'testcase'},
+            starts={'testsuites', 'testsuite'},
+        ):
+            tag = element.tag
+
+            # Create top level suites object
+            if tag == 'testsuites':
+                assert data is None, 'Malformed XML root element'
+
+                _, data = element_to_dict(element, [
+                    ('tests', int),
+                    ('failures', int),
+                    ('disabled', int),
+                    ('errors', int),
+                    ('timestamp', str),
+                    ('time', float),
+                ])
+                data['passed'] = 0
+                data['suites'] = testsuites
+                continue
+
+            assert data is not None, 'Malformed XML root element'
+
+            # Add test suites
+            if tag == 'testsuite':
+                if event == 'end':
+                    data['passed'] += testsuite['passed']
+                    testsuite = None
+                    continue
+
+                assert testsuite is None, 'Malformed XML child element'
+
+                suitename, testsuite = element_to_dict(element, [
+                    ('tests', int),
+                    ('failures', int),
+                    ('disabled', int),
+                    ('errors', int),
+                    ('time', float),
+                ])
 
-            testsuites[suitename] = testsuite
+                testsuites[intern(suitename)] = testsuite
 
-            testcases = OrderedDict()
-            testsuite['cases'] = testcases
+                testcases = OrderedDict()
+                testsuite['cases'] = testcases
 
-            # Count passed
-            testsuite['passed'] = 0
+                # Count passed
+                testsuite['passed'] = 0
+                continue
 
             # Add test case
-            for subchild in child:
-                assert subchild.tag == 'testcase', \
-                    'Malformed XML subchild element'
+            assert testsuite is not None, 'Malformed XML subchild element'
 
-                # Pop classname, as it is redundant from testsuite name
-                del subchild.attrib['classname']
+            # Pop classname, as it is redundant from testsuite name
+            del element.attrib['classname']
 
-                casename, testcase = element_to_dict(subchild, [
-                    ('status', str),
-                    ('time', float),
-                ])
-
-                # Fetch properties: the properties are no longer attributes
-                # in the testcase. After the release of gtest v1.8.1 they
-                # are saved in the format <property name='' value''> inside
-                # <properties> under each testcase.
-                propertiesnode = subchild.find('properties')
-                if propertiesnode:  # We are dealing with a 1.8.1+ XML format
+            casename, testcase = element_to_dict(element, [
+                ('status', str),
+                ('time', float),
+            ])
 
-                    properties = testcase.setdefault('properties', {})
-                    if properties:
-                        log.warning(
-                            'File {} has old style (pre-1.8.1) '
-                            'properties ({}) and new style properties '
-                            '(post 1.8.1)'.format(
-                                infile, ', '.join(
-                                    map(str, properties.keys())
-                                ),
-                            )
+            # Fetch properties: the properties are no longer attributes
+            # in the testcase. After the release of gtest v1.8.1 they
+            # are saved in the format <property name='' value''> inside
+            # <properties> under each testcase.
+            propertiesnode = element.find('properties')
+            if propertiesnode:  # We are dealing with a 1.8.1+ XML format
+
+                properties = testcase.setdefault('properties', {})
+                if properties:
+                    log.warning(
+                        'File {} has old style (pre-1.8.1) '
+                        'properties ({}) and new style properties '
+                        '(post 1.8.1)'.format(
+                            infile, ', '.join(
+                                map(str, properties.keys())
+                            ),
                         )
+                    )
 
-                    for propertynode in propertiesnode:
-                        assert propertynode.tag == 'property', \
-                            'Malformed XML properties element'
+                for propertynode in propertiesnode:
+                    assert propertynode.tag == 'property', \
+                        'Malformed XML properties element'
 
-                        attributes = propertynode.attrib
-                        assert (
-                            'name' in attributes and 'value' in attributes
-                        ), 'Malformed XML property element'
+                    attributes = propertynode.attrib
+                    assert (
+                        'name' in attributes and 'value' in attributes
+                    ), 'Malformed XML property element'
 
-                        name = attributes['name']
-                        value = trycast(attributes['value'])
+                    name = intern(attributes['name'])
+                    value = trycast(attributes['value'])
 
-                        if name in properties:
-                            log.warning(
-                                'Overriding property '
-                                '"{}" from "{}" to "{}"'.format(
-                                    name, properties[name], value,
-                                )
+                    if name in properties:
+                        log.warning(
+                            'Overriding property '
+                            '"{}" from "{}" to "{}"'.format(
+                                name, properties[name], value,
                             )
+                        )
+
+                    properties[name] = value
 
-                        properties[name] = value
+            # Fetch failures
+            failures = [
+                failure.text for failure in element
+                if failure.tag == 'failure'
+            ]
 
-                # Fetch failures
-                failures = [
-                    failure.text for failure in subchild
-                    if failure.tag == 'failure'
-                ]
+            # Change the status
+            if failures:
+                testcase['failures'] = failures
+                testcase['status'] = 'FAIL'
 
-                # Change the status
-                if failures:
-                    testcase['failures'] = failures
-                    testcase['status'] = 'FAIL'
+            elif casename.startswith('DISABLED_'):
+                casename = casename[len('DISABLED_'):]
+                testcase['status'] = 'SKIP'
 
-                elif casename.startswith('DISABLED_'):
-                    casename = casename[len('DISABLED_'):]
-                    testcase['status'] = 'SKIP'
+            else:
+                testcase['status'] = 'PASS'
+                testsuite['passed'] += 1
 
-                else:
-                    testcase['status'] = 'PASS'
-                    testsuite['passed'] += 1
+            if summary_only and not failures:
+                continue
 
-                testcases[casename] = testcase
+            testcases[casename] = testcase
 
-            data['passed'] += testsuite['passed']
+        assert data is not None, 'Malformed XML root element'
 
         return data
 
+    def merge(self, results):
+        return merge_results(results.values())
+
 
-__all__ = ['GTestSource']
+__all__ = ['GTestSource', 'merge_results']
@@ -29,6 +29,20 @@ This source fetch and parses a local or remote (http, https) json file.
 
 *Same as the source file*
 
+.. important::
+
+   This class inherits the ``glob`` and ``jobs`` configuration options to
+   parse several local files in parallel. See :ref:`file-source-options` for
+   more information.
+
+   If all the files contain an object, the objects are merged recursively, in
+   the order of their paths: the values of keys present in several files are
+   taken from the last file, unless they are objects in all of them, which
+   are merged too. Otherwise, the data collected is an object with the
+   content of each file indexed by its path.
+
+   The paths matched by the ``glob`` option are file system paths, not URIs.
+
 **Dependencies:**
 
 .. code-block:: sh
@@ -94,8 +108,10 @@ Supported schemas:
 
       https://mydomain.com/archive/file.json
 
-- **Default**: ``N/A``
-- **Optional**: ``False``
+Either this option or the ``glob`` option must be set.
+
+- **Default**: ``None``
+- **Optional**: ``True``
 - **Schema**:
 
   .. code-block:: python3
@@ -103,6 +119,7 @@ Supported schemas:
      {
          'type': 'string',
          'empty': False,
+         'nullable': True,
      }
 
 - **Secret**: ``False``
@@ -197,20 +214,73 @@ from pathlib import Path
 from urllib import request
 from collections import OrderedDict
 from zipfile import ZipFile, ZIP_DEFLATED
-from urllib.parse import urlparse, urlunparse
+from urllib.parse import urlparse, urlunparse, ParseResult
 from ssl import create_default_context, CERT_NONE
 
-from flowbber.components import Source
+from flowbber.components import FileSource
+
 
+def merge_objects(objects):
+    """
+    Merge several objects recursively.
 
-class JSONSource(Source):
+    Dictionaries are merged recursively: the values of keys present in
+    several dictionaries are taken from the last one, unless they are
+    dictionaries in all of them, which are merged too. Lists are concatenated.
+
+    :param objects: Iterable of dictionaries or of lists. The first one is
+     modified in place.
+
+    :raise TypeError: if the objects aren't all dictionaries or all lists.
+
+    :return: The merged dictionary or list.
+    :rtype: dict or list
+    """
+    merged = None
+
+    for obj in objects:
+        if merged is None:
+            merged = obj
+            continue
+
+        if isinstance(merged, list) and isinstance(obj, list):
+            merged.extend(obj)
+            continue
+
+        if not isinstance(merged, dict) or not isinstance(obj, dict):
+            raise TypeError(
+                'Unable to merge objects of types {} and {}'.format(
+                    type(merged).__name__, type(obj).__name__,
+                )
+            )
+
+        stack = [(merged, obj)]
+        while stack:
+            target, source = stack.pop()
+
+            for key, value in source.items():
+                previous = target.get(key)
+                if isinstance(previous, dict) and isinstance(value, dict):
+                    stack.append((previous, value))
+                else:
+                    target[key] = value
+
+    return merged
+
+
+class JSONSource(FileSource):
+
+    path_option = 'file_uri'
 
     def declare_config(self, config):
         config.add_option(
             'file_uri',
+            default=None,
+            optional=True,
             schema={
                 'type': 'string',
                 'empty': False,
+                'nullable': True,
             },
         )
         config.add_option(
@@ -247,10 +317,11 @@ class JSONSource(Source):
             },
         )
 
-    def collect(self):
+        super().declare_config(config)
+
+    def collect_file(self, file_uri):
 
         # Get config
-        file_uri = self.config.file_uri.value
         encoding = self.config.encoding.value
         extract = self.config.extract.value
 
@@ -276,8 +347,12 @@ class JSONSource(Source):
                 content = fd.read()
             return content.decode(encoding)
 
-        # Parse URI
-        parsed_uri = urlparse(file_uri)
+        # Parse URI. Paths matched by the glob option are not URIs, as they
+        # may contain characters like "#" or "?"
+        if self.config.glob.value is None:
+            parsed_uri = urlparse(file_uri)
+        else:
+            parsed_uri = ParseResult('file', '', file_uri, '', '', '')
         scheme = parsed_uri.scheme or 'file'
         filename = Path(parsed_uri.path)
 
@@ -309,5 +384,14 @@ class JSONSource(Source):
 
         raise ValueError('Unsupported scheme {}'.format(scheme))
 
+    def merge(self, results):
+        # Files that don't contain an object are indexed by their path
+        if self.config.glob.value is not None and not all(
+            isinstance(obj, dict) for obj in results.values()
+        ):
+            return results
+
+        return merge_objects(results.values())
+
 
-__all__ = ['JSONSource']
+__all__ = ['JSONSource', 'merge_objects']
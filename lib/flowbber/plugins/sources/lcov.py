@@ -21,17 +21,22 @@ Lcov
 ====
 
 This source calls lcov_ on a specified directory to generate a tracefile or
-loads one directly, and process it with lcov_cobertura_ to create a standard
-Cobertura_ XML file, which in turn is then parsed using the flowbber Cobertura
-source.
+loads one directly, and parses it to collect the coverage of each source file,
+in the same format as the Cobertura_ source.
+
+The tracefile is read one line at a time, and the ``remove`` and ``extract``
+patterns are applied while reading it, so lcov_ is only called to capture the
+coverage of a directory. If files are removed, the resulting tracefile is saved
+to a temporary file, and the original one is left untouched.
+
+The paths of the source files are relative to the working directory.
 
 .. note::
 
    This source requires the ``lcov`` executable to be available in your system
-   to run.
+   to capture the coverage of a directory.
 
 .. _lcov: http://ltp.sourceforge.net/coverage/lcov.php
-.. _lcov_cobertura: https://github.com/eriwen/lcov-to-cobertura-xml
 .. _Cobertura: http://cobertura.github.io/cobertura/
 
 
@@ -44,26 +49,38 @@ source.
             "my_source_code.c": {
                 "total_statements": 40,
                 "total_misses": 20,
-                "branch_rate": 0.5,
-                "total_hits": 8,
-                "line_rate": 0.5
+                "total_hits": 20,
+                "total_branches": 4,
+                "total_branches_hit": 2,
+                "line_rate": 0.5,
+                "branch_rate": 0.5
             },
             "another_source.c": {
                 "total_statements": 40,
                 "total_misses": 40,
-                "branch_rate": 0.5,
-                "total_hits": 8,
-                "line_rate": 0.0
+                "total_hits": 0,
+                "total_branches": 0,
+                "total_branches_hit": 0,
+                "line_rate": 0.0,
+                "branch_rate": 0.0
             }
         },
         "total": {
             "total_statements": 80,
-            "total_misses": 20,
-            "line_rate": 0.75
+            "total_misses": 60,
+            "total_hits": 20,
+            "total_branches": 4,
+            "total_branches_hit": 2,
+            "line_rate": 0.25,
+            "branch_rate": 0.5
         },
+        "ignored": [],
         "tracefile": "<path-to-tracefile.info>"
     }
 
+With the ``lines`` option enabled, each file also includes its line level
+coverage in a compact form. See the ``lines`` option of the Cobertura source.
+
 **Dependencies:**
 
 .. code-block:: sh
@@ -92,6 +109,8 @@ source.
             ".extractpatterns"
         ]
         derive_func_data = false
+        jobs = 1
+        lines = false
 
 .. code-block:: json
 
@@ -114,6 +133,8 @@ source.
                         ".extractpatterns"
                     ],
                     "derive_func_data": false,
+                    "jobs": 1,
+                    "lines": false
                 }
             }
         ]
@@ -141,7 +162,8 @@ Path to the directory containing gcov's ``.gcda`` files or path to a tracefile
 rc_overrides
 ------------
 
-Override lcov configuration file settings.
+Override lcov configuration file settings when capturing the coverage of a
+directory.
 
 Elements should have the form ``SETTING=VALUE``.
 
@@ -166,7 +188,10 @@ remove
 
 List of patterns of files to remove from coverage computation.
 
-Patterns will be interpreted as shell wild‐card patterns.
+Patterns will be interpreted as shell wild‐card patterns, matched against the
+full path of the files using Python's fnmatch_.
+
+.. _fnmatch: https://docs.python.org/3/library/fnmatch.html#fnmatch.fnmatch
 
 - **Default**: ``[]``
 - **Optional**: ``True``
@@ -268,8 +293,8 @@ derive_func_data
 
 Allow lcov to calculate function coverage data from line coverage data.
 
-If ``True`` then the ``--derive-func-data`` option is used on the lcov
-commands. If ``False`` then the option is not used.
+If ``True`` then the ``--derive-func-data`` option is used when capturing the
+coverage of a directory. If ``False`` then the option is not used.
 
 This option is used to collect function coverage data, even when this data is
 not provided by the installed gcov tool. Instead, lcov will use line coverage
@@ -288,22 +313,141 @@ coverage.
 
 - **Secret**: ``False``
 
+jobs
+----
+
+Number of lcov processes used to capture the coverage of a directory. Use
+``0`` to use as many processes as available cores.
+
+With more than one process, the directories with ``.gcda`` files are split in
+as many shards, balanced by their number of ``.gcda`` files, and each shard is
+captured by a different lcov process, without recursion. The tracefiles of the
+shards are then merged, and the result includes the number of directories and
+``.gcda`` files, and the duration, of the capture of each shard:
+
+.. code-block:: json
+
+    {
+        "shards": [
+            {
+                "directories": 12,
+                "gcda": 230,
+                "duration": 41.2
+            }
+        ]
+    }
+
+- **Default**: ``1``
+- **Optional**: ``True``
+- **Schema**:
+
+  .. code-block:: python3
+
+     {
+         'type': 'integer',
+         'min': 0,
+     }
+
+- **Secret**: ``False``
+
+lines
+-----
+
+Include the line level coverage of each file, that is, the hit count of each
+line and the branches covered in each line, in a compact form. See
+:mod:`flowbber.utils.coverage` to expand it.
+
+- **Default**: ``False``
+- **Optional**: ``True``
+- **Schema**:
+
+  .. code-block:: python3
+
+     {
+         'type': 'boolean',
+     }
+
+- **Secret**: ``False``
+
 """
 
+from time import time
 from shutil import which
 from pathlib import Path
+from os.path import relpath
+from os import walk, cpu_count
 from tempfile import NamedTemporaryFile
+from concurrent.futures import ThreadPoolExecutor
 
 from flowbber.components import Source
 from flowbber.utils.command import run
 from flowbber.logging import get_logger
-from flowbber.utils.filter import load_filter_file
-from flowbber.plugins.sources.cobertura import CoberturaSource
+from flowbber.utils.coverage import summarize
+from flowbber.utils.filter import compile_patterns, load_filter_file
+from flowbber.utils.lcov import (
+    read_tracefile, merge_records, merge_tracefiles, write_tracefile,
+)
 
 
 log = get_logger(__name__)
 
 
+def summarize_records(records, lines=False):
+    """
+    Compute the coverage of each source file of a tracefile, and the total.
+
+    :param records: Iterable of :class:`flowbber.utils.lcov.Record`, one for
+     each source file.
+    :param bool lines: Include the line level coverage of each file.
+
+    :return: A dictionary with the coverage of each file, indexed by its path
+     relative to the working directory, in the ``files`` key, and the total
+     coverage in the ``total`` key.
+    :rtype: dict
+    """
+    files = {
+        relpath(record.filename): record.coverage().summary(lines=lines)
+        for record in records
+    }
+
+    return {
+        'files': files,
+        'total': summarize(files.values()),
+    }
+
+
+def shard_directories(directory, shards):
+    """
+    Split the directories with ``.gcda`` files of a build tree in shards,
+    balanced by their number of ``.gcda`` files.
+
+    :param directory: Root of the build tree.
+    :param int shards: Maximum number of shards.
+
+    :return: A list of shards, each a list of tuples of a directory and its
+     number of ``.gcda`` files, largest shards first.
+    :rtype: list
+    """
+    found = []
+    for root, _, filenames in walk(str(directory)):
+        count = sum(1 for filename in filenames if filename.endswith('.gcda'))
+        if count:
+            found.append((root, count))
+
+    # Assign the largest directories first to the least loaded shard
+    found.sort(key=lambda item: item[1], reverse=True)
+
+    result = [[] for _ in range(min(shards, len(found)))]
+    loads = [0] * len(result)
+
+    for root, count in found:
+        index = loads.index(min(loads))
+        result[index].append((root, count))
+        loads[index] += count
+
+    return result
+
+
 class LcovSource(Source):
 
     def declare_config(self, config):
@@ -389,9 +533,26 @@ class LcovSource(Source):
             },
         )
 
-    def collect(self):
-        from lcov_cobertura import LcovCobertura
+        config.add_option(
+            'jobs',
+            default=1,
+            optional=True,
+            schema={
+                'type': 'integer',
+                'min': 0,
+            },
+        )
+
+        config.add_option(
+            'lines',
+            default=False,
+            optional=True,
+            schema={
+                'type': 'boolean',
+            },
+        )
 
+    def collect(self):
         # Check if file exists
         source = Path(self.config.source.value)
         if not source.exists():
@@ -400,19 +561,6 @@ class LcovSource(Source):
             )
         source = source.resolve()
 
-        # Check if lcov is available
-        lcov = which('lcov')
-        if lcov is None:
-            raise FileNotFoundError('lcov executable not found.')
-
-        # Transform from list to something like
-        #   --rc setting1=value1 --rc setting2=value2
-        rc_overrides = ''
-        if self.config.rc_overrides.value:
-            rc_overrides = '--rc {}'.format(
-                ' --rc '.join(self.config.rc_overrides.value)
-            )
-
         # Load remove patterns
         remove = self.config.remove.value
         for remove_file in self.config.remove_files.value:
@@ -427,11 +575,98 @@ class LcovSource(Source):
                 if pattern not in extract:
                     extract.append(pattern)
 
+        shards = None
+        if source.is_dir():
+            tracefile, shards = self._capture(source)
+        else:
+            # Check file extension
+            if source.suffix != '.info':
+                raise ValueError(
+                    'Unknown file extension "{}" '
+                    'for a tracefile. Must be ".info"'.format(source.suffix)
+                )
+            tracefile = source
+
+        # Compile patterns once for all files
+        removed = compile_patterns(remove)
+        extracted = compile_patterns(extract)
+
+        def wanted(filename):
+            if removed(filename) or (extract and not extracted(filename)):
+                return False
+            return True
+
+        # Parse the tracefile, saving the records of the files wanted to a
+        # new tracefile if any file is filtered
+        filtered = None
+        if remove or extract:
+            filtered = NamedTemporaryFile(
+                mode='w', encoding='utf-8', suffix='.info', delete=False,
+            )
+
+        ignored = set()
+
+        def records():
+            for record in read_tracefile(tracefile):
+                if not wanted(record.filename):
+                    ignored.add(relpath(record.filename))
+                    continue
+                if filtered is not None:
+                    record.write(filtered)
+                yield record
+
+        try:
+            merged = merge_records(records())
+        finally:
+            if filtered is not None:
+                filtered.close()
+
+        if filtered is not None:
+            tracefile = Path(filtered.name)
+            log.info(
+                '{} files removed from the tracefile'.format(len(ignored))
+            )
+
+        result = summarize_records(
+            merged.values(), lines=self.config.lines.value,
+        )
+        result['ignored'] = sorted(ignored)
+        result['tracefile'] = str(tracefile)
+
+        if shards is not None:
+            result['shards'] = shards
+
+        return result
+
+    def _capture(self, directory):
+        """
+        Capture the coverage of a directory with lcov.
+
+        :param directory: Path to the directory with the ``.gcda`` files.
+
+        :return: A tuple with the path to the tracefile created and the
+         timings of the capture of each shard, or ``None`` if the directory
+         was captured by a single lcov process.
+        :rtype: tuple
+        """
+        # Check if lcov is available
+        lcov = which('lcov')
+        if lcov is None:
+            raise FileNotFoundError('lcov executable not found.')
+
+        # Transform from list to something like
+        #   --rc setting1=value1 --rc setting2=value2
+        rc_overrides = ''
+        if self.config.rc_overrides.value:
+            rc_overrides = '--rc {}'.format(
+                ' --rc '.join(self.config.rc_overrides.value)
+            )
+
         # Check if --derive-func-data is needed
         derive_func_data = '--derive-func-data' \
             if self.config.derive_func_data.value else ''
 
-        if source.is_dir():
+        def capture(directories, recursion=True):
             # Create a temporary file. Close it, we just need the name.
             tmp_file = NamedTemporaryFile(suffix='.info')
             tmp_file.close()
@@ -442,12 +677,16 @@ class LcovSource(Source):
                 '{lcov} '
                 '{rc_overrides} '
                 '{derive_func_data} '
-                '--directory {directory} --capture '
+                '{directories} --capture {recursion}'
                 '--output-file {tracefile}'.format(
                     lcov=lcov,
                     rc_overrides=rc_overrides,
                     derive_func_data=derive_func_data,
-                    directory=source,
+                    directories=' '.join(
+                        '--directory "{}"'.format(directory)
+                        for directory in directories
+                    ),
+                    recursion='' if recursion else '--no-recursion ',
                     tracefile=tracefile
                 )
             )
@@ -458,90 +697,57 @@ class LcovSource(Source):
                 raise RuntimeError(
                     'Lcov failed capturing data:\n{}'.format(status.stderr)
                 )
-        else:
-            # Check file extension
-            if source.suffix != '.info':
-                raise ValueError(
-                    'Unknown file extension "{}" '
-                    'for a tracefile. Must be ".info"'.format(source.suffix)
-                )
-            tracefile = source
 
-        result = {
-            'tracefile': str(tracefile),
-        }
+            return tracefile
 
-        # Remove files from patterns
-        if remove:
-            cmd = (
-                '{lcov} '
-                '{rc_overrides} '
-                '{derive_func_data} '
-                '--remove {tracefile} {remove} '
-                '--output-file {tracefile}'.format(
-                    lcov=lcov,
-                    rc_overrides=rc_overrides,
-                    derive_func_data=derive_func_data,
-                    tracefile=tracefile,
-                    remove=' '.join(
-                        '"{}"'.format(e) for e in remove
-                    )
-                )
-            )
-            log.info('Removing files: "{}"'.format(cmd))
-            status = run(cmd)
+        jobs = self.config.jobs.value or cpu_count() or 1
+        shards = shard_directories(directory, jobs) if jobs > 1 else []
 
-            if status.returncode != 0:
-                raise RuntimeError(
-                    'Lcov failed removing files from coverage:\n{}'.format(
-                        status.stderr
-                    )
-                )
+        if len(shards) < 2:
+            return capture([directory]), None
 
-        # Extract files from patterns
-        if extract:
-            cmd = (
-                '{lcov} '
-                '{rc_overrides} '
-                '{derive_func_data} '
-                '--extract {tracefile} {extract} '
-                '--output-file {tracefile}'.format(
-                    lcov=lcov,
-                    rc_overrides=rc_overrides,
-                    derive_func_data=derive_func_data,
-                    tracefile=tracefile,
-                    extract=' '.join(
-                        '"{}"'.format(e) for e in extract
-                    )
-                )
+        # Capture each shard in parallel. lcov runs in its own process, so
+        # threads are enough to wait for them.
+        def capture_shard(shard):
+            start = time()
+            tracefile = capture(
+                [root for root, _ in shard], recursion=False,
             )
-            log.info('Extracting files: "{}"'.format(cmd))
-            status = run(cmd)
+            return tracefile, {
+                'directories': len(shard),
+                'gcda': sum(count for _, count in shard),
+                'duration': time() - start,
+            }
 
-            if status.returncode != 0:
-                raise RuntimeError(
-                    'Lcov failed extracting files from coverage:\n{}'.format(
-                        status.stderr
-                    )
-                )
+        with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [
+                executor.submit(capture_shard, shard) for shard in shards
+            ]
 
-        # Create cobertura xml file and parse it
-        converter = LcovCobertura(tracefile.open().read())
-        cobertura_xml = converter.convert()
+        results = [
+            future.result() for future in futures
+            if future.exception() is None
+        ]
+        tracefiles = [partial for partial, _ in results]
 
-        with NamedTemporaryFile(delete=False, suffix='.xml') as xml:
-            xml.write(cobertura_xml.encode('utf-8'))
+        try:
+            for future in futures:
+                if future.exception() is not None:
+                    raise future.exception()
 
-        cobertura_src = CoberturaSource(
-            self._index, 'cobertura', self._id,
-            config={
-                'xmlpath': str(xml.name)
-            }
-        )
+            # Merge the tracefiles of the shards
+            tracefile = tracefiles[0].with_name(
+                '{}-merged.info'.format(tracefiles[0].stem)
+            )
+            write_tracefile(
+                merge_tracefiles(tracefiles, jobs).values(), tracefile,
+            )
 
-        result.update(cobertura_src.collect())
+        finally:
+            for partial in tracefiles:
+                partial.unlink()
 
-        return result
+        return tracefile, [timings for _, timings in results]
 
 
-__all__ = ['LcovSource']
+__all__ = ['LcovSource', 'summarize_records', 'shard_directories']
@@ -95,6 +95,15 @@ The information object always have a ``message`` and a ``code`` key describing
 what the issue is and where it happened.
 
 
+.. important::
+
+   This class inherits the ``glob`` and ``jobs`` configuration options to
+   parse several results files in parallel, for example, the ones of the
+   workers of a pytest-xdist run. See :ref:`file-source-options` for more
+   information.
+
+   The suites with the same name are merged and the counters are summed.
+
 **Dependencies:**
 
 .. code-block:: sh
@@ -111,6 +120,7 @@ what the issue is and where it happened.
 
         [sources.config]
         xmlpath = "tests.xml"
+        summary_only = false
 
 .. code-block:: json
 
@@ -120,7 +130,8 @@ what the issue is and where it happened.
                 "type": "pytest",
                 "id": "...",
                 "config": {
-                    "xmlpath": "tests.xml"
+                    "xmlpath": "tests.xml",
+                    "summary_only": false
                 }
             }
         ]
@@ -131,8 +142,10 @@ xmlpath
 
 Path to the JUnit like XML results ``tests.xml`` file to be parsed.
 
-- **Default**: ``N/A``
-- **Optional**: ``False``
+Either this option or the ``glob`` option must be set.
+
+- **Default**: ``None``
+- **Optional**: ``True``
 - **Schema**:
 
   .. code-block:: python3
@@ -140,17 +153,41 @@ Path to the JUnit like XML results ``tests.xml`` file to be parsed.
      {
          'type': 'string',
          'empty': False,
+         'nullable': True,
+     }
+
+- **Secret**: ``False``
+
+summary_only
+------------
+
+Only keep the cases that failed or errored. The counters of the suites still
+include all cases.
+
+The XML file is always parsed incrementally, freeing each test case once
+parsed, so with this option the memory used only depends on the number of
+failures.
+
+- **Default**: ``False``
+- **Optional**: ``True``
+- **Schema**:
+
+  .. code-block:: python3
+
+     {
+         'type': 'boolean',
      }
 
 - **Secret**: ``False``
 
 """  # noqa
 
+from sys import intern
 from pathlib import Path
-from xml.etree import ElementTree
 from collections import OrderedDict
 
-from flowbber.components import Source
+from flowbber.components import FileSource
+from flowbber.utils.xml import iterelements
 
 
 def trycast(value):
@@ -166,66 +203,129 @@ def trycast(value):
     return value
 
 
-class PytestSource(Source):
+COUNTERS = ['errors', 'failures', 'skips', 'tests', 'time', 'passed']
+"""
+Counters of the results and of each suite.
+"""
+
+
+def merge_results(results):
+    """
+    Merge the results of several XML files, for example, the ones of the
+    workers of a pytest-xdist run.
+
+    The suites with the same name are merged and the counters are summed.
+
+    :param results: Iterable of the data collected from each file. The
+     dictionaries are modified in place.
+
+    :return: The merged data.
+    :rtype: dict
+    """
+    testsuites = OrderedDict()
+
+    for data in results:
+        for suitename, testsuite in data['suites'].items():
+            previous = testsuites.get(suitename)
+            if previous is None:
+                testsuites[suitename] = testsuite
+                continue
+
+            for key in COUNTERS:
+                previous[key] += testsuite[key]
+            previous['cases'].update(testsuite['cases'])
+
+    merged = {
+        key: sum(suite[key] for suite in testsuites.values())
+        for key in COUNTERS
+    }
+    merged['suites'] = testsuites
+
+    return merged
+
+
+class PytestSource(FileSource):
 
     def declare_config(self, config):
         config.add_option(
             'xmlpath',
+            default=None,
+            optional=True,
             schema={
                 'type': 'string',
                 'empty': False,
+                'nullable': True,
+            },
+        )
+
+        config.add_option(
+            'summary_only',
+            default=False,
+            optional=True,
+            schema={
+                'type': 'boolean',
             },
         )
 
-    def collect(self):
+        super().declare_config(config)
+
+    def collect_file(self, path):
         # Check if file exists
-        infile = Path(self.config.xmlpath.value)
+        infile = Path(path)
         if not infile.is_file():
             raise FileNotFoundError(
                 'No such file {}'.format(infile)
             )
 
-        testsuites = OrderedDict()
+        summary_only = self.config.summary_only.value
 
-        tree = ElementTree.parse(str(infile))
-        root = tree.getroot()
-        if root.tag == 'testsuites':
-            # Starting on pytest 4.6.7 adds a <testsuites> root element
-            # We can get the first child and keep on.
-            root = next(iter(root))
-
-        assert root.tag == 'testsuite', 'Malformed XML root element'
-
-        # Create top level suite object
-        testsuite = {
-            key: cast(root.attrib[key])
-            for key, cast in [
-                ('errors', int),
-                ('failures', int),
-                ('tests', int),
-                ('time', float),
-            ]
-        }
+        testsuites = OrderedDict()
+        testsuite = None
+
+        # Starting on pytest 4.6.7 adds a <testsuites> root element, so
+        # parse all the suites
+        for event, element in iterelements(
+            infile,
+            ends={'testsuite', 'testcase'},
+            starts={'testsuite'},
+        ):
+            if element.tag == 'testsuite':
+                if event == 'end':
+                    testsuite = None
+                    continue
+
+                assert testsuite is None, 'Malformed XML root element'
+
+                # Create top level suite object
+                testsuite = {
+                    key: cast(element.attrib[key])
+                    for key, cast in [
+                        ('errors', int),
+                        ('failures', int),
+                        ('tests', int),
+                        ('time', float),
+                    ]
+                }
 
-        # skips was changed to skipped on newer pytest, support both options
-        testsuite['skips'] = int(
-            root.attrib.get('skipped', root.attrib.get('skips'))
-        )
+                # skips was changed to skipped on newer pytest, support both
+                # options
+                testsuite['skips'] = int(
+                    element.attrib.get('skipped', element.attrib.get('skips'))
+                )
 
-        testcases = OrderedDict()
-        testsuite['cases'] = testcases
-        testsuite['passed'] = 0
+                testcases = OrderedDict()
+                testsuite['cases'] = testcases
+                testsuite['passed'] = 0
 
-        testsuites[root.attrib['name']] = testsuite
+                testsuites[intern(element.attrib['name'])] = testsuite
+                continue
 
-        # Add test cases
-        for child in root:
-            assert child.tag == 'testcase', 'Malformed XML child element'
+            assert testsuite is not None, 'Malformed XML child element'
 
             # Form an unique name base on classname and testcase name
             tckey = '{}.{}'.format(
-                child.attrib['classname'],
-                child.attrib['name']
+                element.attrib['classname'],
+                element.attrib['name']
             )
             # Pytest creates duplicates of a test case if there is an error and
             # a failure. It does so in order to be compliant with JUnit schema
@@ -233,29 +333,27 @@ class PytestSource(Source):
             testcase = testcases.get(tckey)
             if testcase is None:
                 testcase = {
-                    key: cast(child.attrib[key])
+                    key: cast(element.attrib[key])
                     for key, cast in [
-                        ('file', str),
+                        ('file', intern),
                         ('line', int),
-                        ('classname', str),
+                        ('classname', intern),
                         ('name', str),
                         ('time', float),
                     ]
                 }
-                properties = []
-                testcase['properties'] = properties
-                testcases[tckey] = testcase
+                testcase['properties'] = []
 
             # Add properties
-            subchild = child.find('properties')
-            if subchild is not None:
+            properties = element.find('properties')
+            if properties is not None:
 
-                for subchild in child.find('properties'):
+                for subchild in properties:
                     assert subchild.tag == 'property', \
                         'Malformed XML subchild element'
 
-                    properties.append({
-                        subchild.attrib['name']: trycast(
+                    testcase['properties'].append({
+                        intern(subchild.attrib['name']): trycast(
                             subchild.attrib['value']
                         )
                     })
@@ -272,7 +370,7 @@ class PytestSource(Source):
                 if childkey is None:
                     break
 
-                subchild = child.find(childkey)
+                subchild = element.find(childkey)
                 if subchild is not None:
                     testcase[childkey] = {
                         'message': subchild.attrib['message'],
@@ -283,15 +381,17 @@ class PytestSource(Source):
             if testcase['status'] == 'PASS':
                 testsuite['passed'] += 1
 
-        result = {
-            key: sum(suite[key] for suite in testsuites.values())
-            for key in [
-                'errors', 'failures', 'skips', 'tests', 'time', 'passed'
-            ]
-        }
-        result['suites'] = testsuites
+            if summary_only and testcase['status'] not in ('FAIL', 'ERROR'):
+                continue
+
+            testcases[tckey] = testcase
+
+        assert testsuites, 'Malformed XML root element'
+
+        return {'suites': testsuites}
 
-        return result
+    def merge(self, results):
+        return merge_results(results.values())
 
 
-__all__ = ['PytestSource']
+__all__ = ['PytestSource', 'merge_results']
@@ -20,43 +20,398 @@ flowbber.plugins.sources.valgrind module entry point.
 """
 
 from pathlib import Path
+from collections import OrderedDict
 
-from flowbber.components import Source
+from flowbber.components import FileSource
+from flowbber.utils.xml import iterelements
 
 
-class ValgrindBaseSource(Source):
+def element_to_dict(element):
+    """
+    Convert a XML element to the same structure xmltodict creates when
+    parsing the whole file, with the ``stack`` elements always in a list.
+    """
+    if not len(element) and not element.attrib:
+        text = (element.text or '').strip()
+        return text or None
+
+    data = OrderedDict(
+        ('@{}'.format(key), value) for key, value in element.attrib.items()
+    )
+
+    for child in element:
+        tag = child.tag
+        value = element_to_dict(child)
+
+        previous = data.get(tag)
+        if previous is None and tag not in data:
+            data[tag] = [value] if tag == 'stack' else value
+        elif isinstance(previous, list):
+            previous.append(value)
+        else:
+            data[tag] = [previous, value]
+
+    return data
+
+
+def parse_summary(xmlpath, top):
+    """
+    Parse a Valgrind XML file in two streaming passes, keeping only the
+    counters of the errors of each kind and the errors that occurred the most.
+
+    The number of times each error occurred is taken from the
+    ``errorcounts`` of the file. Leaks aren't included there, so their number
+    of leaked blocks is used instead.
+
+    The first pass reads the ``errorcounts``, that Valgrind writes after the
+    errors, and the other elements of the file, skipping the errors. The
+    second pass counts the errors of each kind and keeps the ones that
+    occurred the most. Each element is freed once parsed, so the stacks of at
+    most ``top`` errors are kept in memory, but the number of occurrences of
+    each error that isn't a leak is kept until the error is found in the
+    second pass. Valgrind stops reporting new errors after 1000 different
+    errors, unless ``--error-limit=no`` is used.
+
+    :param xmlpath: Path to the Valgrind XML file.
+    :param int top: Number of errors to keep, with their stacks.
+
+    :return: The elements of the file other than the errors and the
+     ``errorcounts``, with the
+     ``total_errors``, the ``kinds`` of errors found, with the number of
+     errors and occurrences of each, and the ``error`` list with the errors
+     that occurred the most, sorted by their ``occurrences``.
+    :rtype: dict
+    """
+    from heapq import heappush, heappushpop
+
+    doc = OrderedDict()
+    kinds = OrderedDict()
+    counts = {}
+    total_errors = 0
+
+    # Collect the number of occurrences and all other elements. All the
+    # elements are yielded so all of them are freed.
+    for _, element in iterelements(xmlpath, depth=1):
+        tag = element.tag
+
+        if tag == 'error':
+            continue
+
+        # The number of occurrences is included in each error kept
+        if tag == 'errorcounts':
+            for pair in element.iter('pair'):
+                counts[pair.findtext('unique')] = int(pair.findtext('count'))
+            continue
+
+        # Same structure xmltodict creates for repeated elements
+        value = element_to_dict(element)
+        previous = doc.get(tag)
+        if previous is None and tag not in doc:
+            doc[tag] = value
+        elif isinstance(previous, list):
+            previous.append(value)
+        else:
+            doc[tag] = [previous, value]
+
+    # Count the errors and keep the ones that occurred the most, earlier ones
+    # first on ties
+    heap = []
+
+    for _, element in iterelements(xmlpath, depth=1):
+        if element.tag != 'error':
+            continue
+
+        total_errors += 1
+        kind = element.findtext('kind')
+
+        occurrences = counts.pop(element.findtext('unique'), None)
+        if occurrences is None:
+            occurrences = int(
+                element.findtext('xwhat/leakedblocks', default=1)
+            )
+
+        counters = kinds.get(kind)
+        if counters is None:
+            counters = kinds[kind] = {'errors': 0, 'occurrences': 0}
+        counters['errors'] += 1
+        counters['occurrences'] += occurrences
+
+        if not top:
+            continue
+
+        if len(heap) < top:
+            heappush(
+                heap, (occurrences, -total_errors, element_to_dict(element)),
+            )
+        elif occurrences > heap[0][0]:
+            heappushpop(
+                heap, (occurrences, -total_errors, element_to_dict(element)),
+            )
+
+    errors = []
+    for occurrences, _, error in sorted(heap, reverse=True):
+        error['occurrences'] = occurrences
+        errors.append(error)
+
+    doc['total_errors'] = total_errors
+    doc['kinds'] = kinds
+    doc['error'] = errors
+
+    return doc
+
+
+def error_counts(doc):
+    """
+    Get the number of occurrences of each error from the ``errorcounts`` of
+    a Valgrind XML file parsed with xmltodict.
+
+    :param dict doc: The parsed file.
+
+    :return: The number of occurrences of each error, indexed by its unique
+     identifier.
+    :rtype: dict
+    """
+    pairs = (doc.get('errorcounts') or {}).get('pair') or []
+    if not isinstance(pairs, list):
+        pairs = [pairs]
+
+    return {pair['unique']: int(pair['count']) for pair in pairs}
+
+
+def signature(error, frames):
+    """
+    Compute the normalized signature of an error, that identifies the same
+    error in different executables.
+
+    The signature is formed by the function, file and line number of the
+    top frames of the first stack of the error. Instruction pointers and
+    directories are not included, as they depend on the executable. For
+    frames without debug information, the name of the object is used instead
+    of the file and line number.
+
+    :param dict error: The error, as parsed by xmltodict.
+    :param int frames: Number of frames of the stack to include.
+
+    :return: A description of each frame of the signature, as
+     ``function (file:line)`` or ``function (object)``.
+    :rtype: list
+    """
+    stacks = error.get('stack') or [None]
+    stack = (stacks[0] or {}).get('frame') or []
+    if not isinstance(stack, list):
+        stack = [stack]
+
+    descriptions = []
+    for frame in stack[:frames]:
+        function = frame.get('fn') or '???'
+
+        if frame.get('file'):
+            descriptions.append('{} ({}:{})'.format(
+                function, frame['file'], frame.get('line', '?'),
+            ))
+            continue
+
+        descriptions.append('{} ({})'.format(
+            function, Path(frame.get('obj') or '???').name,
+        ))
+
+    return descriptions
+
+
+def deduplicate(errors):
+    """
+    Merge the errors with the same kind and signature.
+
+    :param errors: Iterable of errors with their ``signature``, number of
+     ``occurrences`` and list of ``binaries`` where they were found. The
+     errors are modified in place.
+
+    :return: The unique errors, with the sum of their ``occurrences`` and
+     all their ``binaries``, sorted by their ``occurrences``. Errors with
+     the same number of occurrences are sorted in the order they were
+     found.
+    :rtype: list
+    """
+    unique = OrderedDict()
+
+    for error in errors:
+        key = (error['kind'], tuple(error['signature']))
+
+        previous = unique.get(key)
+        if previous is None:
+            unique[key] = error
+            continue
+
+        previous['occurrences'] += error['occurrences']
+        for binary in error['binaries']:
+            if binary not in previous['binaries']:
+                previous['binaries'].append(binary)
+
+    return sorted(
+        unique.values(),
+        key=lambda error: error['occurrences'],
+        reverse=True,
+    )
+
+
+class ValgrindBaseSource(FileSource):
 
     def declare_config(self, config):
         config.add_option(
             'xmlpath',
+            default=None,
+            optional=True,
             schema={
                 'type': 'string',
                 'empty': False,
+                'nullable': True,
+            },
+        )
+
+        config.add_option(
+            'summary_only',
+            default=False,
+            optional=True,
+            schema={
+                'type': 'boolean',
+            },
+        )
+
+        config.add_option(
+            'top',
+            default=10,
+            optional=True,
+            schema={
+                'type': 'integer',
+                'min': 0,
+            },
+        )
+
+        config.add_option(
+            'deduplicate',
+            default=False,
+            optional=True,
+            schema={
+                'type': 'boolean',
+            },
+        )
+
+        config.add_option(
+            'signature_frames',
+            default=5,
+            optional=True,
+            schema={
+                'type': 'integer',
+                'min': 1,
             },
         )
 
-    def collect(self):
+        super().declare_config(config)
+
+    def collect_file(self, path):
         from xmltodict import parse
 
         # Check if file exists
-        infile = Path(self.config.xmlpath.value)
+        infile = Path(path)
         if not infile.is_file():
             raise FileNotFoundError(
                 'No such file {}'.format(infile)
             )
 
-        doc = parse(
-            infile.read_text(),
-            force_list=('error', 'stack',),
-        )['valgrindoutput']
+        if self.config.summary_only.value:
+            doc = parse_summary(infile, self.config.top.value)
+
+        else:
+            with infile.open('rb') as fd:
+                doc = parse(
+                    fd,
+                    force_list=('error', 'stack',),
+                )['valgrindoutput']
+
+            # Sadly, Valgrind's XML format doesn't include a field with the
+            # total number of errors, just an array of which errors were
+            # found. A ``total_errors`` field is injected to allow the user
+            # to easily track the evolution of the amount of errors.
+            doc['total_errors'] = len(doc.get('error', []))
+
+        if not self.config.deduplicate.value:
+            return doc
+
+        # Deduplicate the errors of the file in the parsing process, so only
+        # the unique ones are sent back
+        frames = self.config.signature_frames.value
+        counts = error_counts(doc)
+        try:
+            binary = doc['args']['argv']['exe']
+        except (KeyError, TypeError):
+            binary = str(path)
 
-        # Sadly, Valgrind's XML format doesn't include a field with the total
-        # number of errors, just an array of which errors were found. A
-        # ``total_errors`` field is injected to allow the user to easily track
-        # the evolution of the amount of errors.
-        doc['total_errors'] = len(doc.get('error', []))
+        errors = doc.get('error') or []
+        for error in errors:
+            if 'occurrences' not in error:
+                occurrences = counts.get(error.get('unique'))
+                if occurrences is None:
+                    occurrences = int(
+                        (error.get('xwhat') or {}).get('leakedblocks', 1)
+                    )
+                error['occurrences'] = occurrences
+
+            error['signature'] = signature(error, frames)
+            error['binaries'] = [binary]
+
+        doc['error'] = deduplicate(errors)
+        doc['unique_errors'] = len(doc['error'])
 
         return doc
 
+    def merge(self, results):
+        if len(results) == 1:
+            return next(iter(results.values()))
+
+        total_errors = 0
+        errors = []
+        kinds = OrderedDict()
+        files = OrderedDict()
+
+        for path, doc in results.items():
+            total_errors += doc.pop('total_errors')
+            doc.pop('unique_errors', None)
+            errors.extend(doc.pop('error', None) or [])
+
+            for kind, counters in doc.pop('kinds', {}).items():
+                previous = kinds.get(kind)
+                if previous is None:
+                    kinds[kind] = counters
+                    continue
+                for key, value in counters.items():
+                    previous[key] += value
+
+            files[path] = doc
+
+        merged = {
+            'total_errors': total_errors,
+            'error': errors,
+            'files': files,
+        }
+
+        # Merge the same errors found in several files
+        if self.config.deduplicate.value:
+            errors = merged['error'] = deduplicate(errors)
+            merged['unique_errors'] = len(errors)
+
+        # Keep the errors that occurred the most in all files
+        if self.config.summary_only.value:
+            merged['kinds'] = kinds
+            errors.sort(key=lambda error: error['occurrences'], reverse=True)
+            del errors[self.config.top.value:]
+
+        return merged
+
 
-__all__ = ['ValgrindBaseSource']
+__all__ = [
+    'ValgrindBaseSource',
+    'parse_summary',
+    'error_counts',
+    'signature',
+    'deduplicate',
+]
@@ -148,6 +148,19 @@ Such XML file can be generated with:
     }
 
 
+.. important::
+
+   This class inherits the ``glob`` and ``jobs`` configuration options to
+   parse several XML files in parallel, for example, the ones of several
+   executables. See :ref:`file-source-options` for more information.
+
+   When several files are parsed, the errors of all of them are collected in
+   the ``error`` list, ``total_errors`` is their sum, and the rest of the
+   data of each file is collected in a ``files`` object, indexed by path.
+   With ``summary_only``, the ``kinds`` of all files are summed and only the
+   ``top`` errors that occurred the most in all files are kept.
+   With ``deduplicate``, the same errors found in several files are merged.
+
 **Dependencies:**
 
 .. code-block:: sh
@@ -164,6 +177,10 @@ Such XML file can be generated with:
 
         [sources.config]
         xmlpath = "helgrind.xml"
+        summary_only = false
+        top = 10
+        deduplicate = false
+        signature_frames = 5
 
 .. code-block:: json
 
@@ -173,7 +190,11 @@ Such XML file can be generated with:
                 "type": "valgrind_helgrind",
                 "id": "...",
                 "config": {
-                    "xmlpath": "helgrind.xml"
+                    "xmlpath": "helgrind.xml",
+                    "summary_only": false,
+                    "top": 10,
+                    "deduplicate": false,
+                    "signature_frames": 5
                 }
             }
         ]
@@ -184,8 +205,10 @@ xmlpath
 
 Path to Valgrind's Helgrind XML output.
 
-- **Default**: ``N/A``
-- **Optional**: ``False``
+Either this option or the ``glob`` option must be set.
+
+- **Default**: ``None``
+- **Optional**: ``True``
 - **Schema**:
 
   .. code-block:: python3
@@ -193,6 +216,143 @@ Path to Valgrind's Helgrind XML output.
      {
          'type': 'string',
          'empty': False,
+         'nullable': True,
+     }
+
+- **Secret**: ``False``
+
+summary_only
+------------
+
+Parse the XML file in a streaming fashion and only collect the number of
+errors and occurrences of each kind of error, and the ``top`` errors that
+occurred the most, with their stacks, instead of all errors:
+
+.. code-block:: json
+
+    {
+        "total_errors": 4,
+        "kinds": {
+            "Race": {
+                "errors": 1,
+                "occurrences": 10
+            },
+            "LockOrder": {
+                "errors": 3,
+                "occurrences": 5
+            }
+        },
+        "error": [
+            {
+                "kind": "Race",
+                "occurrences": 10,
+                "stack": []
+            }
+        ]
+    }
+
+The number of occurrences of each error is taken from the ``errorcounts`` of
+the file, which is not collected, or for leaks, from their number of leaked
+blocks. The rest of the data is the same.
+
+The file is parsed twice, but only the stacks of the ``top`` errors are kept
+in memory, along with the number of occurrences of each error until it is
+counted.
+
+- **Default**: ``False``
+- **Optional**: ``True``
+- **Schema**:
+
+  .. code-block:: python3
+
+     {
+         'type': 'boolean',
+     }
+
+- **Secret**: ``False``
+
+top
+---
+
+Number of errors to collect with the ``summary_only`` option, the ones that
+occurred the most, sorted by their number of ``occurrences``.
+
+- **Default**: ``10``
+- **Optional**: ``True``
+- **Schema**:
+
+  .. code-block:: python3
+
+     {
+         'type': 'integer',
+         'min': 0,
+     }
+
+- **Secret**: ``False``
+
+deduplicate
+-----------
+
+Merge the errors with the same kind and signature, for example, the same
+error found in several executables. The signature of an error is formed by the
+function, file and line number of the top ``signature_frames`` frames of its
+first stack, so it doesn't depend on the executable.
+
+Instead of all the errors found, only the unique ones are collected, sorted by
+their number of occurrences, with their ``signature``, the total number of
+times they occurred (``occurrences``) and the executables (``binaries``) where
+they were found. A ``unique_errors`` field with the number of unique errors is
+added:
+
+.. code-block:: json
+
+    {
+        "total_errors": 300,
+        "unique_errors": 1,
+        "error": [
+            {
+                "kind": "Race",
+                "signature": [
+                    "hello_world() (hello.cpp:76)"
+                ],
+                "occurrences": 300,
+                "binaries": ["./binary1", "./binary2"],
+                "stack": []
+            }
+        ]
+    }
+
+The errors of each file are deduplicated in the process that parses it. With
+the ``summary_only`` option, only the ``top`` errors of each file are
+deduplicated.
+
+- **Default**: ``False``
+- **Optional**: ``True``
+- **Schema**:
+
+  .. code-block:: python3
+
+     {
+         'type': 'boolean',
+     }
+
+- **Secret**: ``False``
+
+signature_frames
+----------------
+
+Number of frames of the stack of the errors included in their signature, with
+the ``deduplicate`` option.
+
+- **Default**: ``5``
+- **Optional**: ``True``
+- **Schema**:
+
+  .. code-block:: python3
+
+     {
+         'type': 'integer',
+         'min': 1,
      }
 
 - **Secret**: ``False``
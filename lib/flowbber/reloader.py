@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Hot reload of pipeline definitions.
+"""
+
+from traceback import format_exc
+
+from .logging import get_logger
+from .inputs import load_pipeline
+from .local import load_configuration
+
+
+log = get_logger(__name__)
+
+
+class Reloader:
+    """
+    Watch a pipeline definition file and its ``flowconf.py`` for changes.
+
+    Changes are detected by polling the modification time and the size of the
+    files, so checking is cheap and can be done before every execution of the
+    pipeline.
+
+    :param Path path: Path to the pipeline definition file.
+    :param bool cache: Use the cache of loaded pipeline definitions.
+    """
+
+    def __init__(self, path, cache=False):
+        self._path = path
+        self._flowconf = path.parent / 'flowconf.py'
+        self._cache = cache
+        self._stamps = self._stat()
+
+    def _stat(self):
+        """
+        Get the modification time and size of the watched files.
+
+        :return: A tuple with the stamps of the definition file and of the
+         ``flowconf.py`` file. A stamp is ``None`` if the file doesn't exist.
+        :rtype: tuple
+        """
+        stamps = []
+        for watched in (self._path, self._flowconf):
+            try:
+                stat = watched.stat()
+            except OSError:
+                stamps.append(None)
+                continue
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(stamps)
+
+    def check(self):
+        """
+        Check if the watched files changed and load the pipeline definition
+        again if they did.
+
+        If ``flowconf.py`` changed, it is loaded again too, so the locally
+        registered components are replaced with their new version.
+
+        Failure to load the changed files is logged, and the change is ignored
+        until the files are modified again.
+
+        :return: The new validated pipeline definition, or ``None`` if the
+         files didn't change or couldn't be loaded.
+        :rtype: dict
+        """
+        stamps = self._stat()
+        if stamps == self._stamps:
+            return None
+
+        flowconf_changed = stamps[1] != self._stamps[1]
+        self._stamps = stamps
+
+        try:
+            if flowconf_changed:
+                log.info('Reloading local configuration from {} ...'.format(
+                    self._flowconf
+                ))
+                load_configuration(self._path.parent)
+
+            log.info('Reloading pipeline definition from {} ...'.format(
+                self._path
+            ))
+            return load_pipeline(self._path, cache=self._cache)
+
+        except Exception:
+            log.error('Unable to reload pipeline definition {}:\n{}'.format(
+                self._path, format_exc(),
+            ))
+
+        return None
+
+    def reload(self, pipeline):
+        """
+        Update a pipeline if its definition or ``flowconf.py`` changed.
+
+        Only the components whose definition or plugin class changed are
+        created again. See :meth:`flowbber.pipeline.Pipeline.update`.
+
+        :param pipeline: The pipeline to update.
+        :type pipeline: :class:`flowbber.pipeline.Pipeline`
+
+        :return: The new validated pipeline definition if the pipeline was
+         updated, ``None`` otherwise.
+        :rtype: dict
+        """
+        definition = self.check()
+        if definition is None:
+            return None
+
+        try:
+            created = pipeline.update(definition)
+        except Exception:
+            log.error('Unable to update pipeline {}:\n{}'.format(
+                pipeline.name, format_exc(),
+            ))
+            return None
+
+        log.info('Pipeline {} reloaded. {} components were rebuilt.'.format(
+            pipeline.name, created,
+        ))
+        return definition
+
+
+__all__ = ['Reloader']
@@ -54,18 +54,24 @@ class Scheduler:
      If missing or ``None``, the scheduler will start immediately.
     :param bool stop_on_failure: Stop the the scheduler if the pipeline fails
      one execution. Else keep scheduling run even on failure.
+    :param reloader: Reloader used to update the pipeline, and the schedule,
+     between runs if the pipeline definition or its ``flowconf.py`` changed.
+     If missing or ``None``, changes are ignored.
+    :type reloader: :class:`flowbber.reloader.Reloader`
     """
 
     def __init__(
             self, pipeline, frequency,
             samples=None, start=None,
-            stop_on_failure=False):
+            stop_on_failure=False,
+            reloader=None):
 
         self._pipeline = pipeline
         self._frequency = frequency
         self._samples = samples
         self._start = start
         self._stop_on_failure = stop_on_failure
+        self._reloader = reloader
 
         self._runs_passed = 0
         self._runs_failed = 0
@@ -151,10 +157,38 @@ class Scheduler:
 
         self._last_run = event.time
 
+    def _reload(self):
+        """
+        Update the pipeline and the schedule if the pipeline definition
+        changed.
+        """
+        definition = self._reloader.reload(self._pipeline)
+        if definition is None:
+            return
+
+        schedule = definition.get('schedule', None)
+        if schedule is None:
+            log.warning(
+                'Schedule removed from pipeline {} definition. '
+                'Keeping current schedule ...'.format(self._pipeline.name)
+            )
+            return
+
+        self._frequency = schedule['frequency']
+        self._samples = schedule['samples']
+        self._stop_on_failure = schedule['stop_on_failure']
+
     def _sched_work(self):
         """
         Execute the work function and schedule the next no matter what.
         """
+        if self._reloader is not None:
+            self._reload()
+
+        tracer = self._pipeline.tracer
+        if tracer is not None:
+            tracer.instant('tick', 'scheduler', args=self.runs)
+
         try:
             journal = self._pipeline.run()
             self._journal.update(journal)
@@ -167,7 +201,7 @@ class Scheduler:
                     self._pipeline.name, exception,
                 )
             )
-            self.journal.update(OrderedDict((
+            self._journal.update(OrderedDict((
                 (self._pipeline.executed, OrderedDict((
                     ('status', 'crashed'),
                     ('exception', exception),
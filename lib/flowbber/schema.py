@@ -19,6 +19,8 @@
 Schema for the pipeline definition data structure.
 """
 
+import re
+
 from cerberus import Validator
 
 from .logging import get_logger
@@ -30,6 +32,13 @@ log = get_logger(__name__)
 SLUG_REGEX = r'^[a-zA-Z][a-zA-Z0-9_]*$'
 
 
+AUTO_TIMEOUT = 'auto'
+"""
+Value of the ``timeout`` of a component to derive it from the history of its
+durations.
+"""
+
+
 SLUG_SCHEMA = {
     'required': True,
     'type': 'string',
@@ -46,6 +55,18 @@ COMPONENT_SCHEMA = {
         'default': False,
     },
     'timeout': {
+        'coerce': 'timeout',
+        'required': False,
+        'default': None,
+        'nullable': True,
+    },
+    'timeout_factor': {
+        'type': 'number',
+        'required': False,
+        'default': 3.0,
+        'min': 1,
+    },
+    'budget': {
         'coerce': 'timedelta_nullable',
         'required': False,
         'default': None,
@@ -62,6 +83,18 @@ COMPONENT_SCHEMA = {
             'regex': SLUG_REGEX,
         },
     },
+    'remote': {
+        'type': 'boolean',
+        'required': False,
+        'default': False,
+    },
+    'resources': {
+        'type': 'string',
+        'required': False,
+        'nullable': True,
+        'default': None,
+        'regex': SLUG_REGEX,
+    },
 }
 
 
@@ -92,12 +125,95 @@ SCHEDULER_SCHEMA = {
 }
 
 
+WORKERS_SCHEMA = {
+    'addresses': {
+        'required': True,
+        'type': 'list',
+        'empty': False,
+        'schema': {
+            'type': 'string',
+            'empty': False,
+        },
+    },
+    'authkey': {
+        'required': False,
+        'type': 'string',
+        'nullable': True,
+        'default': None,
+    },
+}
+
+
+RESOURCES_SCHEMA = {
+    'affinity': {
+        'required': False,
+        'type': 'list',
+        'empty': False,
+        'nullable': True,
+        'default': None,
+        'schema': {
+            'type': 'integer',
+            'min': 0,
+        },
+    },
+    'nice': {
+        'required': False,
+        'type': 'integer',
+        'min': -20,
+        'max': 19,
+        'nullable': True,
+        'default': None,
+    },
+    'ionice': {
+        'required': False,
+        'type': 'string',
+        'allowed': ['idle', 'best-effort', 'realtime'],
+        'nullable': True,
+        'default': None,
+    },
+    'ionice_level': {
+        'required': False,
+        'type': 'integer',
+        'min': 0,
+        'max': 7,
+        'nullable': True,
+        'default': None,
+    },
+    'memory': {
+        'coerce': 'bytesize_nullable',
+        'required': False,
+        'type': 'integer',
+        'min': 1,
+        'nullable': True,
+        'default': None,
+    },
+}
+
+
 PIPELINE_SCHEMA = {
     'schedule': {
         'required': False,
         'type': 'dict',
         'schema': SCHEDULER_SCHEMA,
     },
+    'workers': {
+        'required': False,
+        'type': 'dict',
+        'schema': WORKERS_SCHEMA,
+    },
+    'resources': {
+        'required': False,
+        'type': 'dict',
+        'default': {},
+        'keysrules': {
+            'type': 'string',
+            'regex': SLUG_REGEX,
+        },
+        'valuesrules': {
+            'type': 'dict',
+            'schema': RESOURCES_SCHEMA,
+        },
+    },
     'sources': {
         'required': True,
         'type': 'list',
@@ -136,9 +252,42 @@ class TimedeltaValidator(Validator):
 
     For this transformation the pytimeparse library is used.
 
+    Timeouts can also be ``auto``, see :data:`AUTO_TIMEOUT`.
+
+    It also allows to coerce a size string, like ``512M`` or ``2 GiB``, to an
+    integer number of bytes. Units are binary multiples.
+
     .. _pytimeparse: https://github.com/wroberts/pytimeparse
     """
 
+    BYTESIZE_REGEX = re.compile(
+        r'^\s*(?P<number>\d+(\.\d+)?)\s*(?P<unit>[kmgt]?)(i?b)?\s*$',
+        re.IGNORECASE,
+    )
+
+    def _normalize_coerce_bytesize_nullable(self, value):
+        if value is None:
+            return None
+
+        if isinstance(value, int):
+            return value
+
+        match = self.BYTESIZE_REGEX.match(str(value))
+        if match is None:
+            raise ValueError('Unable to parse size {}'.format(value))
+
+        exponent = ' kmgt'.index(match.group('unit').lower() or ' ')
+        return int(float(match.group('number')) * 1024 ** exponent)
+
+    def _normalize_coerce_timeout(self, value):
+        if value == AUTO_TIMEOUT:
+            return value
+
+        timeout = self._normalize_coerce_timedelta_nullable(value)
+        if timeout is not None and timeout < 0:
+            raise ValueError('Invalid negative timeout {}'.format(value))
+        return timeout
+
     def _normalize_coerce_timedelta_nullable(self, value):
         if value is None:
             return None
@@ -157,4 +306,4 @@ class TimedeltaValidator(Validator):
         return timedelta
 
 
-__all__ = ['TimedeltaValidator']
+__all__ = ['AUTO_TIMEOUT', 'TimedeltaValidator']
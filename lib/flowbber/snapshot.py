@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Snapshots of the data collected by a pipeline.
+
+A snapshot directory contains:
+
+``sources.pickle``
+    The data bundle after running the sources.
+
+``aggregators.pickle``
+    The data bundle after running the aggregators.
+
+``journal.json``
+    The journal entries of the components executed, saved even if the
+    pipeline failed.
+"""
+
+from os import getpid
+from collections import OrderedDict
+from pickle import dump, load, HIGHEST_PROTOCOL
+
+from ujson import dumps, loads
+
+from .logging import get_logger
+
+
+log = get_logger(__name__)
+
+
+class Snapshot:
+    """
+    Directory with a snapshot of the data collected by a pipeline.
+
+    :param Path directory: Path to the snapshot directory.
+    """
+
+    STAGES = ('sources', 'aggregators')
+    """
+    Stages whose resulting data is saved in the snapshot.
+    """
+
+    def __init__(self, directory):
+        self._directory = directory
+
+    @property
+    def directory(self):
+        """
+        Path to the snapshot directory.
+        """
+        return self._directory
+
+    def _datafile(self, stage):
+        assert stage in self.STAGES
+        return self._directory / '{}.pickle'.format(stage)
+
+    def has_data(self, stage):
+        """
+        Check if the snapshot has the data resulting from the given stage.
+
+        :param str stage: Name of the stage, ``sources`` or ``aggregators``.
+
+        :rtype: bool
+        """
+        return self._datafile(stage).is_file()
+
+    def clear(self):
+        """
+        Remove all the files of the snapshot, if any.
+        """
+        for stage in self.STAGES:
+            datafile = self._datafile(stage)
+            if datafile.is_file():
+                datafile.unlink()
+
+        journalfile = self._directory / 'journal.json'
+        if journalfile.is_file():
+            journalfile.unlink()
+
+    def save_data(self, stage, data):
+        """
+        Save the data bundle resulting from the given stage.
+
+        :param str stage: Name of the stage, ``sources`` or ``aggregators``.
+        :param dict data: The data bundle.
+        """
+        datafile = self._datafile(stage)
+        datafile.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write atomically to avoid replaying partial files
+        partial = datafile.with_suffix('.{}'.format(getpid()))
+        with partial.open('wb') as fd:
+            dump(data, fd, protocol=HIGHEST_PROTOCOL)
+        partial.replace(datafile)
+
+        log.info('Data after {} saved to {}'.format(stage, datafile))
+
+    def load_data(self, stage):
+        """
+        Load the data bundle resulting from the given stage.
+
+        :param str stage: Name of the stage, ``sources`` or ``aggregators``.
+
+        :return: The data bundle.
+        :rtype: OrderedDict
+        """
+        datafile = self._datafile(stage)
+
+        with datafile.open('rb') as fd:
+            data = load(fd)
+
+        log.info('Data after {} loaded from {}'.format(stage, datafile))
+        return data
+
+    def save_journal(self, entries):
+        """
+        Save the journal entries of the components executed.
+
+        :param dict entries: Lists of journal entries indexed by stage name,
+         ``sources``, ``aggregators`` and ``sinks``.
+        """
+        journalfile = self._directory / 'journal.json'
+        journalfile.parent.mkdir(parents=True, exist_ok=True)
+        journalfile.write_text(
+            dumps(entries, indent=4, ensure_ascii=False),
+            encoding='utf-8',
+        )
+
+    def load_journal(self, stage):
+        """
+        Load the journal entries of the components of a stage.
+
+        :param str stage: Name of the stage, ``sources``, ``aggregators`` or
+         ``sinks``.
+
+        :return: The journal entries indexed by component id. Empty if the
+         snapshot has no journal.
+        :rtype: OrderedDict
+        """
+        journalfile = self._directory / 'journal.json'
+        if not journalfile.is_file():
+            return OrderedDict()
+
+        entries = loads(journalfile.read_text(encoding='utf-8'))
+        return OrderedDict(
+            (entry['id'], entry) for entry in entries.get(stage, [])
+        )
+
+
+__all__ = ['Snapshot']
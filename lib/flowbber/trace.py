@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Timeline of the execution of pipelines in the Chrome trace event format.
+
+The resulting file can be opened with ``chrome://tracing`` or
+https://ui.perfetto.dev/. See the `Trace Event Format`_ specification.
+
+.. _Trace Event Format: https://docs.google.com/document/d/
+   1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+"""
+
+from os import getpid
+from time import time
+from collections import OrderedDict
+
+from ujson import dumps
+
+from .logging import get_logger
+
+
+log = get_logger(__name__)
+
+
+ACTIONS = {
+    'source': 'collect',
+    'aggregator': 'accumulate',
+    'sink': 'distribute',
+}
+"""
+Name of the action performed by each type of component.
+"""
+
+
+class Tracer:
+    """
+    Recorder of the events of the execution of a pipeline.
+
+    The pipeline process has its own track, with the spans of the stages, the
+    joins to the components, and the markers of the stage barriers and of the
+    scheduler ticks. Each process executing a component has its own track,
+    with the spans of the spawn of the process, the execution of the component
+    and the serialization of its result.
+
+    Timestamps of components executed in a remote worker are taken with the
+    clock of the worker host.
+    """
+
+    def __init__(self):
+        self._origin = time()
+        self._pid = getpid()
+        self._events = []
+        self._tracks = set()
+
+        self._track(self._pid, 'pipeline')
+
+    def _ts(self, timestamp):
+        """
+        Convert a timestamp to microseconds since the creation of the tracer.
+        """
+        return (timestamp - self._origin) * 1e6
+
+    def _track(self, pid, name):
+        """
+        Name the track of the given process, if not already named.
+        """
+        if pid in self._tracks:
+            return
+        self._tracks.add(pid)
+
+        self._events.append(OrderedDict((
+            ('name', 'process_name'),
+            ('ph', 'M'),
+            ('pid', pid),
+            ('tid', pid),
+            ('args', {'name': name}),
+        )))
+
+    def span(self, name, category, begin, end, pid=None, args=None):
+        """
+        Record a span of time.
+
+        :param str name: Name of the span.
+        :param str category: Category of the span.
+        :param float begin: Timestamp when the span began, as returned by
+         :func:`time.time`.
+        :param float end: Timestamp when the span ended.
+        :param int pid: Process of the track of the span. If ``None``, the
+         track of the pipeline is used.
+        :param dict args: Additional information about the span.
+        """
+        pid = pid or self._pid
+
+        event = OrderedDict((
+            ('name', name),
+            ('cat', category),
+            ('ph', 'X'),
+            ('ts', self._ts(begin)),
+            ('dur', max(0.0, end - begin) * 1e6),
+            ('pid', pid),
+            ('tid', pid),
+        ))
+        if args:
+            event['args'] = args
+
+        self._events.append(event)
+
+    def instant(self, name, category, timestamp=None, args=None):
+        """
+        Record a marker in the track of the pipeline.
+
+        :param str name: Name of the marker.
+        :param str category: Category of the marker.
+        :param float timestamp: Timestamp of the marker, as returned by
+         :func:`time.time`. If ``None``, the current time is used.
+        :param dict args: Additional information about the marker.
+        """
+        if timestamp is None:
+            timestamp = time()
+
+        event = OrderedDict((
+            ('name', name),
+            ('cat', category),
+            ('ph', 'i'),
+            ('s', 'p'),
+            ('ts', self._ts(timestamp)),
+            ('pid', self._pid),
+            ('tid', self._pid),
+        ))
+        if args:
+            event['args'] = args
+
+        self._events.append(event)
+
+    def component(self, name, component, execution, joining, joined):
+        """
+        Record the execution of a component.
+
+        :param str name: Type of the component, ``source``, ``aggregator`` or
+         ``sink``.
+        :param component: The component executed.
+        :type component: :class:`flowbber.components.base.Component`
+        :param execution: The execution information of the component.
+        :type execution: :class:`flowbber.components.base.ExecutionInfo`
+        :param float joining: Timestamp when the pipeline started to join the
+         component.
+        :param float joined: Timestamp when the join ended.
+        """
+        args = OrderedDict((
+            ('id', component.id),
+            ('status', execution.status),
+        ))
+        if component.worker is not None:
+            args['worker'] = component.worker
+
+        timings = execution.timings or {}
+
+        # Without a driving process nothing was executed
+        pid = execution.pid
+        if pid is not None:
+            self._track(pid, '{} #{} "{}" ({})'.format(
+                name, component.index, component.id, pid,
+            ))
+
+            phases = [
+                ('spawn', 'spawned', 'started'),
+                (ACTIONS[name], 'started', 'executed'),
+                ('serialize', 'executed', 'serialized'),
+            ]
+
+            # Killed or timed out before reporting, the execution lasted
+            # until the pipeline gave up on it
+            if 'started' not in timings and 'spawned' in timings:
+                phases = [(ACTIONS[name], 'spawned', None)]
+
+            for phase, begin, end in phases:
+                if begin not in timings:
+                    continue
+                self.span(
+                    phase, name,
+                    timings[begin], timings.get(end, joined),
+                    pid=pid, args=args,
+                )
+
+        self.span(
+            'join {} "{}"'.format(name, component.id), 'join',
+            joining, joined, args=args,
+        )
+
+        if 'received' in timings and 'deserialized' in timings:
+            self.span(
+                'deserialize {} "{}"'.format(name, component.id), 'join',
+                timings['received'], timings['deserialized'], args=args,
+            )
+
+    def save(self, path):
+        """
+        Save the recorded events to a file.
+
+        :param Path path: Path to the trace file.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            dumps(
+                OrderedDict((
+                    ('traceEvents', self._events),
+                    ('displayTimeUnit', 'ms'),
+                )),
+                ensure_ascii=False,
+            ),
+            encoding='utf-8',
+        )
+        log.info('Trace saved to {}'.format(path))
+
+
+__all__ = ['ACTIONS', 'Tracer']
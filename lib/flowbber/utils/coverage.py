@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Utilities to represent line level coverage data in a compact form.
+
+The line coverage of a file is represented as:
+
+.. code-block:: json
+
+    {
+        "ranges": [1, 10, 15, 3],
+        "hits": [0, 4, 3, 9],
+        "branches": [12, 1, 2]
+    }
+
+``ranges``
+    Run-length encoded line numbers: pairs of first line number and number of
+    consecutive lines. In the example, lines 1 to 10 and 15 to 17.
+
+``hits``
+    Run-length encoded hit counts of the lines in ``ranges``, in the same
+    order: pairs of hit count and number of consecutive lines with that count.
+    In the example, the first 4 lines were not executed, and the following 9
+    were executed 3 times each.
+
+``branches``
+    Triplets of line number, branches covered and total branches, for the
+    lines with branches.
+
+All values are flat lists of integers, so they are small to pickle between
+processes and can be stored in any sink.
+
+The coverage sources accumulate the lines of each file in a
+:class:`FileCoverage` while parsing their reports, so all the counters of a
+file are computed in a single pass.
+"""
+
+
+def compress_lines(lines, branches=None):
+    """
+    Compress the line coverage of a file.
+
+    :param dict lines: Hit count of each line, indexed by line number.
+    :param dict branches: Tuples of branches covered and total branches,
+     indexed by line number, for the lines with branches, if any.
+
+    :return: The compact representation of the line coverage.
+    :rtype: dict
+    """
+    ranges = []
+    hits = []
+
+    previous = None
+    for number in sorted(lines):
+        count = lines[number]
+
+        if previous is not None and number == previous + 1:
+            ranges[-1] += 1
+        else:
+            ranges.extend((number, 1))
+
+        if hits and hits[-2] == count:
+            hits[-1] += 1
+        else:
+            hits.extend((count, 1))
+
+        previous = number
+
+    compressed = []
+    for number in sorted(branches or {}):
+        covered, total = branches[number]
+        compressed.extend((number, covered, total))
+
+    return {
+        'ranges': ranges,
+        'hits': hits,
+        'branches': compressed,
+    }
+
+
+def expand_lines(compact):
+    """
+    Expand the line coverage of a file.
+
+    :param dict compact: The compact representation of the line coverage, as
+     returned by :func:`compress_lines`.
+
+    :return: A generator of tuples of line number and hit count.
+    :rtype: generator
+    """
+    ranges = compact['ranges']
+    hits = compact['hits']
+
+    def numbers():
+        for index in range(0, len(ranges), 2):
+            first, length = ranges[index], ranges[index + 1]
+            yield from range(first, first + length)
+
+    def counts():
+        for index in range(0, len(hits), 2):
+            count, repeat = hits[index], hits[index + 1]
+            for _ in range(repeat):
+                yield count
+
+    yield from zip(numbers(), counts())
+
+
+def expand_branches(compact):
+    """
+    Expand the branch coverage of a file.
+
+    :param dict compact: The compact representation of the line coverage, as
+     returned by :func:`compress_lines`.
+
+    :return: A generator of tuples of line number, branches covered and total
+     branches.
+    :rtype: generator
+    """
+    branches = compact['branches']
+    for index in range(0, len(branches), 3):
+        yield tuple(branches[index:index + 3])
+
+
+class FileCoverage:
+    """
+    Accumulator of the line and branch coverage of a source file.
+
+    Lines and branches added more than once, for example, by several classes
+    of a Cobertura report or several tests of a tracefile, are merged.
+
+    :param float branch_rate: Branch rate reported for the file, used when
+     the report doesn't include the branches of its lines.
+    """
+
+    def __init__(self, branch_rate=None):
+        self.branch_rate = branch_rate
+        self.lines = {}
+        self.branches = {}
+
+    def add_line(self, number, hits):
+        """
+        Add the hit count of a line.
+
+        :param int number: Line number.
+        :param int hits: Number of times the line was executed.
+        """
+        self.lines[number] = self.lines.get(number, 0) + hits
+
+    def add_branches(self, number, covered, total):
+        """
+        Add the branches of a line.
+
+        :param int number: Line number.
+        :param int covered: Number of branches covered.
+        :param int total: Total number of branches.
+        """
+        previous = self.branches.get(number)
+        if previous is not None:
+            covered += previous[0]
+            total += previous[1]
+        self.branches[number] = (covered, total)
+
+    def merge(self, other):
+        """
+        Add the coverage of the same file from another report, for example,
+        of another shard of a test run.
+
+        The hit counts of the lines are summed. Reports only include the
+        number of branches covered of each line, not which ones, so the most
+        branches covered in any of the reports is kept.
+
+        :param other: The coverage to merge into this one.
+        :type other: :class:`FileCoverage`
+        """
+        for number, hits in other.lines.items():
+            self.add_line(number, hits)
+
+        for number, (covered, total) in other.branches.items():
+            previous = self.branches.get(number)
+            if previous is not None:
+                covered = max(covered, previous[0])
+                total = max(total, previous[1])
+            self.branches[number] = (covered, total)
+
+        if self.branch_rate is None:
+            self.branch_rate = other.branch_rate
+
+    def summary(self, lines=False):
+        """
+        Compute the counters of the file.
+
+        :param bool lines: Include the line level coverage in compact form,
+         as returned by :func:`compress_lines`, in the ``lines`` key.
+
+        :return: The number of statements, hits, misses and branches, and the
+         line and branch rates.
+        :rtype: dict
+        """
+        total_statements = len(self.lines)
+        total_misses = sum(1 for hits in self.lines.values() if not hits)
+
+        total_branches = 0
+        total_branches_hit = 0
+        for covered, total in self.branches.values():
+            total_branches_hit += covered
+            total_branches += total
+
+        summary = {
+            'total_statements': total_statements,
+            'total_misses': total_misses,
+            'total_hits': total_statements - total_misses,
+            'total_branches': total_branches,
+            'total_branches_hit': total_branches_hit,
+            'line_rate': rate(
+                total_statements - total_misses, total_statements,
+            ),
+            'branch_rate': rate(
+                total_branches_hit, total_branches, self.branch_rate,
+            ),
+        }
+
+        if lines:
+            summary['lines'] = compress_lines(self.lines, self.branches)
+
+        return summary
+
+
+def rate(hits, total, default=None):
+    """
+    Compute a coverage rate.
+
+    :param int hits: Number of elements covered.
+    :param int total: Total number of elements.
+    :param float default: Rate to use if there are no elements.
+
+    :return: The rate, between 0 and 1, or the default (``0.0`` if ``None``)
+     if there are no elements.
+    :rtype: float
+    """
+    if not total:
+        return 0.0 if default is None else default
+    return hits / total
+
+
+def summarize(summaries):
+    """
+    Compute the total counters of several files.
+
+    :param summaries: Iterable of the counters of each file, as returned by
+     :meth:`FileCoverage.summary`.
+
+    :return: The sums of the counters, and the total line and branch rates.
+    :rtype: dict
+    """
+    total = {
+        'total_statements': 0,
+        'total_misses': 0,
+        'total_hits': 0,
+        'total_branches': 0,
+        'total_branches_hit': 0,
+    }
+
+    for summary in summaries:
+        for key in total:
+            total[key] += summary[key]
+
+    total['line_rate'] = rate(
+        total['total_hits'], total['total_statements'],
+    )
+    total['branch_rate'] = rate(
+        total['total_branches_hit'], total['total_branches'],
+    )
+
+    return total
+
+
+__all__ = [
+    'FileCoverage',
+    'rate',
+    'summarize',
+    'compress_lines',
+    'expand_lines',
+    'expand_branches',
+]
@@ -19,8 +19,11 @@
 Utilities for filtering data.
 """
 
+import re
 from pathlib import Path
-from fnmatch import fnmatch
+from fnmatch import fnmatch, translate
+
+from .traverse import transform
 
 
 def included_in(value, patterns):
@@ -36,6 +39,27 @@ def included_in(value, patterns):
     return any(fnmatch(value, pattern) for pattern in patterns)
 
 
+def compile_patterns(patterns):
+    """
+    Compile a list of patterns into a single matcher.
+
+    Use it instead of :func:`included_in` to match many values against the
+    same patterns, as the patterns are translated to one regular expression
+    only once.
+
+    :param list patterns: List of fnmatch patterns.
+
+    :return: A function that receives a value and returns True if it matches
+     any of the patterns, False otherwise.
+    :rtype: function
+    """
+    if not patterns:
+        return lambda value: False
+
+    regex = re.compile('|'.join(translate(pattern) for pattern in patterns))
+    return lambda value: regex.match(value) is not None
+
+
 def is_wanted(value, include, exclude):
     """
     Check that the given value is included in the include list and not included
@@ -66,17 +90,10 @@ def filter_dict(data, include, exclude, joinchar='.'):
     """
     assert isinstance(data, dict)
 
-    def filter_dict_recursive(breadcrumbs, element):
-        if not isinstance(element, dict):
-            return element
-
-        return element.__class__(
-            (key, filter_dict_recursive(breadcrumbs + [key], value))
-            for key, value in element.items()
-            if is_wanted(joinchar.join(breadcrumbs + [key]), include, exclude)
-        )
+    def keep(path, key, value):
+        return is_wanted(path, include, exclude)
 
-    return filter_dict_recursive([], data)
+    return transform(data, keep=keep, joinchar=joinchar, lists=False)
 
 
 def load_filter_file(filepath, encoding='utf-8'):
@@ -119,6 +136,7 @@ def load_filter_file(filepath, encoding='utf-8'):
 
 __all__ = [
     'included_in',
+    'compile_patterns',
     'is_wanted',
     'filter_dict',
     'load_filter_file',
@@ -20,6 +20,7 @@ Utilities for git repositories.
 """
 
 from shutil import which
+from collections import namedtuple
 
 from .command import run
 from ..logging import get_logger
@@ -28,6 +29,29 @@ from ..logging import get_logger
 log = get_logger(__name__)
 
 
+GitInfo = namedtuple(
+    'GitInfo',
+    [
+        'root', 'branch', 'rev', 'tag',
+        'name', 'email', 'subject', 'body', 'date',
+    ]
+)
+
+
+# Fields of the last commit fetched by find_commit(), as passed to
+# ``git log --format``. Fields are separated by a NUL byte as it is the only
+# character that cannot appear in a commit message.
+COMMIT_FORMAT = (
+    ('rev', '%h'),
+    ('name', '%an'),
+    ('email', '%ae'),
+    ('subject', '%s'),
+    ('body', '%b'),
+    ('date', '%aI'),
+    ('refs', '%D'),
+)
+
+
 class GitError(Exception):
     """
     Typed exception raised when a call to a git executable failed.
@@ -310,7 +334,128 @@ def find_date(git=None, directory='.'):
     return call.stdout
 
 
+def find_head(git=None, directory='.'):
+    """
+    Find the root of the git repository and its current branch using a single
+    call to git.
+
+    :param str git: Path to git executable.
+     If None, the default, will try to find it using :func:`find_git`.
+    :param str directory: Run as if git was started in ``directory`` instead of
+     the current working directory.
+
+    :return: A tuple with the absolute path to root of the git repository and
+     the name of the branch the git repository is currently on.
+    :rtype: tuple
+    """
+    if git is None:
+        git = find_git()
+
+    call = run([
+        git, '-C', directory,
+        'rev-parse', '--show-toplevel', '--abbrev-ref', 'HEAD'
+    ])
+    if call.returncode != 0:
+        raise GitError('Unable to determine git root and branch:\n{}'.format(
+            call.stderr
+        ))
+
+    lines = call.stdout.splitlines()
+    if len(lines) != 2:
+        raise GitError('Unexpected output from git rev-parse:\n{}'.format(
+            call.stdout
+        ))
+
+    root, branch = lines
+    return root, branch
+
+
+def find_commit(git=None, directory='.'):
+    """
+    Find all the information of the current revision using a single call to
+    git.
+
+    :param str git: Path to git executable.
+     If None, the default, will try to find it using :func:`find_git`.
+    :param str directory: Run as if git was started in ``directory`` instead of
+     the current working directory.
+
+    :return: A dictionary with the following keys:
+
+     - ``rev``: The short version of the current revision.
+     - ``tag``: The name of a tag pointing to the current revision, or an empty
+       string if no tag points to it.
+     - ``name``: The name of the author of the current revision.
+     - ``email``: The email of the author of the current revision.
+     - ``subject``: The commit message subject of current revision.
+     - ``body``: The commit message body of current revision.
+     - ``date``: The commit date in strict ISO 8601 format.
+
+    :rtype: dict
+    """
+    if git is None:
+        git = find_git()
+
+    call = run([
+        git, '-C', directory,
+        'log', '-1', '--format={}'.format(
+            '%x00'.join(fmt for _, fmt in COMMIT_FORMAT)
+        )
+    ])
+    if call.returncode != 0:
+        raise GitError('Unable to determine git commit:\n{}'.format(
+            call.stderr
+        ))
+
+    fields = call.stdout.split('\0')
+    if len(fields) != len(COMMIT_FORMAT):
+        raise GitError('Unexpected output from git log:\n{}'.format(
+            call.stdout
+        ))
+
+    commit = {
+        key: value.strip()
+        for (key, _), value in zip(COMMIT_FORMAT, fields)
+    }
+
+    # Refs are reported like "HEAD -> master, tag: 1.0.0, origin/master"
+    refs = commit.pop('refs')
+    tags = [
+        ref[len('tag: '):] for ref in refs.split(', ')
+        if ref.startswith('tag: ')
+    ]
+    commit['tag'] = tags[0] if tags else ''
+
+    return commit
+
+
+def find_info(git=None, directory='.'):
+    """
+    Find all the information of the git repository and its current revision.
+
+    This performs only two calls to git, compared to the nine calls required
+    when using the ``find_*`` functions one by one.
+
+    :param str git: Path to git executable.
+     If None, the default, will try to find it using :func:`find_git`.
+    :param str directory: Run as if git was started in ``directory`` instead of
+     the current working directory.
+
+    :return: A named tuple with the root of the repository, the current branch
+     and all the keys returned by :func:`find_commit`.
+    :rtype: :class:`GitInfo`
+    """
+    if git is None:
+        git = find_git()
+
+    root, branch = find_head(git=git, directory=directory)
+    commit = find_commit(git=git, directory=directory)
+
+    return GitInfo(root=root, branch=branch, **commit)
+
+
 __all__ = [
+    'GitInfo',
     'find_git',
     'find_tag',
     'find_root',
@@ -321,4 +466,7 @@ __all__ = [
     'find_subject',
     'find_body',
     'find_date',
+    'find_head',
+    'find_commit',
+    'find_info',
 ]
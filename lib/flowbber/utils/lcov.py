@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Utilities to read and write lcov_ tracefiles.
+
+A tracefile is a text file with the coverage of several source files. The
+coverage of each file is a sequence of records, one per line, started by a
+``SF`` record and finished by an ``end_of_record`` line::
+
+    TN:<test name>
+    SF:<path to the source file>
+    FN:<line number of function start>,<function name>
+    FNDA:<execution count>,<function name>
+    FNF:<number of functions found>
+    FNH:<number of functions hit>
+    BRDA:<line number>,<block number>,<branch number>,<taken>
+    BRF:<number of branches found>
+    BRH:<number of branches hit>
+    DA:<line number>,<execution count>[,<checksum>]
+    LF:<number of lines found>
+    LH:<number of lines hit>
+    end_of_record
+
+The summary records (``FNF``, ``FNH``, ``BRF``, ``BRH``, ``LF`` and ``LH``)
+are computed from the other ones, so they are ignored when reading and
+computed again when writing.
+
+.. _lcov: http://ltp.sourceforge.net/coverage/lcov.php
+"""
+
+from os import cpu_count
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from .coverage import FileCoverage
+
+
+class Record:
+    """
+    Coverage of a source file in a tracefile.
+
+    :param str filename: Path to the source file, as in the ``SF`` record.
+    :param str test: Name of the test, as in the ``TN`` record, if any.
+    """
+
+    def __init__(self, filename, test=''):
+        self.filename = filename
+        self.test = test
+
+        self.functions = OrderedDict()
+        """
+        Line number of each function, indexed by name.
+        """
+
+        self.function_hits = OrderedDict()
+        """
+        Execution count of each function, indexed by name.
+        """
+
+        self.branches = OrderedDict()
+        """
+        Times each branch was taken, indexed by a tuple of line number, block
+        and branch. ``None`` if the block of the branch was never executed.
+        """
+
+        self.lines = OrderedDict()
+        """
+        Execution count of each line, indexed by line number.
+        """
+
+        self.checksums = {}
+        """
+        Checksum of the lines that have one, indexed by line number.
+        """
+
+    def merge(self, other):
+        """
+        Add the counts of another record of the same file.
+
+        :param other: The record to merge into this one.
+        :type other: :class:`Record`
+        """
+        for name, number in other.functions.items():
+            self.functions.setdefault(name, number)
+
+        for name, hits in other.function_hits.items():
+            self.function_hits[name] = self.function_hits.get(name, 0) + hits
+
+        for branch, taken in other.branches.items():
+            previous = self.branches.get(branch)
+            if previous is None:
+                self.branches[branch] = taken
+            elif taken is not None:
+                self.branches[branch] = previous + taken
+
+        for number, hits in other.lines.items():
+            self.lines[number] = self.lines.get(number, 0) + hits
+
+        for number, checksum in other.checksums.items():
+            self.checksums.setdefault(number, checksum)
+
+    def coverage(self):
+        """
+        Get the line and branch coverage of the file.
+
+        :return: The coverage of the file.
+        :rtype: :class:`flowbber.utils.coverage.FileCoverage`
+        """
+        coverage = FileCoverage()
+
+        for number, hits in self.lines.items():
+            coverage.add_line(number, hits)
+
+        for (number, _, _), taken in self.branches.items():
+            coverage.add_branches(number, 1 if taken else 0, 1)
+
+        return coverage
+
+    def write(self, fd):
+        """
+        Write the record to a tracefile.
+
+        :param fd: File object opened in text mode.
+        """
+        fd.write('TN:{}\nSF:{}\n'.format(self.test, self.filename))
+
+        for name, number in self.functions.items():
+            fd.write('FN:{},{}\n'.format(number, name))
+        for name, hits in self.function_hits.items():
+            fd.write('FNDA:{},{}\n'.format(hits, name))
+        fd.write('FNF:{}\nFNH:{}\n'.format(
+            len(self.functions),
+            sum(1 for hits in self.function_hits.values() if hits),
+        ))
+
+        for (number, block, branch), taken in self.branches.items():
+            fd.write('BRDA:{},{},{},{}\n'.format(
+                number, block, branch, '-' if taken is None else taken,
+            ))
+        fd.write('BRF:{}\nBRH:{}\n'.format(
+            len(self.branches),
+            sum(1 for taken in self.branches.values() if taken),
+        ))
+
+        for number, hits in self.lines.items():
+            checksum = self.checksums.get(number)
+            if checksum is None:
+                fd.write('DA:{},{}\n'.format(number, hits))
+            else:
+                fd.write('DA:{},{},{}\n'.format(number, hits, checksum))
+        fd.write('LF:{}\nLH:{}\n'.format(
+            len(self.lines),
+            sum(1 for hits in self.lines.values() if hits),
+        ))
+
+        fd.write('end_of_record\n')
+
+
+def read_tracefile(path, wanted=None):
+    """
+    Read a tracefile one line at a time.
+
+    :param path: Path to the tracefile.
+    :param function wanted: Function that receives the path of a source file
+     and returns ``False`` to skip its records. The result is cached for each
+     path. If ``None``, all records are read.
+
+    :return: A generator of the :class:`Record` of each source file, in the
+     order of the tracefile. A source file can have several records, for
+     example, one for each test.
+    :rtype: generator
+    :raises ValueError: If a record of the tracefile is malformed.
+    """
+    decisions = {}
+    test = ''
+    record = None
+    skip = False
+
+    with open(str(path), encoding='utf-8', errors='replace') as fd:
+        for lineno, line in enumerate(fd, 1):
+            line = line.rstrip('\r\n')
+
+            if line == 'end_of_record':
+                if record is not None:
+                    yield record
+                record = None
+                skip = False
+                continue
+
+            kind, _, value = line.partition(':')
+
+            if kind == 'SF':
+                record = None
+                skip = False
+
+                if wanted is not None:
+                    skip = decisions.get(value)
+                    if skip is None:
+                        skip = decisions[value] = not wanted(value)
+
+                if not skip:
+                    record = Record(value, test)
+                continue
+
+            if kind == 'TN':
+                test = value
+                continue
+
+            if skip or record is None:
+                continue
+
+            try:
+                if kind == 'DA':
+                    fields = value.split(',')
+                    number = int(fields[0])
+                    record.lines[number] = (
+                        record.lines.get(number, 0) + int(fields[1])
+                    )
+                    if len(fields) > 2:
+                        record.checksums[number] = fields[2]
+
+                elif kind == 'BRDA':
+                    number, block, branch, taken = value.split(',')
+                    key = (int(number), block, branch)
+                    taken = None if taken == '-' else int(taken)
+                    previous = record.branches.get(key)
+                    if previous is not None and taken is not None:
+                        taken += previous
+                    record.branches[key] = (
+                        previous if taken is None else taken
+                    )
+
+                elif kind == 'FN':
+                    # Newer versions of lcov include the line where the
+                    # function ends, FN:<start>,<end>,<name>
+                    fields = value.split(',')
+                    record.functions[fields[-1]] = int(fields[0])
+
+                elif kind == 'FNDA':
+                    hits, name = value.split(',', 1)
+                    record.function_hits[name] = (
+                        record.function_hits.get(name, 0) + int(hits)
+                    )
+
+            except ValueError as e:
+                raise ValueError(
+                    'Malformed record at {}:{}: {}'.format(path, lineno, line)
+                ) from e
+
+    # Tracefiles truncated before the end of the last record
+    if record is not None:
+        yield record
+
+
+def merge_records(records):
+    """
+    Merge the records of each source file.
+
+    :param records: Iterable of :class:`Record`.
+
+    :return: An ordered dictionary of the merged record of each source file,
+     indexed by path, in the order they were first found.
+    :rtype: :py:class:`collections.OrderedDict`
+    """
+    merged = OrderedDict()
+
+    for record in records:
+        previous = merged.get(record.filename)
+        if previous is None:
+            merged[record.filename] = record
+        else:
+            previous.merge(record)
+
+    return merged
+
+
+def _read_merged(path):
+    """
+    Read a tracefile and merge the records of each source file.
+    """
+    return merge_records(read_tracefile(path))
+
+
+def merge_tracefiles(paths, jobs=None):
+    """
+    Read and merge several tracefiles, parsing them in parallel.
+
+    :param list paths: Paths to the tracefiles.
+    :param int jobs: Maximum number of processes used to parse the
+     tracefiles. If ``None``, as many as available cores.
+
+    :return: An ordered dictionary of the merged record of each source file,
+     indexed by path, in the order they were first found.
+    :rtype: :py:class:`collections.OrderedDict`
+    """
+    paths = [str(path) for path in paths]
+    jobs = min(len(paths), jobs or cpu_count() or 1)
+
+    if jobs < 2:
+        partials = map(_read_merged, paths)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            partials = list(executor.map(_read_merged, paths))
+
+    return merge_records(
+        record
+        for partial in partials
+        for record in partial.values()
+    )
+
+
+def write_tracefile(records, path):
+    """
+    Write records to a tracefile.
+
+    :param records: Iterable of :class:`Record`.
+    :param path: Path to the tracefile.
+    """
+    with open(str(path), 'w', encoding='utf-8') as fd:
+        for record in records:
+            record.write(fd)
+
+
+__all__ = [
+    'Record',
+    'read_tracefile',
+    'merge_records',
+    'merge_tracefiles',
+    'write_tracefile',
+]
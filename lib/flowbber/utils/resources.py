@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Utilities to account and limit the resources used by the components.
+"""
+
+from os import sched_setaffinity, setpriority, sysconf, PRIO_PROCESS
+from collections import OrderedDict
+from resource import (
+    getrusage, setrlimit, RUSAGE_SELF, RUSAGE_CHILDREN, RLIMIT_AS,
+)
+
+
+USAGE_FIELDS = OrderedDict((
+    ('user', 'ru_utime'),
+    ('system', 'ru_stime'),
+    ('maxrss', 'ru_maxrss'),
+    ('inblock', 'ru_inblock'),
+    ('oublock', 'ru_oublock'),
+    ('nvcsw', 'ru_nvcsw'),
+    ('nivcsw', 'ru_nivcsw'),
+))
+"""
+Fields reported in the resource usage and their equivalent in the structure
+returned by :py:func:`resource.getrusage`.
+"""
+
+
+def get_usage():
+    """
+    Get the resource usage of the current process and of its terminated
+    children.
+
+    :return: The resource usage as a dictionary of the form:
+
+     ::
+
+        {
+            'self': {
+                'user': 1.24,
+                'system': 0.12,
+                'maxrss': 40752,
+                'inblock': 0,
+                'oublock': 16,
+                'nvcsw': 35,
+                'nivcsw': 4,
+            },
+            'children': {
+                ...
+            },
+        }
+
+     ``user`` and ``system`` are the CPU time in seconds, ``maxrss`` is the
+     maximum resident set size in kilobytes, ``inblock`` and ``oublock`` the
+     number of block input and output operations, and ``nvcsw`` and ``nivcsw``
+     the number of voluntary and involuntary context switches.
+
+    :rtype: OrderedDict
+    """
+    usage = OrderedDict()
+
+    for who, flag in (('self', RUSAGE_SELF), ('children', RUSAGE_CHILDREN)):
+        rusage = getrusage(flag)
+        usage[who] = OrderedDict(
+            (field, getattr(rusage, attribute))
+            for field, attribute in USAGE_FIELDS.items()
+        )
+
+    return usage
+
+
+def summarize_usage(usages):
+    """
+    Summarize the resource usage of several components.
+
+    CPU times, block operations and context switches of the components and
+    their children are added. The maximum resident set size is the maximum of
+    all.
+
+    :param list usages: Resource usages as returned by :func:`get_usage`.
+     ``None`` values, for components without usage information, are ignored.
+
+    :return: The summarized usage, with the same fields of each entry of
+     :func:`get_usage`.
+    :rtype: OrderedDict
+    """
+    summary = OrderedDict((field, 0) for field in USAGE_FIELDS)
+
+    for usage in usages:
+        if usage is None:
+            continue
+
+        for who in usage.values():
+            for field in USAGE_FIELDS:
+                if field == 'maxrss':
+                    summary[field] = max(summary[field], who[field])
+                else:
+                    summary[field] += who[field]
+
+    return summary
+
+
+def get_address_space():
+    """
+    Get the size of the virtual address space of the current process.
+
+    :return: The size in bytes, or ``None`` if it cannot be determined.
+    :rtype: int
+    """
+    try:
+        with open('/proc/self/statm') as fd:
+            pages = int(fd.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+    return pages * sysconf('SC_PAGE_SIZE')
+
+
+def apply_resources(resources):
+    """
+    Apply a resource class to the current process.
+
+    :param dict resources: The resource class, as defined in the
+     ``resources`` section of the pipeline definition. Options set to
+     ``None`` are left unchanged:
+
+     ``affinity``
+        List of the CPUs the process is allowed to run on.
+     ``nice``
+        Nice level of the process.
+     ``ionice`` and ``ionice_level``
+        I/O scheduling class (``idle``, ``best-effort`` or ``realtime``) and
+        priority level of the process. Requires the psutil_ library.
+     ``memory``
+        Maximum size in bytes of the virtual memory of the process
+        (``RLIMIT_AS``). It must be greater than the address space the
+        process already has mapped when starting, inherited from the
+        pipeline process.
+
+    .. _psutil: https://psutil.readthedocs.io/
+    """
+    if resources.get('affinity', None) is not None:
+        sched_setaffinity(0, resources['affinity'])
+
+    if resources.get('nice', None) is not None:
+        setpriority(PRIO_PROCESS, 0, resources['nice'])
+
+    if resources.get('ionice', None) is not None:
+        try:
+            import psutil
+        except ImportError:
+            raise RuntimeError(
+                'Setting the I/O priority requires the psutil library'
+            )
+
+        ioclass = {
+            'idle': psutil.IOPRIO_CLASS_IDLE,
+            'best-effort': psutil.IOPRIO_CLASS_BE,
+            'realtime': psutil.IOPRIO_CLASS_RT,
+        }[resources['ionice']]
+
+        level = resources.get('ionice_level', None)
+        if resources['ionice'] == 'idle':
+            level = None
+
+        psutil.Process().ionice(ioclass, value=level)
+
+    if resources.get('memory', None) is not None:
+        memory = resources['memory']
+
+        # A limit below the address space already mapped, for example,
+        # inherited from the parent process, makes any allocation fail,
+        # including the ones required to report the result.
+        current = get_address_space()
+        if current is not None and current >= memory:
+            raise ValueError(
+                'Memory limit of {} bytes is below the current address space '
+                'of the process of {} bytes'.format(memory, current)
+            )
+
+        setrlimit(RLIMIT_AS, (memory, memory))
+
+
+__all__ = [
+    'USAGE_FIELDS',
+    'get_usage',
+    'summarize_usage',
+    'get_address_space',
+    'apply_resources',
+]
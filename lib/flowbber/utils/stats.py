@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Utilities to compute statistics of streams of values.
+"""
+
+from math import ceil
+from bisect import insort, bisect_right
+
+
+def percentile(values, quantile):
+    """
+    Compute the exact percentile of a collection of values, using the nearest
+    rank method.
+
+    :param list values: The values. Must not be empty.
+    :param float quantile: The quantile to compute, between 0 and 1.
+
+    :return: The value at the given quantile.
+    :rtype: float
+    """
+    ordered = sorted(values)
+    rank = max(1, ceil(quantile * len(ordered)))
+    return ordered[rank - 1]
+
+
+class StreamingQuantile:
+    """
+    Estimator of a quantile of a stream of values in constant memory.
+
+    Implements the P² algorithm of Jain and Chlamtac, that keeps only five
+    markers, the minimum, the maximum, the estimated quantile and two
+    intermediate ones, and adjusts their heights with a piecewise parabolic
+    interpolation as values are added. The estimate is exact until five
+    values are added.
+
+    :param float quantile: The quantile to estimate, between 0 and 1.
+    """
+
+    def __init__(self, quantile):
+        self.quantile = quantile
+        self.count = 0
+
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [
+            1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5,
+        ]
+        self._increments = [0, quantile / 2, quantile, (1 + quantile) / 2, 1]
+
+    def add(self, value):
+        """
+        Add a value to the stream.
+
+        :param float value: The value to add.
+        """
+        self.count += 1
+        heights = self._heights
+
+        if self.count <= 5:
+            insort(heights, value)
+            return
+
+        positions = self._positions
+
+        # Find the cell of the value, extending the extremes if required
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = bisect_right(heights, value) - 1
+
+        for index in range(cell + 1, 5):
+            positions[index] += 1
+        for index in range(5):
+            self._desired[index] += self._increments[index]
+
+        # Adjust the heights of the intermediate markers
+        for index in range(1, 4):
+            delta = self._desired[index] - positions[index]
+
+            if not (
+                (delta >= 1 and positions[index + 1] - positions[index] > 1) or
+                (delta <= -1 and positions[index - 1] - positions[index] < -1)
+            ):
+                continue
+
+            step = 1 if delta > 0 else -1
+            height = self._parabolic(index, step)
+
+            if not heights[index - 1] < height < heights[index + 1]:
+                height = heights[index] + step * (
+                    (heights[index + step] - heights[index]) /
+                    (positions[index + step] - positions[index])
+                )
+
+            heights[index] = height
+            positions[index] += step
+
+    def _parabolic(self, index, step):
+        """
+        Piecewise parabolic prediction of the height of a marker moved one
+        position in the given direction.
+        """
+        heights = self._heights
+        positions = self._positions
+
+        return heights[index] + step / (
+            positions[index + 1] - positions[index - 1]
+        ) * (
+            (positions[index] - positions[index - 1] + step) *
+            (heights[index + 1] - heights[index]) /
+            (positions[index + 1] - positions[index]) +
+            (positions[index + 1] - positions[index] - step) *
+            (heights[index] - heights[index - 1]) /
+            (positions[index] - positions[index - 1])
+        )
+
+    @property
+    def value(self):
+        """
+        Current estimate of the quantile, or ``None`` if no value was added.
+        """
+        if not self.count:
+            return None
+
+        if self.count <= 5:
+            return percentile(self._heights, self.quantile)
+
+        return self._heights[2]
+
+
+__all__ = [
+    'percentile',
+    'StreamingQuantile',
+]
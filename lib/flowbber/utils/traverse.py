@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Iterative traversal of trees of dictionaries and lists, like the data
+collected by a pipeline.
+
+The functions of this module use an explicit stack instead of recursion, so
+the depth of the data is not limited by the recursion limit, and build the
+path of each node incrementally from the path of its parent, so each node
+costs a single string concatenation, instead of creating a list of keys and
+joining it at every node.
+
+The path of a node is the keys from the root to the node joined with a
+character, for example, ``coverage.files.main:c.line_rate``. Indexes of lists
+are used as keys.
+"""
+
+from fnmatch import fnmatch
+
+
+CONTAINERS = (dict, list)
+"""
+Types of the nodes that have children.
+"""
+
+
+def _children(node):
+    """
+    Get an iterator of the key and value of the children of a container.
+    """
+    if isinstance(node, dict):
+        return iter(node.items())
+    return enumerate(node)
+
+
+def walk(data, joinchar='.', keyfunc=str, enter=None, lists=True):
+    """
+    Walk a tree depth first, in pre-order.
+
+    :param data: The root of the tree, a dictionary or a list. The root itself
+     is not yielded.
+    :param str joinchar: String used to join the keys to form the paths.
+    :param function keyfunc: Function that converts a key to the string used
+     in the path.
+    :param function enter: Function that receives the path, key and value of
+     a container node and returns ``False`` to prune it, that is, to skip its
+     children. If ``None``, all nodes are visited.
+    :param bool lists: Visit the elements of lists. If ``False``, lists are
+     treated as leaves.
+
+    :return: A generator of tuples of the path, key, value and depth of each
+     node. The depth of the children of the root is ``0``.
+    :rtype: generator
+    """
+    containers = CONTAINERS if lists else dict
+
+    stack = [(None, _children(data))]
+
+    while stack:
+        prefix, children = stack[-1]
+        depth = len(stack) - 1
+
+        for key, value in children:
+            if prefix is None:
+                path = keyfunc(key)
+            else:
+                path = prefix + joinchar + keyfunc(key)
+
+            yield path, key, value, depth
+
+            if isinstance(value, containers) and (
+                enter is None or enter(path, key, value) is not False
+            ):
+                stack.append((path, _children(value)))
+                break
+        else:
+            stack.pop()
+
+
+def leaves(data, joinchar='.', keyfunc=str, lists=True):
+    """
+    Iterate the leaves of a tree, that is, the values that are not
+    dictionaries or lists (or not dictionaries, if ``lists`` is ``False``).
+
+    Empty containers have no leaves.
+
+    :param data: The root of the tree.
+    :param str joinchar: String used to join the keys to form the paths.
+    :param function keyfunc: Function that converts a key to the string used
+     in the path.
+    :param bool lists: Treat the elements of lists as nodes. If ``False``,
+     lists are leaves.
+
+    :return: A generator of tuples of the path and value of each leaf.
+    :rtype: generator
+    """
+    containers = CONTAINERS if lists else dict
+
+    for path, _, value, _ in walk(
+            data, joinchar=joinchar, keyfunc=keyfunc, lists=lists):
+        if not isinstance(value, containers):
+            yield path, value
+
+
+def transform(
+        data, keep=None, rename=None,
+        joinchar='.', lists=True, inplace=False):
+    """
+    Transform a tree, filtering its nodes and renaming its keys.
+
+    :param data: The root of the tree.
+    :param function keep: Function that receives the path, key and value of a
+     node and returns ``False`` to remove it, along with its children. The
+     path is built with the original keys. If ``None``, all nodes are kept.
+    :param function rename: Function that receives a key of a dictionary and
+     returns the new key. If ``None``, keys are not changed.
+    :param str joinchar: String used to join the keys to form the paths.
+    :param bool lists: Transform the elements of lists. If ``False``, lists
+     are treated as leaves.
+    :param bool inplace: Modify the dictionaries and lists of the tree in
+     place instead of creating new ones. The order of the keys is preserved.
+
+    :return: The transformed tree. The new containers are of the same class
+     of the original ones, for example, :py:class:`collections.OrderedDict`.
+    :rtype: dict or list
+    """
+    containers = CONTAINERS if lists else dict
+
+    def container(node):
+        if inplace:
+            return node
+        return node.__class__() if isinstance(node, dict) else []
+
+    root = container(data)
+    stack = [(None, data, root)]
+
+    while stack:
+        prefix, source, target = stack.pop()
+
+        isdict = isinstance(target, dict)
+        children = _children(source)
+        if inplace:
+            children = list(children)
+            source.clear()
+
+        for key, value in children:
+            if keep is not None:
+                path = str(key) if prefix is None else (
+                    prefix + joinchar + str(key)
+                )
+                if keep(path, key, value) is False:
+                    continue
+            else:
+                path = None
+
+            if isinstance(value, containers):
+                child = container(value)
+                stack.append((path, value, child))
+                value = child
+
+            if not isdict:
+                target.append(value)
+            elif rename is None:
+                target[key] = value
+            else:
+                target[rename(key)] = value
+
+    return root
+
+
+def select(data, patterns, leaf=None):
+    """
+    Find the nodes whose path matches a sequence of patterns, one for each
+    level of the tree.
+
+    Branches whose keys don't match the pattern of their level are pruned.
+
+    :param data: The root of the tree.
+    :param list patterns: fnmatch_ patterns of the keys of each level.
+    :param function leaf: Function called with the key, value and depth of
+     the leaves (values that are not dictionaries or lists) found before the
+     last level, that would otherwise be ignored.
+
+    :return: A generator of the key and value of the matching nodes of the
+     last level.
+    :rtype: generator
+
+    .. _fnmatch: https://docs.python.org/3/library/fnmatch.html
+    """
+    last = len(patterns) - 1
+    descend = False
+
+    def enter(path, key, value):
+        return descend
+
+    for _, key, value, depth in walk(data, keyfunc=_nokey, enter=enter):
+        descend = False
+
+        if not fnmatch(str(key), patterns[depth]):
+            continue
+
+        if depth == last:
+            yield key, value
+            continue
+
+        if isinstance(value, CONTAINERS):
+            descend = True
+        elif leaf is not None:
+            leaf(key, value, depth)
+
+
+def _nokey(key):
+    """
+    Key function for walks that don't need the paths.
+    """
+    return ''
+
+
+def resolve(data, keys):
+    """
+    Get the node at the given sequence of keys.
+
+    Keys of lists are converted to integers.
+
+    :param data: The root of the tree.
+    :param list keys: The keys from the root to the node.
+
+    :return: The node.
+    :raises KeyError: If a key is not present in the tree.
+    """
+    node = data
+
+    for key in keys:
+        try:
+            if isinstance(node, list):
+                node = node[int(key)]
+            else:
+                node = node[key]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise KeyError(
+                'Key "{}" of "{}" not found'.format(
+                    key, '.'.join(map(str, keys)),
+                )
+            )
+
+    return node
+
+
+__all__ = [
+    'CONTAINERS',
+    'walk',
+    'leaves',
+    'transform',
+    'select',
+    'resolve',
+]
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Utilities to parse large XML files in bounded memory.
+"""
+
+from xml.etree.ElementTree import iterparse
+
+
+def iterelements(path, ends=None, starts=(), depth=None):
+    """
+    Parse a XML file incrementally.
+
+    Elements with a tag in ``ends`` are yielded once parsed, with all their
+    children, and are removed from the tree and cleared right after, so only
+    the elements being parsed are kept in memory. Elements with a tag in
+    ``starts`` are yielded as soon as their start tag is parsed, with their
+    attributes but without their children.
+
+    :param path: Path to the XML file.
+    :param set ends: Tags of the elements to yield once parsed. If ``None``,
+     all elements are yielded.
+    :param set starts: Tags of the elements to yield when started.
+    :param int depth: Only yield the elements parsed at this depth, being
+     ``0`` the depth of the root element. If ``None``, elements at any depth
+     are yielded.
+
+    :return: A generator of tuples of the event, ``start`` or ``end``, and the
+     element.
+    :rtype: generator
+    """
+    parents = []
+
+    for event, element in iterparse(str(path), events=('start', 'end')):
+        if event == 'start':
+            level = len(parents)
+            parents.append(element)
+            if element.tag in starts and (depth is None or level == depth):
+                yield event, element
+            continue
+
+        parents.pop()
+
+        if depth is not None and len(parents) != depth:
+            continue
+
+        if ends is not None and element.tag not in ends:
+            continue
+
+        yield event, element
+
+        # The previous siblings were removed too, so finding the element in
+        # its parent is cheap
+        element.clear()
+        if parents:
+            parents[-1].remove(element)
+
+
+__all__ = ['iterelements']
@@ -0,0 +1,677 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Remote execution of components in flowbber workers.
+
+A worker is a long running process, started with the ``flowbber-worker``
+executable, that listens on a TCP or Unix socket for requests to execute
+components. The pipeline sends the type, configuration and input data of the
+component and the worker executes it in a subprocess, exactly as the pipeline
+would do locally, and sends back the :class:`ExecutionInfo
+<flowbber.components.base.ExecutionInfo>` of the execution.
+
+Messages are exchanged using :py:mod:`multiprocessing.connection`, which
+authenticates both ends using a shared secret key.
+"""
+
+from sys import exit
+from os import getpid, cpu_count, environ
+from pathlib import Path
+from time import time
+from signal import signal, SIGTERM
+from threading import Thread, Lock, BoundedSemaphore
+from argparse import ArgumentParser
+from traceback import format_exc
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client, wait
+
+from setproctitle import setproctitle
+
+from . import __version__
+from .logging import get_logger, setup_logging
+from .components.base import (
+    ExecutionInfo, ComponentError, CrashError, TimeExceededError,
+)
+
+
+log = get_logger(__name__)
+
+
+AUTHKEY_ENV = 'FLOWBBER_WORKER_AUTHKEY'
+"""
+Name of the environment variable the worker reads the authentication key from.
+"""
+
+
+def parse_address(address):
+    """
+    Parse the address of a worker.
+
+    :param str address: Either ``host:port`` for a TCP socket or
+     ``unix:/path/to/socket`` for a Unix socket.
+
+    :return: The address in the format expected by
+     :py:mod:`multiprocessing.connection`: A tuple ``(host, port)`` for TCP
+     sockets or a path for Unix sockets.
+    :rtype: tuple or str
+    """
+    if address.startswith('unix:'):
+        path = address[len('unix:'):]
+        if not path:
+            raise ValueError('Missing path in address {}'.format(address))
+        return path
+
+    host, separator, port = address.rpartition(':')
+    if not separator or not host or not port.isdigit():
+        raise ValueError(
+            'Invalid address {}. Must be "host:port" or '
+            '"unix:/path/to/socket"'.format(address)
+        )
+
+    return (host, int(port))
+
+
+def component_kind(component):
+    """
+    Get the kind of the given component.
+
+    :param component: A component instance.
+    :type component: :class:`flowbber.components.base.Component`
+
+    :return: One of ``source``, ``aggregator`` or ``sink``.
+    :rtype: str
+    """
+    from .components import Source, Aggregator, Sink
+
+    for kind, clss in (
+        ('source', Source),
+        ('aggregator', Aggregator),
+        ('sink', Sink),
+    ):
+        if isinstance(component, clss):
+            return kind
+
+    raise TypeError('Unknown component {}'.format(component))
+
+
+class RemoteWorker:
+    """
+    Client side information about a worker.
+
+    :param str address: Address of the worker as given in the pipeline
+     definition.
+    :param int capacity: Number of components the worker can execute at the
+     same time.
+    """
+
+    def __init__(self, address, capacity):
+        self.address = address
+        self.capacity = capacity
+        self.inflight = 0
+
+    @property
+    def load(self):
+        """
+        Load of the worker if another component is submitted to it.
+        """
+        return (self.inflight + 1) / self.capacity
+
+    def __str__(self):
+        return '{} ({}/{})'.format(
+            self.address, self.inflight, self.capacity,
+        )
+
+    def __repr__(self):
+        return str(self)
+
+
+class RemoteExecution:
+    """
+    Execution of a component in a remote worker.
+
+    The request is sent when this object is created. Errors connecting or
+    sending the request to the worker, or the lack of reachable workers, are
+    reported when joining.
+
+    :param pool: The pool the worker belongs to.
+    :type pool: :class:`WorkerPool`
+    :param worker: The worker that will execute the component, or ``None`` if
+     no worker is reachable.
+    :type worker: :class:`RemoteWorker`
+    :param component: The component to execute.
+    :type component: :class:`flowbber.components.base.Component`
+    :param tuple args: Arguments for the execution of the component.
+    """
+
+    GRACE = 10.0
+    """
+    Seconds to wait for the worker to reply after the component timeout
+    expired. The worker enforces the timeout, so it should reply right after.
+    """
+
+    def __init__(self, pool, worker, component, args):
+        self._pool = pool
+        self._worker = worker
+        self._address = worker.address if worker is not None else None
+        self._component = component
+        self._connection = None
+        self._error = None
+        self._start = time()
+
+        if worker is None:
+            self._error = 'No flowbber workers reachable at {}'.format(
+                ', '.join(pool.addresses),
+            )
+            return
+
+        try:
+            self._connection = Client(
+                parse_address(worker.address), authkey=pool.authkey,
+            )
+            self._connection.send({
+                'action': 'execute',
+                'kind': component_kind(component),
+                'index': component.index,
+                'type': component.type,
+                'id': component.id,
+                'optional': component.optional,
+                'timeout': component.timeout,
+                'config': component._userconf,
+                'resources': component._resources,
+                'args': args,
+            })
+        except Exception as e:
+            log.debug(format_exc())
+            self._error = 'Unable to submit to worker {}: {}'.format(
+                worker.address, e,
+            )
+            self._close()
+
+    @property
+    def worker(self):
+        """
+        Address of the worker executing the component.
+        """
+        return self._address
+
+    @property
+    def sentinel(self):
+        """
+        Connection to the worker, that becomes ready when the worker replies,
+        or ``None`` if the request couldn't be sent.
+        """
+        return self._connection
+
+    def _close(self):
+        """
+        Close the connection to the worker and free its slot.
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+        if self._worker is not None:
+            self._pool.release(self._worker)
+            self._worker = None
+
+    def _crashed(self, message):
+        """
+        Log the given message and raise a crash of the execution.
+        """
+        log.error(message)
+        raise CrashError(ExecutionInfo(
+            'crashed', time() - self._start, None, None, None,
+        ))
+
+    def join(self, timeout):
+        """
+        Wait for the execution in the worker to end.
+
+        :param float timeout: Remaining time in seconds of the component
+         timeout, or ``None`` to wait forever.
+
+        :return: The execution information of the component.
+        :rtype: :class:`flowbber.components.base.ExecutionInfo`
+        """
+        if self._error is not None:
+            self._crashed(self._error)
+
+        address = self.worker
+
+        try:
+            if timeout is not None:
+                timeout += self.GRACE
+
+            if not self._connection.poll(timeout):
+                log.error(
+                    'Worker {} did not reply on time for {}'.format(
+                        address, self._component,
+                    )
+                )
+                raise TimeExceededError(
+                    ExecutionInfo(
+                        'hanged', time() - self._start, None, None, None,
+                    )
+                )
+
+            reply = self._connection.recv()
+
+        except (OSError, EOFError) as e:
+            self._crashed('Lost connection to worker {}: {}'.format(
+                address, e,
+            ))
+
+        finally:
+            self._close()
+
+        if 'error' in reply:
+            self._crashed('Worker {} failed executing {}:\n{}'.format(
+                address, self._component, reply['error'],
+            ))
+
+        execution = reply['execution']
+
+        if execution.status == 'succeeded':
+            return execution
+        if execution.status == 'crashed':
+            raise CrashError(execution)
+        raise TimeExceededError(execution)
+
+    def cancel(self):
+        """
+        Ask the worker to stop the execution of the component.
+        """
+        if self._connection is not None:
+            try:
+                self._connection.send({'action': 'stop'})
+            except Exception:
+                log.debug(format_exc())
+
+        self._close()
+
+
+class WorkerPool:
+    """
+    Pool of remote workers to execute components.
+
+    Workers are contacted the first time a component is submitted, to learn
+    their capacity. Unreachable workers are ignored, and contacted again when
+    a component is submitted after a backoff that doubles on each attempt.
+
+    Each component is submitted to the worker that will have the least load,
+    relative to its capacity, after accepting it.
+
+    :param list addresses: Addresses of the workers. See
+     :func:`parse_address` for the format.
+    :param str authkey: Key to authenticate with the workers, if any.
+    """
+
+    BACKOFF = 1.0
+    """
+    Seconds to wait before contacting again the unreachable workers.
+    """
+
+    MAX_BACKOFF = 60.0
+    """
+    Maximum seconds to wait before contacting again the unreachable workers.
+    """
+
+    def __init__(self, addresses, authkey=None):
+        self._addresses = addresses
+        self._authkey = authkey.encode('utf-8') if authkey else None
+        self._workers = []
+        self._lock = Lock()
+
+        # Time of the next discovery, or None if all workers were discovered
+        self._discovery = 0.0
+        self._backoff = self.BACKOFF
+
+    @property
+    def addresses(self):
+        """
+        Addresses of the workers.
+        """
+        return self._addresses
+
+    @property
+    def authkey(self):
+        """
+        Key to authenticate with the workers.
+        """
+        return self._authkey
+
+    def _discover(self):
+        """
+        Contact the workers not discovered yet to learn their capacity.
+        """
+        discovered = {worker.address for worker in self._workers}
+
+        for address in self._addresses:
+            if address in discovered:
+                continue
+
+            try:
+                with Client(
+                    parse_address(address), authkey=self._authkey
+                ) as connection:
+                    connection.send({'action': 'hello'})
+                    hello = connection.recv()
+            except Exception as e:
+                log.warning('Ignoring unreachable worker {}: {}'.format(
+                    address, e,
+                ))
+                continue
+
+            log.info(
+                'Worker {address} (PID {pid}, flowbber {version}) has '
+                'capacity for {capacity} components'.format(
+                    address=address, **hello
+                )
+            )
+            self._workers.append(RemoteWorker(address, hello['capacity']))
+
+        if len(self._workers) == len(self._addresses):
+            self._discovery = None
+            return
+
+        log.warning(
+            '{} of {} flowbber workers reachable. Contacting the others again '
+            'in {} seconds ...'.format(
+                len(self._workers), len(self._addresses), self._backoff,
+            )
+        )
+        self._discovery = time() + self._backoff
+        self._backoff = min(self._backoff * 2, self.MAX_BACKOFF)
+
+    def submit(self, component, args):
+        """
+        Submit a component for execution in the least loaded worker.
+
+        :param component: The component to execute.
+        :type component: :class:`flowbber.components.base.Component`
+        :param tuple args: Arguments for the execution of the component.
+
+        :return: The remote execution. If no worker is reachable, it fails
+         when joined.
+        :rtype: :class:`RemoteExecution`
+        """
+        with self._lock:
+            if self._discovery is not None and time() >= self._discovery:
+                self._discover()
+
+            worker = None
+            if self._workers:
+                worker = min(self._workers, key=lambda w: w.load)
+                worker.inflight += 1
+
+        if worker is None:
+            log.error('No flowbber workers reachable to execute {}'.format(
+                component,
+            ))
+        else:
+            log.info('Submitting {} to worker {}'.format(component, worker))
+
+        return RemoteExecution(self, worker, component, args)
+
+    def release(self, worker):
+        """
+        Free a slot in the given worker.
+
+        :param worker: The worker to free.
+        :type worker: :class:`RemoteWorker`
+        """
+        with self._lock:
+            if worker.inflight > 0:
+                worker.inflight -= 1
+
+
+class Worker:
+    """
+    Flowbber worker server.
+
+    :param address: Address to listen on, as returned by
+     :func:`parse_address`.
+    :param bytes authkey: Key clients must use to authenticate, if any.
+    :param int capacity: Maximum number of components to execute at the same
+     time. Further requests wait for a free slot.
+    """
+
+    def __init__(self, address, authkey=None, capacity=None):
+        from .loaders import SourcesLoader, AggregatorsLoader, SinksLoader
+
+        self._capacity = capacity or cpu_count() or 1
+        self._slots = BoundedSemaphore(self._capacity)
+
+        # Load all plugins once, they are reused for all requests
+        self._available = {
+            kind: loader().load_plugins()
+            for kind, loader in (
+                ('source', SourcesLoader),
+                ('aggregator', AggregatorsLoader),
+                ('sink', SinksLoader),
+            )
+        }
+
+        self._listener = Listener(address, authkey=authkey)
+
+    def serve_forever(self):
+        """
+        Accept and serve requests until the process is terminated.
+        """
+        log.info('Worker listening on {} with capacity for {} '
+                 'components'.format(self._listener.address, self._capacity))
+        try:
+            while True:
+                try:
+                    connection = self._listener.accept()
+                except AuthenticationError as e:
+                    log.warning('Rejected connection: {}'.format(e))
+                    continue
+
+                Thread(
+                    target=self._serve, args=(connection, ), daemon=True,
+                ).start()
+        finally:
+            self._listener.close()
+
+    def _serve(self, connection):
+        """
+        Serve a request from a client.
+        """
+        try:
+            request = connection.recv()
+            action = request.get('action', None)
+
+            if action == 'hello':
+                connection.send({
+                    'pid': getpid(),
+                    'version': __version__,
+                    'capacity': self._capacity,
+                })
+
+            elif action == 'execute':
+                with self._slots:
+                    reply = self._execute(request, connection)
+                if reply is not None:
+                    connection.send(reply)
+
+            else:
+                log.warning('Unknown request action {}'.format(action))
+
+        except (EOFError, OSError):
+            log.debug(format_exc())
+        finally:
+            connection.close()
+
+    def _execute(self, request, connection):
+        """
+        Execute a component as requested.
+
+        :return: The reply to send to the client, or ``None`` if the client
+         cancelled the execution.
+        :rtype: dict
+        """
+        kind = request['kind']
+        type_ = request['type']
+
+        available = self._available.get(kind, {})
+        if type_ not in available:
+            return {'error': 'Unknown {} of type "{}"'.format(kind, type_)}
+
+        try:
+            component = available[type_](
+                request['index'], type_, request['id'],
+                optional=request['optional'],
+                timeout=request['timeout'],
+                config=request['config'],
+            )
+            if request.get('resources', None) is not None:
+                component.constrain(request['resources'])
+            component.start(*request['args'])
+        except Exception:
+            return {'error': format_exc()}
+
+        log.info('Executing {}'.format(component))
+
+        # Wait for the component to end, or the client to cancel it. Wait for
+        # the result, not only for the process to end, as the process can't
+        # end before its result is read
+        ready = wait(component.sentinels + [connection], component.timeout)
+
+        if connection in ready:
+            log.info('Execution of {} cancelled'.format(component))
+            component.stop()
+            return None
+
+        try:
+            execution = component.join()
+        except ComponentError as e:
+            execution = e.execution
+
+        return {'execution': execution}
+
+
+def parse_args(argv=None):
+    """
+    Argument parsing routine for the worker.
+
+    :param list argv: A list of argument strings.
+
+    :return: A parsed and verified arguments namespace.
+    :rtype: :py:class:`argparse.Namespace`
+    """
+    parser = ArgumentParser(
+        description='Flowbber worker that executes components remotely.'
+    )
+
+    parser.add_argument(
+        '-v', '--verbose',
+        help='Increase verbosity level',
+        default=0,
+        action='count'
+    )
+    parser.add_argument(
+        '--version',
+        action='version',
+        version='Flowbber v{}'.format(__version__)
+    )
+    parser.add_argument(
+        '-c', '--capacity',
+        help='Number of components to execute at the same time '
+             '(default: number of CPUs)',
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        '-f', '--flowconf',
+        help='Directory with a flowconf.py file to load local components from',
+        default=None,
+    )
+    parser.add_argument(
+        'address',
+        help='Address to listen on, "host:port" or "unix:/path/to/socket". '
+             'The authentication key is read from the {} environment '
+             'variable, and it is mandatory for TCP sockets'.format(
+                 AUTHKEY_ENV
+             ),
+    )
+
+    args = parser.parse_args(argv)
+    setup_logging(args.verbose)
+
+    try:
+        args.address = parse_address(args.address)
+    except ValueError as e:
+        parser.error(str(e))
+
+    args.authkey = environ.get(AUTHKEY_ENV, None)
+    if args.authkey:
+        args.authkey = args.authkey.encode('utf-8')
+    elif not isinstance(args.address, str):
+        parser.error(
+            'An authentication key in the {} environment variable is '
+            'required to listen on a TCP socket'.format(AUTHKEY_ENV)
+        )
+
+    if args.capacity is not None and args.capacity < 1:
+        parser.error('Capacity must be at least 1')
+
+    if args.flowconf is not None:
+        args.flowconf = Path(args.flowconf).resolve()
+
+    return args
+
+
+def run(argv=None):
+    """
+    Worker executable entry point.
+    """
+    setproctitle('flowbber - worker')
+    args = parse_args(argv)
+
+    if args.flowconf is not None:
+        from .local import load_configuration
+        load_configuration(args.flowconf)
+
+    # Exit cleanly on SIGTERM so the logging subprocess is stopped and the
+    # Unix socket, if any, is removed
+    def terminate(signum, frame):
+        exit(0)
+
+    signal(SIGTERM, terminate)
+
+    worker = Worker(
+        args.address, authkey=args.authkey, capacity=args.capacity,
+    )
+    try:
+        worker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    run()
+
+
+__all__ = [
+    'parse_address',
+    'WorkerPool',
+    'RemoteExecution',
+    'Worker',
+    'run',
+]
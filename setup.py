@@ -340,7 +340,7 @@ setup(
         ###########
 
         # CoberturaSource
-        'cobertura': ['pycobertura'],
+        'cobertura': [],
         # ConfigSource
         'config': [],
         # CPUSource
@@ -356,7 +356,7 @@ setup(
         # GTestSource
         'gtest': [],
         # LcovSource
-        'lcov': ['lcov_cobertura'],
+        'lcov': [],
         # PyTestSource
         'pytest': [],
         # SLOCSource
@@ -375,7 +375,7 @@ setup(
         ###############
         'expander': [],
         'filter': [],
-        'lcov_merger': ['lcov_cobertura'],
+        'lcov_merger': [],
 
         ###########
         # Sinks   #
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2017-2020 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Benchmark of the tree walkers ported to :mod:`flowbber.utils.traverse`
+against their previous recursive implementations, on deep and wide payloads.
+
+Run with::
+
+    python3 test/benchmark_traverse.py
+"""
+
+from timeit import repeat
+
+from flowbber.utils.filter import filter_dict, is_wanted
+from flowbber.plugins.sinks.mongodb import mongodb_safe
+from flowbber.plugins.sinks.influxdb import transform_to_flat
+
+
+def recursive_filter_dict(data, include, exclude, joinchar='.'):
+    def filter_dict_recursive(breadcrumbs, element):
+        if not isinstance(element, dict):
+            return element
+
+        return element.__class__(
+            (key, filter_dict_recursive(breadcrumbs + [key], value))
+            for key, value in element.items()
+            if is_wanted(joinchar.join(breadcrumbs + [key]), include, exclude)
+        )
+
+    return filter_dict_recursive([], data)
+
+
+def recursive_mongodb_safe(data, dotreplace, dollarreplace):
+    def safe_key(key):
+        if key.startswith('$'):
+            key = key.replace('$', dollarreplace, 1)
+
+        return key.replace('.', dotreplace)
+
+    def safe_value(value):
+        if not isinstance(value, dict):
+            return value
+
+        return {
+            safe_key(k): safe_value(v)
+            for k, v in value.items()
+        }
+
+    return safe_value(data)
+
+
+def recursive_transform_to_flat(data, keysjoiner, keysjoinerreplace):
+    def joinkey(path, key):
+        parts = [*path, key]
+
+        if keysjoinerreplace is not None:
+            parts = [
+                part.replace(keysjoiner, keysjoinerreplace)
+                for part in parts
+            ]
+
+        return keysjoiner.join(parts)
+
+    def flat(dictionary, path):
+        for key, value in dictionary.items():
+            if isinstance(value, dict):
+                yield from flat(value, path + [key])
+                continue
+
+            if isinstance(value, list):
+                yield from flat({
+                    str(index): subvalue
+                    for index, subvalue in enumerate(value)
+                }, path)
+                continue
+
+            yield joinkey(path, key), value
+
+    return {
+        key: dict(flat(value, []))
+        for key, value in data.items()
+    }
+
+
+def deep(depth, width):
+    """
+    Payload of the given depth with ``width`` leaves at each level.
+    """
+    root = {}
+    node = root
+    for level in range(depth):
+        for index in range(width):
+            node['leaf.{}'.format(index)] = index
+        node = node.setdefault('level{}'.format(level), {})
+    return {'source': root}
+
+
+def wide(files, metrics):
+    """
+    Payload like the one of a coverage source with many files.
+    """
+    return {'source': {'files': {
+        'src/file{}.c'.format(index): {
+            'metric{}'.format(metric): metric for metric in range(metrics)
+        }
+        for index in range(files)
+    }}}
+
+
+def main():
+    payloads = [
+        ('deep', deep(200, 10)),
+        ('wide', wide(5000, 10)),
+    ]
+
+    cases = [
+        (
+            'filter_dict',
+            lambda data: recursive_filter_dict(data, ['*'], ['*.metric1']),
+            lambda data: filter_dict(data, ['*'], ['*.metric1']),
+        ),
+        (
+            'mongodb_safe',
+            lambda data: recursive_mongodb_safe(data, ':', '&'),
+            lambda data: mongodb_safe(data, ':', '&'),
+        ),
+        (
+            'transform_to_flat',
+            lambda data: recursive_transform_to_flat(data, '.', ':'),
+            lambda data: transform_to_flat(data, '.', ':'),
+        ),
+    ]
+
+    print('{:<20} {:<6} {:>12} {:>12}'.format(
+        'function', 'data', 'recursive', 'iterative',
+    ))
+    for name, recursive, iterative in cases:
+        for label, payload in payloads:
+            timings = [
+                min(repeat(lambda: function(payload), number=3, repeat=5)) / 3
+                for function in (recursive, iterative)
+            ]
+            print('{:<20} {:<6} {:>10.2f}ms {:>10.2f}ms'.format(
+                name, label, *(timing * 1000 for timing in timings)
+            ))
+
+
+if __name__ == '__main__':
+    main()
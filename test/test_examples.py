@@ -1,21 +1,33 @@
+import sys
 from os import environ
-from json import loads
+from os.path import relpath
+from time import sleep, time
+from json import loads, dumps
 from shutil import which
 from pathlib import Path
-from subprocess import run
+from subprocess import run, Popen, PIPE
 from collections import namedtuple
+from multiprocessing import get_start_method, set_start_method
+from http.client import HTTPConnection
 
-from pytest import mark
+from pytest import mark, raises
 from deepdiff import DeepDiff
 
 from flowbber.main import main
+from flowbber import journal as journal_command
+from flowbber.pipeline import Pipeline
+from flowbber.reloader import Reloader
+from flowbber.inputs import load_pipeline
+from flowbber.components import CrashError
 from flowbber.logging import get_logger, setup_logging
 
 
 Arguments = namedtuple(
     'Arguments', [
-        'pipeline', 'dry_run', 'journal',
+        'pipeline', 'dry_run', 'journal', 'cache', 'reload',
+        'snapshot', 'replay', 'only_failed', 'trace',
     ],
+    defaults=[False, False, None, None, False, None],
 )
 
 
@@ -47,6 +59,7 @@ def run_pipeline(name, pipelinedef):
     ['basic', 'pipeline.yaml'],
     ['config', 'pipeline.toml'],
     ['cpu', 'pipeline.toml'],
+    ['git', 'pipeline.toml'],
     ['local', 'pipeline.toml'],
     ['sloc', 'pipeline.toml'],
     ['test', 'pipeline.toml'],
@@ -56,6 +69,259 @@ def test_pipeline(name, pipelinedef):
     run_pipeline(name, pipelinedef)
 
 
+def test_source_junit_summary_only():
+    """
+    Keep only the failed cases of the JUnit like results.
+    """
+    from flowbber.plugins.sources.gtest import GTestSource
+    from flowbber.plugins.sources.pytest import PytestSource
+
+    def collect(cls, xmlfile, summary_only):
+        return cls(
+            0, 'junit', 'tests',
+            config={
+                'xmlpath': str(examples / 'test' / xmlfile),
+                'summary_only': summary_only,
+            },
+        ).collect()
+
+    for cls, xmlfile, failed in [
+        (GTestSource, 'gtest.xml', {'FAIL'}),
+        (GTestSource, 'new_gtest.xml', {'FAIL'}),
+        (PytestSource, 'pytest.xml', {'FAIL', 'ERROR'}),
+    ]:
+        full = collect(cls, xmlfile, False)
+        summary = collect(cls, xmlfile, True)
+
+        for suitename, suite in full['suites'].items():
+            expected = suite.pop('cases')
+            cases = summary['suites'][suitename].pop('cases')
+            assert cases == {
+                name: case for name, case in expected.items()
+                if case['status'] in failed
+            }
+            assert cases
+
+        assert summary == full
+
+
+def test_source_glob(tmpdir):
+    """
+    Parse the results of several shards with a single source and merge them.
+    """
+    from flowbber.plugins.sources.json import JSONSource, merge_objects
+    from flowbber.plugins.sources.gtest import GTestSource
+    from flowbber.plugins.sources.pytest import PytestSource
+    from flowbber.plugins.sources.cobertura import CoberturaSource
+
+    root = Path(str(tmpdir))
+
+    def collect(cls, config):
+        return cls(0, 'shards', 'tests', config=config).collect()
+
+    for cls, xmlfile, counters in [
+        (GTestSource, 'gtest.xml', ['tests', 'failures', 'passed']),
+        (PytestSource, 'pytest.xml', ['tests', 'failures', 'passed']),
+    ]:
+        xmlpath = examples / 'test' / xmlfile
+        for shard in ['0', '1']:
+            shardpath = root / cls.__name__ / shard / xmlfile
+            shardpath.parent.mkdir(parents=True)
+            shardpath.write_bytes(xmlpath.read_bytes())
+
+        single = collect(cls, {'xmlpath': str(xmlpath)})
+        merged = collect(cls, {
+            'glob': str(root / cls.__name__ / '**' / '*.xml'),
+            'jobs': 2,
+        })
+
+        for key in counters:
+            assert merged[key] == single[key] * 2
+        assert merged['suites'].keys() == single['suites'].keys()
+        for suitename, suite in merged['suites'].items():
+            assert suite['cases'] == single['suites'][suitename]['cases']
+            assert suite['tests'] == single['suites'][suitename]['tests'] * 2
+
+    # The hits of the lines are summed, the branches covered are the most
+    # covered in any report
+    for shard, replacement in [
+        ('0', '50% (1/2)'),
+        ('1', '0% (0/2)'),
+    ]:
+        (root / 'coverage-{}.xml'.format(shard)).write_text(
+            COBERTURA_XML.replace('50% (1/2)', replacement)
+        )
+
+    data = collect(CoberturaSource, {
+        'glob': str(root / 'coverage-*.xml'),
+        'jobs': 1,
+        'lines': True,
+    })
+    assert data['files']['src/main.c']['lines'] == {
+        'ranges': [1, 3, 7, 2],
+        'hits': [2, 2, 6, 1, 0, 2],
+        'branches': [3, 1, 2],
+    }
+    assert data['total']['total_statements'] == 6
+    assert data['total']['total_branches_hit'] == 1
+
+    # Objects are merged recursively
+    for index, obj in enumerate([
+        {'a': {'b': 1, 'c': 2}, 'd': [1]},
+        {'a': {'b': 3}, 'd': [2], 'e': None},
+    ]):
+        (root / '{}.json'.format(index)).write_text(dumps(obj))
+
+    assert collect(JSONSource, {'glob': str(root / '*.json')}) == {
+        'a': {'b': 3, 'c': 2}, 'd': [2], 'e': None,
+    }
+
+    # Lists are concatenated, other objects can't be merged
+    assert merge_objects(iter([[1], [2, 3]])) == [1, 2, 3]
+    for objects in [[{'a': 1}, [2]], [[1], {'b': 2}], ['a', 'b']]:
+        with raises(TypeError):
+            merge_objects(iter(objects))
+
+    # Files that don't contain an object are indexed by their path, which
+    # isn't parsed as an URI
+    lists = root / 'lists'
+    lists.mkdir()
+    for name, obj in [('a#b.json', {'a': 1}), ('a?b.json', [2])]:
+        (lists / name).write_text(dumps(obj))
+
+    assert collect(JSONSource, {'glob': str(lists / '*.json')}) == {
+        str(lists / 'a#b.json'): {'a': 1},
+        str(lists / 'a?b.json'): [2],
+    }
+
+    # Either a single file or a pattern
+    for config in [{}, {'xmlpath': 'tests.xml', 'glob': '*.xml'}]:
+        with raises(ValueError):
+            collect(GTestSource, config)
+
+    with raises(FileNotFoundError):
+        collect(GTestSource, {'glob': str(root / '*.nothing')})
+
+    # Files are parsed in forked processes whatever the default start method
+    method = get_start_method()
+    set_start_method('spawn', force=True)
+    try:
+        merged = collect(GTestSource, {
+            'glob': str(root / GTestSource.__name__ / '**' / '*.xml'),
+            'jobs': 2,
+        })
+    finally:
+        set_start_method(method, force=True)
+    single = collect(GTestSource, {
+        'xmlpath': str(examples / 'test' / 'gtest.xml'),
+    })
+    assert merged['tests'] == single['tests'] * 2
+
+
+def test_source_valgrind_summary_only():
+    """
+    Keep only the counters of each kind of error and the errors that occurred
+    the most.
+    """
+    from flowbber.plugins.sources.valgrind.memcheck import (
+        ValgrindMemcheckSource,
+    )
+
+    def collect(**config):
+        config['xmlpath'] = str(
+            examples / 'valgrind' / 'memcheck' / 'memcheck.xml'
+        )
+        return ValgrindMemcheckSource(
+            0, 'valgrind_memcheck', 'memcheck', config=config,
+        ).collect()
+
+    full = collect()
+    summary = collect(summary_only=True, top=2)
+
+    assert summary.pop('kinds') == {
+        'InvalidWrite': {'errors': 1, 'occurrences': 10},
+        'InvalidRead': {'errors': 1, 'occurrences': 10},
+        'InvalidFree': {'errors': 1, 'occurrences': 1},
+        'Leak_DefinitelyLost': {'errors': 1, 'occurrences': 1},
+    }
+
+    # Ties are sorted in the order of the file
+    errors = summary.pop('error')
+    assert [error.pop('occurrences') for error in errors] == [10, 10]
+    assert errors == full.pop('error')[:2]
+
+    # The rest of the data is the same, except the counts of the errors
+    del full['errorcounts']
+    assert summary == full
+
+
+def test_source_valgrind_deduplicate(tmpdir):
+    """
+    Merge the same errors found in the XML files of several executables.
+    """
+    from flowbber.plugins.sources.valgrind.memcheck import (
+        ValgrindMemcheckSource,
+    )
+
+    xml = (
+        examples / 'valgrind' / 'memcheck' / 'memcheck.xml'
+    ).read_text(encoding='utf-8')
+
+    root = Path(str(tmpdir))
+    for binary in ['first', 'second', 'third']:
+        (root / '{}.xml'.format(binary)).write_text(
+            xml.replace('<exe>./vg</exe>', '<exe>./{}</exe>'.format(binary)),
+            encoding='utf-8',
+        )
+
+    def collect(**config):
+        config['glob'] = str(root / '*.xml')
+        config['deduplicate'] = True
+        return ValgrindMemcheckSource(
+            0, 'valgrind_memcheck', 'memcheck', config=config,
+        ).collect()
+
+    data = collect(jobs=2, signature_frames=1)
+
+    assert data['total_errors'] == 12
+    assert data['unique_errors'] == 4
+    assert list(data['files']) == [
+        str(root / '{}.xml'.format(binary))
+        for binary in ['first', 'second', 'third']
+    ]
+    assert [
+        (
+            error['kind'], error['signature'],
+            error['occurrences'], error['binaries'],
+        )
+        for error in data['error']
+    ] == [
+        (
+            'InvalidWrite', ['read_and_write (vg.c:14)'],
+            30, ['./first', './second', './third'],
+        ),
+        (
+            'InvalidRead', ['read_and_write (vg.c:20)'],
+            30, ['./first', './second', './third'],
+        ),
+        (
+            'InvalidFree', ['free (vgpreload_memcheck-amd64-linux.so)'],
+            3, ['./first', './second', './third'],
+        ),
+        (
+            'Leak_DefinitelyLost',
+            ['malloc (vgpreload_memcheck-amd64-linux.so)'],
+            3, ['./first', './second', './third'],
+        ),
+    ]
+
+    # Same errors in summary mode
+    summary = collect(jobs=1, signature_frames=1, summary_only=True, top=2)
+
+    assert summary['kinds']['InvalidRead'] == {'errors': 3, 'occurrences': 30}
+    assert summary['error'] == data['error'][:2]
+
+
 def test_pipeline_filter():
     run_pipeline('filter', 'pipeline.toml')
 
@@ -140,3 +406,1362 @@ def test_pipeline_env():
     }
     differences = DeepDiff(actual, expected)
     assert not differences
+
+
+def test_pipeline_workers(tmpdir, monkeypatch):
+    """
+    Run a pipeline with remote components in two local workers.
+    """
+    authkey = 'flowbber-test-authkey'
+    monkeypatch.setenv('FLOWBBER_WORKERS_DIR', str(tmpdir))
+    monkeypatch.setenv('FLOWBBER_WORKER_AUTHKEY', authkey)
+
+    sockets = [
+        Path(str(tmpdir)) / 'worker{}.sock'.format(number)
+        for number in (1, 2)
+    ]
+    workers = [
+        Popen([
+            sys.executable, '-m', 'flowbber.workers',
+            '--capacity', '2', 'unix:{}'.format(socket),
+        ])
+        for socket in sockets
+    ]
+
+    try:
+        for _ in range(100):
+            if all(socket.exists() for socket in sockets):
+                break
+            sleep(0.1)
+        else:
+            raise RuntimeError('Workers failed to start')
+
+        run_pipeline('workers', 'pipeline.toml')
+
+        actual = loads(
+            (Path(str(tmpdir)) / 'data.json').read_text(encoding='utf-8')
+        )
+        assert actual['name'] == 'executed remotely'
+        assert {'timestamp1', 'timestamp2', 'user'} <= set(actual)
+
+        journal = loads(
+            Path('journal-pipeline.toml.json').read_text(encoding='utf-8')
+        )
+        entries = journal['1']['sources'] + journal['1']['aggregators']
+        assert all(entry['status'] == 'succeeded' for entry in entries)
+        assert all(entry['worker'] for entry in entries)
+
+    finally:
+        for worker in workers:
+            worker.terminate()
+            worker.wait()
+
+
+LARGE_RESULTS_TOML = """\
+[workers]
+addresses = ["unix:{{env.FLOWBBER_WORKERS_DIR}}/worker.sock"]
+authkey = "{{env.FLOWBBER_WORKER_AUTHKEY}}"
+
+[[sources]]
+type = "config"
+id = "local"
+timeout = "20 seconds"
+
+    [sources.config.data]
+    blob = "{blob}"
+
+[[sources]]
+type = "config"
+id = "remote"
+remote = true
+timeout = "20 seconds"
+
+    [sources.config.data]
+    blob = "{blob}"
+
+[[sinks]]
+type = "archive"
+id = "archive"
+
+    [sinks.config]
+    output = "{{env.FLOWBBER_WORKERS_DIR}}/data.json"
+    override = true
+"""
+
+
+def start_worker(socket, *args):
+    """
+    Start a worker listening on a Unix socket and wait for it to be ready.
+    """
+    worker = Popen([
+        sys.executable, '-m', 'flowbber.workers',
+    ] + list(args) + ['unix:{}'.format(socket)])
+
+    for _ in range(100):
+        if socket.exists():
+            return worker
+        sleep(0.1)
+
+    worker.terminate()
+    worker.wait()
+    raise RuntimeError('Worker failed to start')
+
+
+def test_pipeline_large_results(tmpdir, monkeypatch):
+    """
+    Collect results larger than the buffer of a pipe, locally and remotely,
+    as soon as they are sent instead of when the timeout expires.
+    """
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir))
+    monkeypatch.setenv('FLOWBBER_WORKERS_DIR', str(tmpdir))
+    monkeypatch.setenv('FLOWBBER_WORKER_AUTHKEY', 'flowbber-test-authkey')
+
+    blob = 'x' * 2000000
+    path = Path(str(tmpdir)) / 'pipeline.toml'
+    path.write_text(LARGE_RESULTS_TOML.format(blob=blob), encoding='utf-8')
+
+    worker = start_worker(Path(str(tmpdir)) / 'worker.sock')
+    try:
+        pipeline = Pipeline(load_pipeline(path, cache=False), 'large')
+
+        start = time()
+        journal = pipeline.run()
+        assert time() - start < 10.0
+
+    finally:
+        worker.terminate()
+        worker.wait()
+
+    entries = journal[pipeline.executed]['sources']
+    assert [entry['status'] for entry in entries] == [
+        'succeeded', 'succeeded',
+    ]
+
+    actual = loads(
+        (Path(str(tmpdir)) / 'data.json').read_text(encoding='utf-8')
+    )
+    assert actual['local']['blob'] == blob
+    assert actual['remote']['blob'] == blob
+
+
+REMOTE_RESOURCES_TOML = """\
+[workers]
+addresses = ["unix:{env.FLOWBBER_WORKERS_DIR}/worker.sock"]
+authkey = "{env.FLOWBBER_WORKER_AUTHKEY}"
+
+[resources.sampler]
+nice = 7
+
+[[sources]]
+type = "process"
+id = "sampler"
+remote = true
+resources = "sampler"
+
+[[sinks]]
+type = "archive"
+id = "archive"
+
+    [sinks.config]
+    output = "{env.FLOWBBER_WORKERS_DIR}/data.json"
+    override = true
+"""
+
+
+def test_pipeline_workers_resources(tmpdir, monkeypatch):
+    """
+    Apply the resource class of a remote component in the worker.
+    """
+    from flowbber.local import load_configuration
+
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir))
+    monkeypatch.setenv('FLOWBBER_WORKERS_DIR', str(tmpdir))
+    monkeypatch.setenv('FLOWBBER_WORKER_AUTHKEY', 'flowbber-test-authkey')
+
+    path = Path(str(tmpdir)) / 'pipeline.toml'
+    path.write_text(REMOTE_RESOURCES_TOML, encoding='utf-8')
+
+    # The process source is registered in the resources example
+    flowconf = examples / 'resources'
+    load_configuration(flowconf)
+
+    worker = start_worker(
+        Path(str(tmpdir)) / 'worker.sock', '--flowconf', str(flowconf),
+    )
+    try:
+        pipeline = Pipeline(load_pipeline(path, cache=False), 'resources')
+        journal = pipeline.run()
+    finally:
+        worker.terminate()
+        worker.wait()
+
+    entries = journal[pipeline.executed]['sources']
+    assert entries[0]['worker']
+
+    actual = loads(
+        (Path(str(tmpdir)) / 'data.json').read_text(encoding='utf-8')
+    )
+    assert actual['sampler']['nice'] == 7
+
+
+UNREACHABLE_TOML = """\
+[workers]
+addresses = ["unix:{env.FLOWBBER_WORKERS_DIR}/worker.sock"]
+
+[[sources]]
+type = "config"
+id = "local"
+
+    [sources.config.data]
+    local = true
+
+[[sources]]
+type = "config"
+id = "remote"
+remote = true
+optional = true
+
+    [sources.config.data]
+    remote = true
+
+[[sinks]]
+type = "print"
+id = "print"
+"""
+
+
+def test_pipeline_workers_unreachable(tmpdir, monkeypatch):
+    """
+    Fail the remote components while no worker is reachable, and contact the
+    workers again after a backoff.
+    """
+    from flowbber.workers import WorkerPool
+
+    monkeypatch.setenv('FLOWBBER_WORKERS_DIR', str(tmpdir))
+    monkeypatch.setattr(WorkerPool, 'BACKOFF', 0.1)
+
+    path = Path(str(tmpdir)) / 'pipeline.toml'
+    path.write_text(UNREACHABLE_TOML, encoding='utf-8')
+    pipeline = Pipeline(load_pipeline(path, cache=False), 'unreachable')
+
+    def entries(journal):
+        return {
+            entry['id']: entry
+            for entry in journal[pipeline.executed]['sources']
+        }
+
+    sources = entries(pipeline.run())
+    assert sources['local']['status'] == 'succeeded'
+    assert sources['remote']['status'] == 'crashed'
+    assert sources['remote']['worker'] is None
+
+    worker = start_worker(Path(str(tmpdir)) / 'worker.sock')
+    try:
+        sleep(0.2)
+        sources = entries(pipeline.run())
+    finally:
+        worker.terminate()
+        worker.wait()
+
+    assert sources['remote']['status'] == 'succeeded'
+    assert sources['remote']['worker']
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """
+    HTTP connection over a Unix socket.
+    """
+
+    def __init__(self, path):
+        super().__init__('localhost')
+        self._path = path
+
+    def connect(self):
+        import socket
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self._path)
+
+
+def test_pipeline_daemon(tmpdir):
+    """
+    Host several pipelines in the daemon and trigger them on demand.
+    """
+    socket = Path(str(tmpdir)) / 'daemon.sock'
+    journals = Path(str(tmpdir)) / 'journals'
+
+    def request(method, path):
+        connection = UnixHTTPConnection(str(socket))
+        try:
+            connection.request(method, path)
+            response = connection.getresponse()
+            return response.status, loads(response.read().decode('utf-8'))
+        finally:
+            connection.close()
+
+    daemon = Popen([
+        sys.executable, '-m', 'flowbber.daemon',
+        '--listen', 'unix:{}'.format(socket),
+        '--journals', str(journals),
+        str(examples / 'daemon' / 'scheduled.toml'),
+        str(examples / 'daemon' / 'ondemand.toml'),
+    ])
+
+    try:
+        for _ in range(100):
+            if socket.exists():
+                break
+            sleep(0.1)
+        else:
+            raise RuntimeError('Daemon failed to start')
+
+        status, pipelines = request('GET', '/pipelines')
+        assert status == 200
+        assert [pipeline['name'] for pipeline in pipelines] == [
+            'scheduled', 'ondemand',
+        ]
+
+        status, result = request('POST', '/pipelines/ondemand/run')
+        assert status == 200
+        assert result['status'] == 'succeeded'
+        assert Path(result['journal']).parent == journals
+
+        status, _ = request('POST', '/pipelines/unknown/run')
+        assert status == 404
+
+        # Wait for the scheduled pipeline to take its samples
+        for _ in range(100):
+            status, pipeline = request('GET', '/pipelines/scheduled')
+            if pipeline['runs']['passed'] == 2:
+                break
+            sleep(0.1)
+        else:
+            raise RuntimeError('Scheduled pipeline failed to run')
+
+        assert pipeline['last_status'] == 'succeeded'
+        assert len(list(journals.glob('journal-scheduled-*.json'))) == 2
+
+    finally:
+        daemon.terminate()
+        daemon.wait()
+
+    assert not socket.exists()
+
+
+SLEEPY_FLOWCONF = """\
+from time import sleep
+
+from flowbber.loaders import source
+from flowbber.components import Source
+
+
+@source.register('sleepy')
+class SleepySource(Source):
+    def collect(self):
+        sleep(1)
+        return {{'pipeline': '{name}'}}
+"""
+
+SLEEPY_TOML = """\
+[schedule]
+frequency = "0.5 seconds"
+samples = 1
+
+[[sources]]
+type = "sleepy"
+id = "sleepy"
+
+[[sinks]]
+type = "print"
+id = "print"
+"""
+
+
+def test_pipeline_daemon_concurrent(tmpdir):
+    """
+    Run two scheduled pipelines at the same time in the daemon, each one with
+    its own flowconf.py registering the same type of source.
+    """
+    workdir = Path(str(tmpdir))
+    socket = workdir / 'daemon.sock'
+    journals = workdir / 'journals'
+
+    definitions = []
+    for name in ['first', 'second']:
+        directory = workdir / name
+        directory.mkdir()
+        (directory / 'flowconf.py').write_text(
+            SLEEPY_FLOWCONF.format(name=name), encoding='utf-8',
+        )
+        definition = directory / '{}.toml'.format(name)
+        definition.write_text(SLEEPY_TOML, encoding='utf-8')
+        definitions.append(str(definition))
+
+    daemon = Popen([
+        sys.executable, '-m', 'flowbber.daemon',
+        '--listen', 'unix:{}'.format(socket),
+        '--journals', str(journals),
+    ] + definitions, stdout=PIPE, universal_newlines=True)
+
+    try:
+        for _ in range(100):
+            if len(list(journals.glob('journal-*.json'))) == 2:
+                break
+            sleep(0.1)
+        else:
+            raise RuntimeError('Scheduled pipelines failed to run')
+
+    finally:
+        daemon.terminate()
+        output, _ = daemon.communicate()
+
+    # Each pipeline used the source registered by its own flowconf.py
+    assert "{'pipeline': 'first'}" in output
+    assert "{'pipeline': 'second'}" in output
+
+    digests = []
+    for name in ['first', 'second']:
+        journalfile, = journals.glob('journal-{}-*.json'.format(name))
+        execution, = loads(journalfile.read_text(encoding='utf-8')).values()
+
+        assert execution['status'] == 'succeeded'
+        digests.append(execution['digest'])
+
+    first, second = digests
+    assert first['begin'] < second['end']
+    assert second['begin'] < first['end']
+
+
+def test_pipeline_reload(tmpdir):
+    """
+    Reload a modified pipeline definition, rebuilding only the components
+    that changed.
+    """
+    definition = Path(str(tmpdir)) / 'pipeline.toml'
+    definition.write_text(
+        (examples / 'basic' / 'pipeline.toml').read_text(encoding='utf-8'),
+        encoding='utf-8',
+    )
+
+    pipeline = Pipeline(load_pipeline(definition, cache=False), 'reload')
+    reloader = Reloader(definition, cache=False)
+    before = pipeline._sources + pipeline._sinks
+
+    assert reloader.reload(pipeline) is None
+
+    # Change the configuration of the second timestamp source only
+    content = definition.read_text(encoding='utf-8').replace(
+        'id = "timestamp2"\n\n    [sources.config]\n    epoch = false',
+        'id = "timestamp2"\n\n    [sources.config]\n    epoch = true',
+    )
+    definition.write_text(content, encoding='utf-8')
+
+    assert reloader.reload(pipeline) is not None
+
+    after = pipeline._sources + pipeline._sinks
+    assert [a is b for a, b in zip(before, after)] == [
+        True, False, True, True,
+    ]
+    assert after[1].config.epoch
+
+    journal = pipeline.run()
+    assert journal[1]['status'] == 'succeeded'
+
+
+CACHE_TOML = """\
+[[sources]]
+type = "config"
+id = "config"
+
+    [sources.config.data]
+    value = "{env.FLOWBBER_CACHE_VALUE}"
+
+[[sinks]]
+type = "print"
+id = "print"
+"""
+
+
+def test_definitions_cache(tmpdir, monkeypatch):
+    """
+    Load a pipeline definition from the cache until the file, its flowconf.py,
+    the installed plugins or the values it references change.
+    """
+    import packagedata as pkgdata
+    from flowbber import inputs
+
+    workdir = Path(str(tmpdir))
+    monkeypatch.setenv('XDG_CACHE_HOME', str(workdir / 'cache'))
+    monkeypatch.setenv('FLOWBBER_CACHE_VALUE', 'one')
+
+    definition = workdir / 'pipeline.toml'
+    definition.write_text(CACHE_TOML, encoding='utf-8')
+
+    # Only a cache miss parses the file
+    parsed = []
+    parse_file = inputs.parse_file
+
+    def parse(path):
+        parsed.append(path)
+        return parse_file(path)
+
+    parse.supported_formats = parse_file.supported_formats
+    monkeypatch.setattr(inputs, 'parse_file', parse)
+
+    def load(hit):
+        count = len(parsed)
+        validated = load_pipeline(definition, cache=True)
+        assert len(parsed) == count + (0 if hit else 1)
+        return validated
+
+    # Disabled by default
+    load_pipeline(definition)
+    load_pipeline(definition)
+    assert len(parsed) == 2
+    assert not (workdir / 'cache').exists()
+
+    first = load(hit=False)
+    assert load(hit=True) == first
+    assert first['sources'][0]['config']['data']['value'] == 'one'
+
+    cachefiles = list((workdir / 'cache' / 'flowbber').glob('**/*.pickle'))
+    assert len(cachefiles) == 1
+    assert cachefiles[0].stat().st_mode & 0o777 == 0o600
+
+    # A different referenced value
+    monkeypatch.setenv('FLOWBBER_CACHE_VALUE', 'two')
+    assert load(hit=False)['sources'][0]['config']['data']['value'] == 'two'
+    monkeypatch.setenv('FLOWBBER_CACHE_VALUE', 'one')
+    assert load(hit=True) == first
+
+    # A change in the pipeline definition file
+    definition.write_text(CACHE_TOML + '\n', encoding='utf-8')
+    load(hit=False)
+    load(hit=True)
+
+    # A change in the flowconf.py
+    flowconf = workdir / 'flowconf.py'
+    flowconf.write_text('\n', encoding='utf-8')
+    load(hit=False)
+    load(hit=True)
+    flowconf.write_text('\n\n', encoding='utf-8')
+    load(hit=False)
+    load(hit=True)
+
+    # A change in the installed plugins
+    Plugin = namedtuple('Plugin', ['name', 'value'])
+    entry_points = pkgdata.entry_points
+
+    def plugins(group):
+        return list(entry_points(group=group)) + [
+            Plugin(name='other', value='other:OtherComponent'),
+        ]
+
+    monkeypatch.setattr(pkgdata, 'entry_points', plugins)
+    load(hit=False)
+    load(hit=True)
+
+
+def test_pipeline_failfast():
+    """
+    Stop a stage as soon as a non-optional component fails, without waiting
+    for the slower components.
+    """
+    start = time()
+
+    with raises(CrashError):
+        run_pipeline('failfast', 'pipeline.toml')
+
+    assert time() - start < 30.0
+
+
+def test_pipeline_snapshot(tmpdir, monkeypatch):
+    """
+    Save a snapshot of a failed execution and replay only the failed
+    components.
+    """
+    workdir = Path(str(tmpdir))
+    snapshot = workdir / 'snapshot'
+    marker = workdir / 'fail'
+    monkeypatch.setenv('FLOWBBER_SNAPSHOT_DIR', str(workdir))
+
+    pipeline = examples / 'snapshot' / 'pipeline.toml'
+
+    # First execution fails in the flaky sink
+    marker.touch()
+    with raises(CrashError):
+        main(Arguments(
+            pipeline=pipeline, dry_run=False, journal=None,
+            snapshot=snapshot,
+        ))
+
+    for name in ['sources.pickle', 'aggregators.pickle', 'journal.json']:
+        assert (snapshot / name).is_file()
+
+    # Replay, running only the failed sink
+    marker.unlink()
+    journalfile = workdir / 'journal.json'
+    result = main(Arguments(
+        pipeline=pipeline, dry_run=False, journal=str(journalfile),
+        replay=snapshot, only_failed=True,
+    ))
+    assert result == 0
+
+    journal = loads(journalfile.read_text(encoding='utf-8'))['1']
+    assert all(entry['replayed'] for entry in journal['sources'])
+    assert all(entry['replayed'] for entry in journal['aggregators'])
+    assert [
+        entry['id'] for entry in journal['sinks']
+        if not entry.get('replayed', False)
+    ][-1] == 'flaky'
+
+    data = loads((workdir / 'data.json').read_text(encoding='utf-8'))
+    assert data['count'] == {'sources': 3}
+
+
+def test_pipeline_snapshot_failed_source(tmpdir, monkeypatch):
+    """
+    Save a snapshot of an execution failed in a source and replay only the
+    failed source.
+    """
+    workdir = Path(str(tmpdir))
+    snapshot = workdir / 'snapshot'
+    marker = workdir / 'fail-source'
+    monkeypatch.setenv('FLOWBBER_SNAPSHOT_DIR', str(workdir))
+
+    pipeline = examples / 'snapshot' / 'pipeline.toml'
+
+    # First execution fails in the flaky source
+    marker.touch()
+    with raises(CrashError):
+        main(Arguments(
+            pipeline=pipeline, dry_run=False, journal=None,
+            snapshot=snapshot,
+        ))
+
+    assert (snapshot / 'sources.pickle').is_file()
+    assert not (snapshot / 'aggregators.pickle').is_file()
+
+    previous = loads(
+        (snapshot / 'journal.json').read_text(encoding='utf-8')
+    )
+    assert {
+        entry['id']: entry['status'] for entry in previous['sources']
+    } == {
+        'timestamp': 'succeeded',
+        'config': 'succeeded',
+        'unstable': 'crashed',
+    }
+
+    # Replay, running only the failed source and the stages after it
+    marker.unlink()
+    journalfile = workdir / 'journal.json'
+    result = main(Arguments(
+        pipeline=pipeline, dry_run=False, journal=str(journalfile),
+        replay=snapshot, only_failed=True,
+    ))
+    assert result == 0
+
+    journal = loads(journalfile.read_text(encoding='utf-8'))['1']
+    assert {
+        entry['id'] for entry in journal['sources']
+        if entry.get('replayed', False)
+    } == {'timestamp', 'config'}
+    assert [
+        entry['id'] for entry in journal['sources']
+        if not entry.get('replayed', False)
+    ] == ['unstable']
+
+    data = loads((workdir / 'data.json').read_text(encoding='utf-8'))
+    assert data['count'] == {'sources': 3}
+    assert data['config'] == {'snapshot': True}
+    assert data['unstable'] == {'flaky': True}
+
+
+def test_pipeline_usage():
+    """
+    Report the resource usage of the components in the journal.
+    """
+    run_pipeline('basic', 'pipeline.toml')
+
+    journal = loads(
+        Path('journal-pipeline.toml.json').read_text(encoding='utf-8')
+    )['1']
+
+    for entry in journal['sources'] + journal['sinks']:
+        assert set(entry['usage']) == {'self', 'children'}
+        assert entry['usage']['self']['maxrss'] > 0
+
+    usage = journal['digest']['usage']
+    assert usage['sources']['maxrss'] > 0
+    assert usage['aggregators']['user'] == 0
+
+
+def test_pipeline_resources(tmpdir, monkeypatch):
+    """
+    Apply resource classes to the components.
+    """
+    workdir = Path(str(tmpdir))
+    monkeypatch.setenv('FLOWBBER_RESOURCES_DIR', str(workdir))
+
+    run_pipeline('resources', 'pipeline.toml')
+
+    data = loads((workdir / 'data.json').read_text(encoding='utf-8'))
+    assert data['sampler'] == {'affinity': [0], 'nice': 5}
+    assert 'parser' not in data
+
+    journal = loads(
+        Path('journal-pipeline.toml.json').read_text(encoding='utf-8')
+    )['1']
+    statuses = {entry['id']: entry['status'] for entry in journal['sources']}
+    assert statuses == {'sampler': 'succeeded', 'parser': 'out of memory'}
+
+
+def test_pipeline_stacks(tmpdir):
+    """
+    Dump the stacks of a component before killing it on timeout.
+    """
+    journalfile = Path(str(tmpdir)) / 'journal.json'
+    result = main(Arguments(
+        pipeline=examples / 'stacks' / 'pipeline.toml',
+        dry_run=False, journal=str(journalfile),
+    ))
+    assert result == 0
+
+    journal = loads(journalfile.read_text(encoding='utf-8'))['1']
+    entry = next(
+        entry for entry in journal['sources'] if entry['id'] == 'stuck'
+    )
+    assert entry['status'] == 'timed out'
+
+    stacks = Path(entry['stacks'])
+    assert stacks.parent == journalfile.parent
+    assert 'wait_forever' in stacks.read_text(encoding='utf-8')
+
+
+def test_component_stacks_file():
+    """
+    Create the file to dump the stacks to only for components with a timeout,
+    and close it when the component is joined or stopped.
+    """
+    from flowbber.plugins.sources.config import ConfigSource
+
+    config = {'data': {'value': 1}}
+
+    component = ConfigSource(0, 'config', 'untimed', config=config)
+    component.start()
+    assert component._stacks is None
+    assert component.join().status == 'succeeded'
+
+    component = ConfigSource(0, 'config', 'timed', timeout=10, config=config)
+    component.start()
+    stacks = component._stacks
+    assert not stacks.closed
+    assert component.join().status == 'succeeded'
+    assert stacks.closed
+
+    component.start()
+    stacks = component._stacks
+    component.stop()
+    assert stacks.closed
+
+
+def test_pipeline_trace(tmpdir):
+    """
+    Save a timeline of the execution in the Chrome trace event format.
+    """
+    tracefile = Path(str(tmpdir)) / 'trace.json'
+    result = main(Arguments(
+        pipeline=examples / 'basic' / 'pipeline.toml',
+        dry_run=False, journal=None, trace=tracefile,
+    ))
+    assert result == 0
+
+    events = loads(tracefile.read_text(encoding='utf-8'))['traceEvents']
+
+    tracks = {
+        event['pid']: event['args']['name']
+        for event in events if event['ph'] == 'M'
+    }
+    assert len(tracks) == 5
+    assert 'pipeline' in tracks.values()
+
+    spans = [event for event in events if event['ph'] == 'X']
+    for phase in ['spawn', 'collect', 'serialize', 'distribute']:
+        assert any(span['name'] == phase for span in spans)
+
+    for span in spans:
+        assert span['pid'] in tracks
+        assert span['dur'] >= 0
+
+    joins = [span for span in spans if span['cat'] == 'join']
+    assert len(joins) >= 4
+
+    markers = [event['name'] for event in events if event['ph'] == 'i']
+    assert markers == [
+        'sources barrier', 'aggregators barrier', 'sinks barrier',
+    ]
+
+
+def test_journal_stats(tmpdir, capsys):
+    """
+    Compute the statistics of the components in a stream of journals and
+    find the components whose latency rose.
+    """
+    from gzip import open as gzopen
+
+    workdir = Path(str(tmpdir))
+
+    def execution(number):
+        begin = 1000.0 + number
+        return {
+            'status': 'succeeded',
+            'sources': [
+                {
+                    'id': 'steady', 'type': 'timestamp',
+                    'status': 'succeeded', 'duration': 1.0 + number % 10 / 100,
+                },
+                {
+                    'id': 'slower', 'type': 'cpu',
+                    'status': 'timed out' if number % 50 == 0 else 'succeeded',
+                    'duration': 2.0 if number < 100 else 3.0,
+                },
+            ],
+            'aggregators': [],
+            'sinks': [],
+            'digest': {'begin': begin, 'end': begin + 3.0},
+        }
+
+    # A JSON-lines compressed journal with one execution per line
+    with gzopen(str(workdir / 'runs.jsonl.gz'), 'wt') as fd:
+        for number in range(150):
+            fd.write(dumps(execution(number)) + '\n')
+
+    # A standard journal with several executions
+    (workdir / 'journal.json').write_text(dumps({
+        str(number): execution(number) for number in range(150, 200)
+    }))
+    (workdir / 'crashed.json').write_text(dumps({
+        '1': {'status': 'crashed', 'exception': 'Traceback'},
+    }))
+
+    args = journal_command.parse_args([
+        'stats', '--json', '--split', '1100', str(workdir),
+    ])
+    assert journal_command.main(args) == 0
+
+    report = loads(capsys.readouterr().out)
+    assert report['executions'] == 201
+    assert report['crashed'] == 1
+
+    components = {
+        component['id']: component for component in report['components']
+    }
+    assert components['steady']['executions'] == 200
+    assert components['steady']['failure_rate'] == 0.0
+    assert abs(components['steady']['p50'] - 1.045) < 0.01
+    assert components['slower']['timeout_rate'] == 0.02
+    assert components['slower']['p99'] == 3.0
+
+    assert [
+        (regression['id'], regression['increment'])
+        for regression in report['regressions']
+    ] == [('slower', 0.5)]
+
+
+def test_pipeline_budget(tmpdir, monkeypatch):
+    """
+    Mark the components that exceed their budget as slow, and derive the
+    timeouts of the components with an auto timeout from their history.
+    """
+    from flowbber.history import History
+    from flowbber.local import load_configuration
+
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir))
+
+    path = examples / 'budget' / 'pipeline.toml'
+    load_configuration(path.parent)
+    pipeline = Pipeline(
+        load_pipeline(path, cache=False), 'budget',
+        history=History(str(path)),
+    )
+
+    for _ in range(History.MIN_SAMPLES + 1):
+        journal = pipeline.run()
+
+    execution = journal[pipeline.executed]
+    entries = {
+        entry['id']: entry
+        for entry in execution['sources'] + execution['sinks']
+    }
+
+    assert entries['sleepy']['status'] == 'slow'
+    assert entries['sleepy']['budget'] == 0.1
+    assert entries['print']['status'] == 'succeeded'
+    assert execution['digest']['distribution']['sources']['slow'][
+        'which_ones'
+    ] == ['sleepy']
+
+    # Only the last execution had enough history to derive the timeout
+    assert entries['adaptive']['timeout'] == History.MIN_TIMEOUT
+
+    history = History(str(path))
+    assert len(history.durations('source', 'adaptive')) == (
+        History.MIN_SAMPLES + 1
+    )
+    assert history.durations('source', 'sleepy') == []
+
+
+COBERTURA_XML = """\
+<?xml version="1.0" ?>
+<coverage branch-rate="0.5" line-rate="0.6" version="4.5" timestamp="0">
+  <packages>
+    <package branch-rate="0.5" line-rate="0.6" name="src">
+      <classes>
+        <class branch-rate="0.5" filename="src/main.c" line-rate="0.6"
+               name="main_c">
+          <methods/>
+          <lines>
+            <line hits="1" number="1"/>
+            <line hits="1" number="2"/>
+            <line branch="true" condition-coverage="50% (1/2)" hits="3"
+                  number="3"/>
+            <line hits="0" number="7"/>
+            <line hits="0" number="8"/>
+          </lines>
+        </class>
+        <class branch-rate="0" filename="src/other.c" line-rate="1"
+               name="other_c">
+          <methods/>
+          <lines>
+            <line hits="5" number="10"/>
+          </lines>
+        </class>
+      </classes>
+    </package>
+  </packages>
+</coverage>
+"""
+
+
+def test_source_cobertura(tmpdir):
+    """
+    Collect the coverage of the files of a Cobertura report, with their line
+    level coverage in compact form.
+    """
+    from flowbber.utils.coverage import expand_lines, expand_branches
+    from flowbber.plugins.sources.cobertura import CoberturaSource
+
+    xmlpath = Path(str(tmpdir)) / 'coverage.xml'
+    xmlpath.write_text(COBERTURA_XML)
+
+    source = CoberturaSource(
+        0, 'cobertura', 'coverage',
+        config={
+            'xmlpath': str(xmlpath),
+            'exclude': ['src/other.c'],
+            'lines': True,
+        },
+    )
+    data = source.collect()
+
+    assert list(data['files']) == ['src/main.c']
+    assert data['ignored'] == ['src/other.c']
+
+    # Branch rate is re-calculated with the files filtered
+    assert data['total'] == {
+        'total_statements': 5,
+        'total_misses': 2,
+        'total_hits': 3,
+        'total_branches': 2,
+        'total_branches_hit': 1,
+        'line_rate': 0.6,
+        'branch_rate': 0.5,
+    }
+
+    lines = data['files']['src/main.c'].pop('lines')
+    assert data['files']['src/main.c'] == data['total']
+
+    assert lines == {
+        'ranges': [1, 3, 7, 2],
+        'hits': [1, 2, 3, 1, 0, 2],
+        'branches': [3, 1, 2],
+    }
+    assert list(expand_lines(lines)) == [
+        (1, 1), (2, 1), (3, 3), (7, 0), (8, 0),
+    ]
+    assert list(expand_branches(lines)) == [(3, 1, 2)]
+
+    # Without the lines, the branch rate of the files is the reported one
+    xmlpath.write_text(
+        COBERTURA_XML.replace(' branch="true"', '').replace('main.c', 'a.c')
+    )
+    source = CoberturaSource(
+        0, 'cobertura', 'coverage', config={'xmlpath': str(xmlpath)},
+    )
+    data = source.collect()
+
+    assert list(data['files']) == ['src/a.c', 'src/other.c']
+    assert data['files']['src/a.c']['branch_rate'] == 0.5
+    assert data['files']['src/other.c']['branch_rate'] == 0.0
+    assert data['total']['branch_rate'] == 0.5
+    assert data['total']['line_rate'] == 4 / 6
+
+
+LCOV_INFO = """\
+TN:
+SF:{root}/src/main.c
+FN:3,main
+FNDA:1,main
+FNF:1
+FNH:1
+BRDA:3,0,0,1
+BRDA:3,0,1,0
+BRDA:7,0,0,-
+BRDA:7,0,1,-
+BRF:4
+BRH:1
+DA:1,1
+DA:2,1
+DA:3,3
+DA:7,0
+DA:8,0
+LF:5
+LH:3
+end_of_record
+TN:
+SF:{root}/src/other.c
+DA:10,5
+end_of_record
+TN:second
+SF:{root}/src/main.c
+BRDA:3,0,1,2
+DA:7,1
+end_of_record
+"""
+
+
+def test_source_lcov(tmpdir):
+    """
+    Parse a lcov tracefile, removing files, without calling lcov.
+    """
+    from flowbber.plugins.sources.lcov import LcovSource
+
+    root = Path(str(tmpdir))
+    tracefile = root / 'coverage.info'
+    tracefile.write_text(LCOV_INFO.format(root=root))
+
+    def collect(**config):
+        config.setdefault('source', str(tracefile))
+        return LcovSource(0, 'lcov', 'coverage', config=config).collect()
+
+    data = collect(remove=['*/other.c'], lines=True)
+
+    # Paths are relative to the working directory
+    main = relpath(str(root / 'src' / 'main.c'))
+
+    assert list(data['files']) == [main]
+    assert len(data['ignored']) == 1
+
+    # Records of the same file are merged
+    assert data['total'] == {
+        'total_statements': 5,
+        'total_misses': 1,
+        'total_hits': 4,
+        'total_branches': 4,
+        'total_branches_hit': 2,
+        'line_rate': 0.8,
+        'branch_rate': 0.5,
+    }
+    assert data['files'][main]['lines'] == {
+        'ranges': [1, 3, 7, 2],
+        'hits': [1, 2, 3, 1, 1, 1, 0, 1],
+        'branches': [3, 2, 2, 7, 0, 2],
+    }
+
+    # The original tracefile is untouched, and the filtered one has the
+    # same coverage
+    assert tracefile.read_text() == LCOV_INFO.format(root=root)
+    assert data['tracefile'] != str(tracefile)
+
+    filtered = collect(source=data['tracefile'])
+    assert filtered['total'] == data['total']
+
+    assert collect(extract=['*/other.c'])['total']['total_statements'] == 1
+    assert collect()['tracefile'] == str(tracefile)
+
+
+FAKE_LCOV = """\
+#!{python}
+import sys
+from pathlib import Path
+
+args = sys.argv[1:]
+directories = [
+    Path(args[index + 1]) for index, arg in enumerate(args)
+    if arg == '--directory'
+]
+output = args[args.index('--output-file') + 1]
+pattern = '*.gcda' if '--no-recursion' in args else '**/*.gcda'
+
+with open(output, 'w') as fd:
+    for directory in directories:
+        for gcda in sorted(directory.glob(pattern)):
+            fd.write('SF:{{}}\\nDA:1,1\\nDA:2,0\\nend_of_record\\n'.format(
+                gcda.with_suffix('.c')
+            ))
+"""
+
+
+def test_source_lcov_shards(tmpdir, monkeypatch):
+    """
+    Capture the coverage of a build tree in parallel shards.
+    """
+    from flowbber.plugins.sources.lcov import LcovSource
+
+    root = Path(str(tmpdir))
+
+    lcov = root / 'bin' / 'lcov'
+    lcov.parent.mkdir()
+    lcov.write_text(FAKE_LCOV.format(python=sys.executable))
+    lcov.chmod(0o755)
+    monkeypatch.setenv('PATH', str(lcov.parent), prepend=':')
+
+    build = root / 'build'
+    for directory, count in [('a', 3), ('a/b', 2), ('c', 1), ('d', 1)]:
+        (build / directory).mkdir(parents=True)
+        for index in range(count):
+            (build / directory / '{}.gcda'.format(index)).touch()
+
+    def collect(jobs):
+        return LcovSource(
+            0, 'lcov', 'coverage',
+            config={'source': str(build), 'jobs': jobs},
+        ).collect()
+
+    single = collect(1)
+    assert 'shards' not in single
+    assert single['total']['total_statements'] == 14
+
+    sharded = collect(2)
+    assert sorted(
+        (shard['directories'], shard['gcda']) for shard in sharded['shards']
+    ) == [(2, 3), (2, 4)]
+    assert all(shard['duration'] >= 0 for shard in sharded['shards'])
+    assert sharded['files'] == single['files']
+    assert sharded['total'] == single['total']
+
+
+def test_aggregator_lcov_merger(tmpdir, monkeypatch):
+    """
+    Merge the tracefiles of several sources without calling lcov.
+    """
+    from flowbber.utils.lcov import read_tracefile
+    from flowbber.plugins.aggregators import lcov_merger
+    from flowbber.plugins.aggregators.lcov_merger import LcovMergerAggregator
+
+    root = Path(str(tmpdir))
+
+    warnings = []
+    monkeypatch.setattr(lcov_merger.log, 'warning', warnings.append)
+
+    first = root / 'first.info'
+    first.write_text(LCOV_INFO.format(root=root))
+    second = root / 'second.info'
+    second.write_text(
+        'SF:{root}/src/main.c\n'
+        'FNDA:2,main\n'
+        'BRDA:7,0,0,1\n'
+        'DA:8,4\n'
+        'end_of_record\n'
+        'SF:{root}/src/third.c\n'
+        'DA:1,0\n'
+        'end_of_record\n'.format(root=root)
+    )
+
+    data = {
+        'first': {'tracefile': str(first)},
+        'second': {'tracefile': str(second)},
+    }
+    aggregator = LcovMergerAggregator(
+        0, 'lcov_merger', 'merged',
+        config={
+            'keys': ['first', 'second', 'missing'],
+            'remove': ['*/other.c'],
+        },
+    )
+    aggregator.accumulate(data)
+    merged = data['merged']
+
+    assert len(merged['files']) == 2
+    assert len(merged['ignored']) == 1
+    assert merged['total'] == {
+        'total_statements': 6,
+        'total_misses': 1,
+        'total_hits': 5,
+        'total_branches': 4,
+        'total_branches_hit': 3,
+        'line_rate': 5 / 6,
+        'branch_rate': 0.75,
+    }
+
+    # The merged tracefile has the merged counters
+    main, third = read_tracefile(merged['tracefile'])
+    assert main.filename == str(root / 'src' / 'main.c')
+    assert main.lines == {1: 1, 2: 1, 3: 3, 7: 1, 8: 4}
+    assert main.function_hits == {'main': 3}
+    assert main.branches[(7, '0', '0')] == 1
+    assert main.branches[(7, '0', '1')] is None
+    assert third.lines == {1: 0}
+
+    # The deprecated rc_overrides option has no effect besides a warning
+    assert warnings == []
+
+    aggregator = LcovMergerAggregator(
+        0, 'lcov_merger', 'overridden',
+        config={
+            'keys': ['first', 'second'],
+            'remove': ['*/other.c'],
+            'rc_overrides': ['lcov_branch_coverage=0'],
+        },
+    )
+    aggregator.accumulate(data)
+
+    assert len(warnings) == 1
+    assert 'lcov_branch_coverage=0' in warnings[0]
+    assert data['overridden']['total'] == merged['total']
+
+
+FAKE_GENHTML = """\
+#!{python}
+import sys
+from pathlib import Path
+from os.path import relpath, dirname
+
+args = sys.argv[1:]
+output = Path(args[args.index('--output-directory') + 1])
+prefix = args[args.index('--prefix') + 1] if '--prefix' in args else '/'
+source = '--no-source' not in args
+
+with open({log!r}, 'a') as fd:
+    fd.write(' '.join(args) + '\\n')
+
+for line in open(args[-1]):
+    if not line.startswith('SF:'):
+        continue
+    path = line[3:].strip()
+    directory = output / relpath(dirname(path), prefix)
+    directory.mkdir(parents=True, exist_ok=True)
+    with (directory / 'index.html').open('a') as fd:
+        fd.write('{{}} {{}}\\n'.format(Path(path).name, source))
+    if source:
+        (directory / (Path(path).name + '.gcov.html')).write_text(path)
+(output / 'index.html').write_text('index')
+"""
+
+
+def test_sink_lcov_html(tmpdir, monkeypatch):
+    """
+    Generate the HTML report in parallel, only if the tracefile changed.
+    """
+    from flowbber.plugins.sinks.lcov_html import LcovHTMLSink
+
+    root = Path(str(tmpdir))
+    log = root / 'genhtml.log'
+
+    genhtml = root / 'bin' / 'genhtml'
+    genhtml.parent.mkdir()
+    genhtml.write_text(
+        FAKE_GENHTML.format(python=sys.executable, log=str(log))
+    )
+    genhtml.chmod(0o755)
+    monkeypatch.setenv('PATH', str(genhtml.parent), prepend=':')
+
+    tracefile = root / 'coverage.info'
+    tracefile.write_text(''.join(
+        'SF:{}\nDA:1,1\nend_of_record\n'.format(root / 'src' / path)
+        for path in ['lib/a.c', 'lib/sub/b.c', 'app/main.c']
+    ))
+    data = {'coverage': {'tracefile': str(tracefile)}}
+    output = root / 'html'
+
+    def distribute():
+        LcovHTMLSink(
+            0, 'lcov_html', 'html',
+            config={
+                'key': 'coverage',
+                'output': str(output),
+                'override': True,
+                'jobs': 4,
+            },
+        ).distribute(data)
+        calls = log.read_text().splitlines()
+        log.unlink()
+        return calls
+
+    # One process for the index and one for each top level directory
+    calls = distribute()
+    assert len(calls) == 3
+    assert sum('--no-source' in call for call in calls) == 1
+
+    # Pages of the directories have the source code views
+    assert (output / 'index.html').read_text() == 'index'
+    assert (output / 'lib' / 'index.html').read_text() == 'a.c True\n'
+    assert (output / 'lib' / 'sub' / 'b.c.gcov.html').is_file()
+    assert (output / 'app' / 'main.c.gcov.html').is_file()
+
+    # The report is up to date
+    log.touch()
+    assert distribute() == []
+
+    # The tracefile changed
+    with tracefile.open('a') as fd:
+        fd.write('SF:{}\nDA:1,0\nend_of_record\n'.format(root / 'src/x.c'))
+    assert len(distribute()) == 1
+
+
+@mark.skipif(which('genhtml') is None, reason='lcov is not installed')
+def test_sink_lcov_html_genhtml(tmpdir):
+    """
+    Generate the same HTML report with genhtml in parallel and in a single
+    process.
+    """
+    from flowbber.plugins.sinks.lcov_html import LcovHTMLSink
+
+    root = Path(str(tmpdir))
+
+    tracefile = root / 'coverage.info'
+    with tracefile.open('w') as fd:
+        for path in ['lib/a.c', 'lib/sub/b.c', 'app/main.c']:
+            source = root / 'src' / path
+            source.parent.mkdir(parents=True, exist_ok=True)
+            source.write_text('int f(void)\n{\n    return 0;\n}\n')
+            fd.write(
+                'TN:\nSF:{}\nFN:1,f\nFNDA:1,f\nFNF:1\nFNH:1\n'
+                'DA:3,1\nLF:1\nLH:1\nend_of_record\n'.format(source)
+            )
+    data = {'coverage': {'tracefile': str(tracefile)}}
+
+    def distribute(output, jobs):
+        LcovHTMLSink(
+            0, 'lcov_html', 'html',
+            config={
+                'key': 'coverage',
+                'output': str(output),
+                'jobs': jobs,
+            },
+        ).distribute(data)
+        return {
+            str(path.relative_to(output))
+            for path in output.glob('**/*') if path.is_file()
+        }
+
+    single = distribute(root / 'single', 1)
+    parallel = distribute(root / 'parallel', 3)
+    assert parallel == single
+
+    # The pages of the directories link to the source code views
+    for directory, filename in [
+        ('lib', 'a.c'), ('lib/sub', 'b.c'), ('app', 'main.c'),
+    ]:
+        page = root / 'parallel' / directory / 'index.html'
+        assert '{}.gcov.html'.format(filename) in page.read_text()
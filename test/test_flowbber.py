@@ -21,6 +21,11 @@ Test suite for module flowbber.
 See http://pythontesting.net/framework/pytest/pytest-introduction/#fixtures
 """
 
+from shutil import which
+from subprocess import run
+
+from pytest import mark
+
 from flowbber import __version__
 
 
@@ -43,3 +48,335 @@ def test_semantic_version():
     assert mayor >= 0
     assert minor >= 0
     assert rev >= 0
+
+
+def test_traverse():
+    """
+    Walk, transform and select nodes of a tree iteratively.
+    """
+    from collections import OrderedDict
+    from flowbber.utils.traverse import (
+        walk, leaves, transform, select, resolve,
+    )
+
+    data = OrderedDict((
+        ('a', {'b': 1, 'c': [2, {'d': 3}]}),
+        ('e', 4),
+    ))
+
+    assert [(path, depth) for path, _, _, depth in walk(data)] == [
+        ('a', 0), ('a.b', 1), ('a.c', 1), ('a.c.0', 2), ('a.c.1', 2),
+        ('a.c.1.d', 3), ('e', 0),
+    ]
+    assert list(leaves(data, joinchar='/')) == [
+        ('a/b', 1), ('a/c/0', 2), ('a/c/1/d', 3), ('e', 4),
+    ]
+    assert [
+        path for path, _, _, _ in walk(
+            data, enter=lambda path, key, value: key != 'c',
+        )
+    ] == ['a', 'a.b', 'a.c', 'e']
+
+    # Very deep trees don't hit the recursion limit
+    deep = {}
+    node = deep
+    for _ in range(5000):
+        node['x'] = {}
+        node = node['x']
+    node['x'] = 1
+    assert len(list(leaves(deep))) == 1
+
+    transformed = transform(
+        data,
+        keep=lambda path, key, value: path != 'a.b',
+        rename=str.upper,
+    )
+    assert isinstance(transformed, OrderedDict)
+    assert transformed == {'A': {'C': [2, {'D': 3}]}, 'E': 4}
+    assert data['a']['b'] == 1
+
+    inplace = transform(data, rename=str.upper, lists=False, inplace=True)
+    assert inplace is data
+    assert data == {'A': {'B': 1, 'C': [2, {'d': 3}]}, 'E': 4}
+
+    assert list(select(data, ['A', '*'])) == [('B', 1), ('C', [2, {'d': 3}])]
+    assert list(select(data, ['*', 'C', '1'])) == [(1, {'d': 3})]
+
+    assert resolve(data, ['A', 'C', '1', 'd']) == 3
+
+
+def test_traverse_ports():
+    """
+    Check the functions ported to the traversal engine.
+    """
+    from flowbber.utils.filter import filter_dict
+    from flowbber.plugins.sinks.mongodb import mongodb_safe
+    from flowbber.plugins.sinks.influxdb import transform_to_flat
+
+    data = {
+        'source': {
+            'files': {
+                'main.c': {'line_rate': 0.5, 'misses': 3},
+                'other.c': {'line_rate': 1.0, 'misses': 0},
+            },
+            '$total': {'line_rate': 0.75},
+            'list': ['a', {'b': 2}],
+        },
+    }
+
+    assert filter_dict(
+        data, ['*'], ['source.files.other.c', 'source.$total.*'],
+    ) == {
+        'source': {
+            'files': {'main.c': {'line_rate': 0.5, 'misses': 3}},
+            '$total': {},
+            'list': ['a', {'b': 2}],
+        },
+    }
+
+    assert mongodb_safe(data, ':', '&') == {
+        'source': {
+            'files': {
+                'main:c': {'line_rate': 0.5, 'misses': 3},
+                'other:c': {'line_rate': 1.0, 'misses': 0},
+            },
+            '&total': {'line_rate': 0.75},
+            'list': ['a', {'b': 2}],
+        },
+    }
+
+    assert transform_to_flat(data, '.', ':') == {
+        'source': {
+            'files.main:c.line_rate': 0.5,
+            'files.main:c.misses': 3,
+            'files.other:c.line_rate': 1.0,
+            'files.other:c.misses': 0,
+            '$total.line_rate': 0.75,
+            '0': 'a',
+            '1.b': 2,
+        },
+    }
+
+
+def test_influxdb_listkeys():
+    """
+    Check that the InfluxDB sink keeps the key of lists only if requested.
+    """
+    from flowbber.plugins.sinks.influxdb import transform_to_flat
+
+    data = {
+        'source': {
+            'key1': ['a', 'b'],
+            'key2': [{'a': 1}, {'b.c': 2}],
+            'key3': [[1, 2], []],
+        },
+    }
+
+    # The elements of the lists overwrite each other
+    assert transform_to_flat(data, '.', ':') == {
+        'source': {
+            '0': 1,
+            '1': 2,
+            '0.a': 1,
+            '1.b:c': 2,
+        },
+    }
+
+    assert transform_to_flat(data, '.', ':', listkeys=True) == {
+        'source': {
+            'key1.0': 'a',
+            'key1.1': 'b',
+            'key2.0.a': 1,
+            'key2.1.b:c': 2,
+            'key3.0.0': 1,
+            'key3.0.1': 2,
+        },
+    }
+
+
+def test_namespaces_lazy(tmpdir, monkeypatch):
+    """
+    Check that the namespaces fetch only the values referenced, one at a time.
+    """
+    from pathlib import Path
+    from flowbber import namespaces
+    from flowbber.utils import git
+    from flowbber.inputs import load_pipeline
+
+    calls = []
+
+    def find_head(directory='.'):
+        calls.append('head')
+        return '/repo', 'master'
+
+    def find_revision(directory='.'):
+        calls.append('rev')
+        return 'abcdef0'
+
+    class Environment(dict):
+        def __contains__(self, key):
+            calls.append('env')
+            return super().__contains__(key)
+
+    monkeypatch.setattr(git, 'find_head', find_head)
+    monkeypatch.setattr(git, 'find_revision', find_revision)
+    monkeypatch.setattr(
+        namespaces, 'environ', Environment(FLOWBBER_VALUE='value'),
+    )
+
+    definition = Path(str(tmpdir)) / 'pipeline.toml'
+
+    def load(value):
+        definition.write_text(
+            '[[sources]]\n'
+            'type = "config"\n'
+            'id = "config"\n'
+            '\n'
+            '    [sources.config.data]\n'
+            '    value = "{}"\n'
+            '\n'
+            '[[sinks]]\n'
+            'type = "print"\n'
+            'id = "print"\n'.format(value),
+            encoding='utf-8',
+        )
+        validated = load_pipeline(definition)
+        return validated['sources'][0]['config']['data']['value']
+
+    # Without placeholders, neither git nor the environment are used
+    assert load('plain') == 'plain'
+    assert calls == []
+
+    # Only the git values referenced are fetched
+    assert load('{git.rev}') == 'abcdef0'
+    assert calls == ['rev']
+
+    del calls[:]
+    assert load('{git.root}:{git.branch}') == '/repo:master'
+    assert calls == ['head']
+
+    del calls[:]
+    assert load('{env.FLOWBBER_VALUE}') == 'value'
+    assert calls == ['env']
+
+    # Values are fetched once per namespace
+    del calls[:]
+    mapping = namespaces.get_namespaces(definition)
+    assert '{git.rev} {git.rev} {git.branch} {git.root}'.format_map(
+        mapping
+    ) == 'abcdef0 abcdef0 master /repo'
+    assert calls == ['rev', 'head']
+
+    # Secrets aren't printed
+    assert str(mapping['git']) == (
+        "git(rev='abcdef0', branch='master', root='/repo')"
+    )
+    '{env.FLOWBBER_VALUE}'.format_map(mapping)
+    assert str(mapping['env']) == "env(FLOWBBER_VALUE='****')"
+
+
+def test_validate_definition_threads():
+    """
+    Check that pipeline definitions can be validated from several threads.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from flowbber.inputs import validate_definition
+
+    def validate(index):
+        validated = validate_definition({
+            'sources': [{
+                'type': 'config',
+                'id': 'config{}'.format(index),
+                'config': {'data': {'value': index}},
+            }],
+            'sinks': [{'type': 'print', 'id': 'print'}],
+        })
+        return validated['sources'][0]['id']
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        ids = list(executor.map(validate, range(200)))
+
+    assert ids == ['config{}'.format(index) for index in range(200)]
+
+
+def git_repository(path, subject, body, tag=None):
+    """
+    Create a git repository with a single commit, optionally tagged.
+    """
+    path.mkdir()
+    environ = {
+        'GIT_AUTHOR_NAME': 'The Author',
+        'GIT_AUTHOR_EMAIL': 'author@domain.com',
+        'GIT_AUTHOR_DATE': '2017-09-13T01:27:55-06:00',
+        'GIT_COMMITTER_NAME': 'The Author',
+        'GIT_COMMITTER_EMAIL': 'author@domain.com',
+        'HOME': str(path),
+    }
+
+    def git(*args):
+        run(
+            ['git', '-C', str(path)] + list(args),
+            env=environ, check=True, capture_output=True,
+        )
+
+    git('init', '-b', 'main')
+    git('commit', '--allow-empty', '-m', subject, '-m', body)
+    git('branch', 'other')
+    if tag is not None:
+        git('tag', tag)
+
+
+@mark.skipif(which('git') is None, reason='git is not installed')
+def test_git_info(tmpdir):
+    """
+    Check that the information of git repositories is fetched and parsed
+    correctly, with and without tags.
+    """
+    from pathlib import Path
+    from flowbber.utils.git import find_info
+    from flowbber.plugins.sources.git import GitSource
+
+    root = Path(str(tmpdir)).resolve()
+
+    # The body includes separators used by git in other formats
+    body = 'First line, tag: not-a-tag\n\nHEAD -> nowhere | %D'
+    git_repository(root / 'tagged', 'Tagged commit', body, tag='1.0.0')
+    git_repository(root / 'untagged', 'Untagged commit', 'Body')
+
+    tagged = find_info(directory=str(root / 'tagged'))._asdict()
+    rev = tagged.pop('rev')
+    assert len(rev) >= 7
+    assert tagged == {
+        'root': str(root / 'tagged'),
+        'branch': 'main',
+        'tag': '1.0.0',
+        'name': 'The Author',
+        'email': 'author@domain.com',
+        'subject': 'Tagged commit',
+        'body': body,
+        'date': '2017-09-13T01:27:55-06:00',
+    }
+
+    untagged = find_info(directory=str(root / 'untagged'))
+    assert untagged.tag == ''
+    assert untagged.subject == 'Untagged commit'
+    assert untagged.body == 'Body'
+
+    def collect(directory):
+        source = GitSource(0, 'git', 'git', config={'directory': directory})
+        return source.collect()
+
+    assert collect(str(root / 'untagged')) == untagged._asdict()
+
+    data = collect([str(root / 'tagged'), str(root / 'untagged')])
+    assert list(data) == ['repositories']
+    assert [
+        (repository['directory'], repository['root'], repository['tag'])
+        for repository in data['repositories']
+    ] == [
+        (str(root / 'tagged'), str(root / 'tagged'), '1.0.0'),
+        (str(root / 'untagged'), str(root / 'untagged'), ''),
+    ]
+    assert data['repositories'][1] == dict(
+        directory=str(root / 'untagged'), **untagged._asdict()
+    )